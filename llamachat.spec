@@ -13,6 +13,7 @@ a = Analysis(
     ],
     hiddenimports=[
         'backoff',
+        'httpx',
         'markdown',
         'ollama',
         'dotenv',
@@ -0,0 +1,4 @@
+"""Headless end-to-end benchmark of the chat UI against a stub Ollama server.
+
+Run with ``python -m llamachat.bench``.
+"""
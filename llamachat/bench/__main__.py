@@ -0,0 +1,53 @@
+import argparse
+import json
+import logging
+
+from llamachat.bench.harness import BenchmarkSettings, run, write_results
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m llamachat.bench",
+        description="Replay scripted conversations through the chat UI against a stub Ollama server."
+    )
+    parser.add_argument("--script", help="JSON file with a list of conversations, each a list of user messages")
+    parser.add_argument("--tokens", type=int, default=BenchmarkSettings.tokens, help="tokens per reply")
+    parser.add_argument("--tokens-per-second", type=float, default=BenchmarkSettings.tokens_per_second)
+    parser.add_argument("--ttft", type=float, default=BenchmarkSettings.ttft,
+                        help="server delay before the first token, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variation of token intervals, as a fraction")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of streams cut off part way")
+    parser.add_argument("--seed", type=int, help="seed for jitter and failure injection")
+    parser.add_argument("--cassette", help="replay streams recorded with LLAMA_RECORD_CASSETTE")
+    parser.add_argument("--hosts", type=int, default=1,
+                        help="stub servers to start, each on its own port, to test routing across hosts")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="send the next turn of every conversation while the others are answered")
+    parser.add_argument("--output", default="bench-results.json", help="where to write the JSON results")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()))
+    settings = BenchmarkSettings(
+        tokens=args.tokens,
+        tokens_per_second=args.tokens_per_second,
+        ttft=args.ttft,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        drop_rate=args.drop_rate,
+        seed=args.seed,
+        cassette=args.cassette,
+        hosts=args.hosts,
+        concurrent=args.concurrent
+    )
+    if args.script:
+        with open(args.script) as f:
+            settings.conversations = json.load(f)
+
+    results = run(settings)
+    write_results(results, args.output)
+    print(json.dumps(results["results"], indent=2))
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
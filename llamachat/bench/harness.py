@@ -0,0 +1,305 @@
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from llamachat.bench.stub_server import StubOllamaServer
+from llamachat.config import AppConfig
+
+DEFAULT_CONVERSATIONS = [
+    [
+        "Hi! Can you help me plan a trip to Lisbon?",
+        "What neighbourhoods should I stay in?",
+        "And what should I eat there?",
+        "Summarize the plan in a short list.",
+    ],
+    [
+        "Explain what a hash map is.",
+        "How does it handle collisions?",
+        "Show me a small example in Python.",
+    ],
+    [
+        "Write a haiku about autumn.",
+        "Now one about winter.",
+    ],
+]
+
+# Interval of the timer used to measure event loop lag
+LAG_TIMER_INTERVAL_MS = 10
+
+@dataclass
+class BenchmarkSettings:
+    conversations: List[List[str]] = field(default_factory=lambda: DEFAULT_CONVERSATIONS)
+    tokens: int = 64  # tokens per reply
+    tokens_per_second: float = 50.0
+    ttft: float = 0.05  # server-side delay before the first token, seconds
+    jitter: float = 0.0  # variation of token intervals, as a fraction
+    failure_rate: float = 0.0  # requests answered with a 503
+    drop_rate: float = 0.0  # streams cut off part way
+    seed: Optional[int] = None
+    cassette: Optional[str] = None  # replay recorded streams instead of synthetic ones
+    hosts: int = 1  # stub servers, each on its own port, for exercising host routing
+    concurrent: bool = False  # run the conversations' turns side by side
+    turn_timeout: float = 60.0
+
+def summarize(samples: List[float]) -> Dict[str, Optional[float]]:
+    """Return count, mean, median, 95th percentile and maximum of the samples."""
+    if not samples:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+def peak_rss_mb() -> Optional[float]:
+    """Return the peak resident set size of the process in MB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def timed(samples: List[float], function: Callable) -> Callable:
+    """Wrap ``function`` so that each call's duration is appended to ``samples`` in ms."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            samples.append((time.perf_counter() - start) * 1000)
+    return wrapper
+
+def timed_async(samples: List[float], function: Callable) -> Callable:
+    """Like ``timed``, for a coroutine function: measures until the result is ready."""
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            samples.append((time.perf_counter() - start) * 1000)
+    return wrapper
+
+async def wait_for(condition: Callable[[], bool], timeout: float, what: str):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Timed out waiting for {what}")
+        await asyncio.sleep(0.01)
+
+async def replay(window, settings: BenchmarkSettings, servers: List[StubOllamaServer]) -> Dict:
+    """Replay the scripted conversations through the window and collect measurements.
+
+    Conversations run one after another, or with ``settings.concurrent``
+    in rounds that send the next turn of every conversation while the
+    others are still being answered, so replies overlap and are spread
+    over the hosts.
+    """
+    from PyQt6.QtCore import QTimer
+
+    chat_widget = window.chat_widget
+    service = window.ollama_service
+
+    paint_ms: List[float] = []
+    db_write_ms: List[float] = []
+    loop_lag_ms: List[float] = []
+    errors: List[str] = []
+    chat_widget.error_occurred.connect(errors.append)
+    chat_widget.chat_delegate.paint = timed(paint_ms, chat_widget.chat_delegate.paint)
+    chat_widget.db_service.add_message = timed_async(db_write_ms, chat_widget.db_service.add_message)
+
+    last_tick = time.perf_counter()
+
+    def on_tick():
+        nonlocal last_tick
+        now = time.perf_counter()
+        loop_lag_ms.append(max(0.0, (now - last_tick) * 1000 - LAG_TIMER_INTERVAL_MS))
+        last_tick = now
+
+    lag_timer = QTimer()
+    lag_timer.setInterval(LAG_TIMER_INTERVAL_MS)
+    lag_timer.timeout.connect(on_tick)
+
+    await wait_for(lambda: not window.loading.isVisible(), settings.turn_timeout, "startup")
+
+    lag_timer.start()
+    start_time = time.perf_counter()
+    chat_ids = []
+    if settings.concurrent:
+        for turn in range(max(map(len, settings.conversations))):
+            for number, conversation in enumerate(settings.conversations):
+                if turn >= len(conversation):
+                    continue
+                # Chats are opened as their first turn is sent, like a user
+                # starting one while others are answered; opening a chat
+                # preloads the model on the host it will use
+                if turn == 0:
+                    await window.create_new_chat()
+                    chat_ids.append(chat_widget.current_chat_id)
+                else:
+                    chat_widget.set_chat(chat_ids[number])
+                chat_id = chat_ids[number]
+                chat_widget.send_message(conversation[turn])
+                await asyncio.sleep(0)
+                # Move on once the reply streams, so the host pool sees it as outstanding
+                await wait_for(
+                    lambda: all(session.chunk_count for session in chat_widget.sessions_of(chat_id)),
+                    settings.turn_timeout,
+                    f"a reply to start in chat {chat_id}"
+                )
+            await wait_for(lambda: not chat_widget.active_responses, settings.turn_timeout, f"round {turn + 1}")
+    else:
+        for conversation in settings.conversations:
+            await window.create_new_chat()
+            chat_id = chat_widget.current_chat_id
+            chat_ids.append(chat_id)
+            for text in conversation:
+                chat_widget.send_message(text)
+                await asyncio.sleep(0)
+                await wait_for(
+                    lambda: not service.is_generating(chat_id) and not chat_widget.active_responses,
+                    settings.turn_timeout,
+                    f"a reply in chat {chat_id}"
+                )
+    elapsed = time.perf_counter() - start_time
+    lag_timer.stop()
+
+    ttft_ms: List[float] = []
+    reply_ms: List[float] = []
+    tokens_per_second: List[float] = []
+    chunks = 0
+    replies_per_host: Dict[str, int] = {server.url: 0 for server in servers}
+    chats_on_several_hosts = 0
+    for chat_id in chat_ids:
+        chat_hosts = set()
+        for message in await window.db_service.get_chat_messages(chat_id):
+            metrics = window.db_service.get_message_metrics(message)
+            if message.role != "assistant" or metrics is None:
+                continue
+            if metrics.host is not None:
+                replies_per_host[metrics.host] = replies_per_host.get(metrics.host, 0) + 1
+                chat_hosts.add(metrics.host)
+            if metrics.time_to_first_token is not None:
+                ttft_ms.append(metrics.time_to_first_token * 1000)
+            reply_ms.append(metrics.wall_time * 1000)
+            if metrics.tokens_per_second is not None:
+                tokens_per_second.append(metrics.tokens_per_second)
+            chunks += metrics.eval_count or 0
+        # Host affinity should keep each chat on one host
+        chats_on_several_hosts += len(chat_hosts) > 1
+
+    return {
+        "turns": len(reply_ms),
+        "errors": len(errors),
+        "elapsed_s": elapsed,
+        "chunks": chunks,
+        "ttft_ms": summarize(ttft_ms),
+        "reply_ms": summarize(reply_ms),
+        "tokens_per_second": summarize(tokens_per_second),
+        "event_loop_lag_ms": summarize(loop_lag_ms),
+        "paint_ms": summarize(paint_ms),
+        "paint_ms_per_chunk": sum(paint_ms) / chunks if chunks else None,
+        "db_write_ms": summarize(db_write_ms),
+        "peak_rss_mb": peak_rss_mb(),
+        "hosts": [
+            {"url": server.url, "requests": server.requests, "replies": replies_per_host[server.url]}
+            for server in servers
+        ],
+        "chats_on_several_hosts": chats_on_several_hosts,
+    }
+
+def run(settings: BenchmarkSettings) -> Dict:
+    """Run the benchmark headless against stub servers and return the results."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    import qasync
+    from PyQt6.QtWidgets import QApplication
+    from llamachat.database.database import init_db
+    from llamachat.ui.main_window import MainWindow
+
+    with tempfile.TemporaryDirectory(prefix="llamachat-bench-") as data_dir, ExitStack() as stack:
+        servers = [
+            stack.enter_context(StubOllamaServer(
+                tokens=settings.tokens,
+                tokens_per_second=settings.tokens_per_second,
+                ttft=settings.ttft,
+                jitter=settings.jitter,
+                failure_rate=settings.failure_rate,
+                drop_rate=settings.drop_rate,
+                seed=None if settings.seed is None else settings.seed + number,
+                cassette=settings.cassette
+            ))
+            for number in range(settings.hosts)
+        ]
+        # The engine is created from the class-level URL
+        AppConfig.database_url = f"sqlite:///{os.path.join(data_dir, 'bench.db')}"
+        config = AppConfig(
+            ollama_hosts=",".join(server.url for server in servers),
+            database_url=AppConfig.database_url
+        )
+        init_db()
+
+        app = QApplication.instance() or QApplication(sys.argv[:1])
+        loop = qasync.QEventLoop(app)
+        asyncio.set_event_loop(loop)
+        window = MainWindow(config)
+        window.show()
+        try:
+            with loop:
+                results = loop.run_until_complete(replay(window, settings, servers))
+                loop.run_until_complete(window.ollama_service.close())
+                loop.run_until_complete(window.db_service.close())
+        finally:
+            window.close()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {
+                "conversations": len(settings.conversations),
+                "turns": sum(len(conversation) for conversation in settings.conversations),
+                "tokens": settings.tokens,
+                "tokens_per_second": settings.tokens_per_second,
+                "ttft": settings.ttft,
+                "jitter": settings.jitter,
+                "failure_rate": settings.failure_rate,
+                "drop_rate": settings.drop_rate,
+                "seed": settings.seed,
+                "cassette": settings.cassette,
+                "hosts": settings.hosts,
+                "concurrent": settings.concurrent,
+            },
+        },
+        "results": results,
+    }
+
+def write_results(results: Dict, path: str):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
@@ -0,0 +1,325 @@
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import hashlib
+import json
+import logging
+import random
+import socket
+import threading
+import time
+
+from llamachat.services.cassette import cassette_key, load_cassette
+
+logger = logging.getLogger(__name__)
+
+# A streamed body and the delay before sending it, in seconds
+TimedChunk = Tuple[float, dict]
+
+class StubOllamaServer:
+    """A local stand-in for Ollama that needs no model.
+
+    It speaks the NDJSON protocol of ``/api/chat``, ``/api/generate``,
+    ``/api/ps``, ``/api/tags`` and ``/api/embed`` in one of two modes:
+
+    - synthetic: replies are ``tokens`` words sent ``ttft`` seconds after the
+      request at ``tokens_per_second``, each interval varied by up to
+      ``jitter`` (a fraction of the interval);
+    - replay: with ``cassette``, streams recorded through
+      ``OllamaService``'s recording mode are played back with their original
+      timing, scaled by ``replay_speed`` (0 sends everything at once).
+      Requests are matched on model and messages; unmatched requests get the
+      recorded streams in order.
+
+    In both modes ``failure_rate`` of requests fail with a 503 before
+    streaming and ``drop_rate`` of streams are cut off part way, so retry and
+    resume paths can be exercised. ``seed`` makes the randomness repeatable.
+    The server runs in a background thread; port 0 picks a free port.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, model: str = "llama3.2:latest",
+                 tokens: int = 64, tokens_per_second: float = 50.0, ttft: float = 0.05,
+                 jitter: float = 0.0, failure_rate: float = 0.0, drop_rate: float = 0.0,
+                 seed: Optional[int] = None, cassette: Optional[str] = None, replay_speed: float = 1.0,
+                 embedding_size: int = 384):
+        self.model = model
+        self.tokens = tokens
+        self.tokens_per_second = tokens_per_second
+        self.ttft = ttft
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.drop_rate = drop_rate
+        self.replay_speed = replay_speed
+        self.embedding_size = embedding_size
+        self.loaded = False
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recorded: Dict[str, dict] = {}
+        self._recorded_order: List[dict] = []
+        self._next_recorded = 0
+        if cassette:
+            self._recorded_order = load_cassette(cassette)
+            self._recorded = {interaction["key"]: interaction for interaction in self._recorded_order}
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def models(self) -> List[str]:
+        recorded = {interaction["request"].get("model") for interaction in self._recorded_order}
+        return sorted({_tagged(self.model)} | {_tagged(model) for model in recorded if model})
+
+    def _chance(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+    def _model_info(self, model: str) -> dict:
+        return {
+            "name": model,
+            "model": model,
+            "size": 2_000_000_000,
+            "size_vram": 2_000_000_000,
+            "digest": hashlib.sha256(model.encode()).hexdigest(),
+            "modified_at": _now(),
+            "expires_at": "2100-01-01T00:00:00Z",
+            "details": {},
+        }
+
+    def _recorded_for(self, path: str, request: dict) -> Optional[dict]:
+        if not self._recorded_order:
+            return None
+        interaction = self._recorded.get(cassette_key(path, request))
+        if interaction is None:
+            with self._lock:
+                interaction = self._recorded_order[self._next_recorded % len(self._recorded_order)]
+                self._next_recorded += 1
+        return interaction
+
+    def _replay(self, interaction: dict) -> Iterator[TimedChunk]:
+        previous = 0.0
+        for offset, chunk in zip(interaction["offsets"], interaction["chunks"]):
+            yield (offset - previous) * self.replay_speed, chunk
+            previous = offset
+
+    def _synthesize(self, path: str, request: dict) -> Iterator[TimedChunk]:
+        interval = 1 / self.tokens_per_second
+        # A trailing assistant message is a reply to continue, as Ollama does
+        messages = request.get("messages") or []
+        first = 0
+        if messages and messages[-1].get("role") == "assistant":
+            first = min(self.tokens, len(messages[-1].get("content", "").split()))
+        for i in range(first, self.tokens):
+            delay = self.ttft if i == first else interval
+            if self.jitter and i > first:
+                with self._lock:
+                    delay *= 1 + self._random.uniform(-self.jitter, self.jitter)
+            yield delay, _chunk(path, request, f"token{i} ", done=False)
+        generated = self.tokens - first
+        yield interval, _chunk(path, request, "", done=True, **{
+            "prompt_eval_count": _prompt_length(request) // 4,
+            "eval_count": generated,
+            "eval_duration": int(generated * interval * 1e9),
+            "load_duration": 0,
+            "total_duration": int((self.ttft + generated * interval) * 1e9),
+        })
+
+    def _embed(self, text: str) -> List[float]:
+        """Return a deterministic unit vector derived from the text."""
+        generator = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        vector = [generator.gauss(0, 1) for _ in range(self.embedding_size)]
+        norm = sum(value * value for value in vector) ** 0.5
+        return [value / norm for value in vector]
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [stub._model_info(model) for model in stub.models]})
+                elif self.path == "/api/ps":
+                    models = [stub._model_info(_tagged(stub.model))] if stub.loaded else []
+                    self._send_json({"models": models})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with stub._lock:
+                    stub.requests += 1
+
+                if self.path == "/api/embed":
+                    inputs = request.get("input", "")
+                    inputs = [inputs] if isinstance(inputs, str) else inputs
+                    self._send_json({
+                        "model": request.get("model"),
+                        "embeddings": [stub._embed(text) for text in inputs],
+                    })
+                    return
+                if self.path not in ("/api/chat", "/api/generate"):
+                    self._send_json({"error": "not found"}, 404)
+                    return
+                if self.path == "/api/generate" and not request.get("prompt"):
+                    # Without a prompt this only loads or unloads the model
+                    stub.loaded = request.get("keep_alive") != 0
+                    self._send_json(_chunk(self.path, request, "", done=True))
+                    return
+                if stub._chance(stub.failure_rate):
+                    self._send_json({"error": "injected failure"}, 503)
+                    return
+
+                stub.loaded = True
+                interaction = stub._recorded_for(self.path, request)
+                chunks = stub._replay(interaction) if interaction else stub._synthesize(self.path, request)
+                if request.get("stream", True):
+                    self._stream(chunks)
+                else:
+                    self._send_json(_merge(self.path, list(chunks)))
+
+            def _send_json(self, body: dict, status: int = 200):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_chunk(self, body: dict):
+                data = (json.dumps(body) + "\n").encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def _stream(self, chunks: Iterator[TimedChunk]):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                chunks = list(chunks)
+                drop_at = None
+                if len(chunks) > 1 and stub._chance(stub.drop_rate):
+                    # Always after the first chunk and before the final one
+                    with stub._lock:
+                        drop_at = stub._random.randint(1, len(chunks) - 1)
+                try:
+                    for i, (delay, chunk) in enumerate(chunks):
+                        if delay > 0:
+                            time.sleep(delay)
+                        if i == drop_at:
+                            break
+                        self._write_chunk(chunk)
+                    else:
+                        self.wfile.write(b"0\r\n\r\n")
+                        return
+                    # Cut the connection without finishing the response
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                except (BrokenPipeError, ConnectionResetError):
+                    logger.debug("Client closed the stream")
+
+        return Handler
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _tagged(model: str) -> str:
+    return model if ":" in model else f"{model}:latest"
+
+def _prompt_length(request: dict) -> int:
+    if "messages" in request:
+        return sum(len(message.get("content", "")) for message in request["messages"])
+    return len(request.get("prompt", ""))
+
+def _chunk(path: str, request: dict, text: str, done: bool, **fields) -> dict:
+    body = {"model": request.get("model"), "created_at": _now(), "done": done}
+    if path == "/api/chat":
+        body["message"] = {"role": "assistant", "content": text}
+    else:
+        body["response"] = text
+    if done:
+        body["done_reason"] = "stop"
+    body.update(fields)
+    return body
+
+def _merge(path: str, chunks: List[TimedChunk]) -> dict:
+    """Return the non-streaming reply made of a stream's chunks."""
+    final = dict(chunks[-1][1])
+    if path == "/api/chat":
+        text = "".join(chunk.get("message", {}).get("content", "") for _, chunk in chunks)
+        final["message"] = {"role": "assistant", "content": text}
+    else:
+        final["response"] = "".join(chunk.get("response", "") for _, chunk in chunks)
+    return final
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m llamachat.bench.stub_server",
+        description="Run a local stand-in for the Ollama API."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", default="llama3.2:latest")
+    parser.add_argument("--tokens", type=int, default=64, help="tokens per synthetic reply")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--ttft", type=float, default=0.05, help="delay before the first token, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variation of token intervals, as a fraction")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of streams cut off part way")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--cassette", help="replay streams recorded with LLAMA_RECORD_CASSETTE")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="multiplier for recorded delays (0 = no delays)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = StubOllamaServer(
+        host=args.host,
+        port=args.port,
+        model=args.model,
+        tokens=args.tokens,
+        tokens_per_second=args.tokens_per_second,
+        ttft=args.ttft,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        drop_rate=args.drop_rate,
+        seed=args.seed,
+        cassette=args.cassette,
+        replay_speed=args.replay_speed
+    )
+    logger.info(f"Stand-in Ollama server listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional
 import os
 import json
 import logging
@@ -10,10 +10,29 @@ logger = logging.getLogger(__name__)
 class AppConfig:
     model_name: str = "llama3.2"
     temperature: float = 0.7
-    max_retries: int = 3
+    max_retries: int = 3  # retries for transient connection failures
+    resume_streams: bool = True  # continue a broken stream from its partial reply
+    ollama_hosts: str = ""  # comma-separated Ollama URLs (empty = OLLAMA_HOST or localhost)
+    num_parallel: int = 4  # keep in step with the server's OLLAMA_NUM_PARALLEL
+    context_tokens: int = 3072  # prompt budget for history sent with each message
+    keep_alive: str = "30m"  # how long Ollama keeps the model loaded after a request
+    idle_unload_minutes: float = 0  # unload models unused for this long (0 = never)
+    model_memory_limit_mb: int = 0  # unload least recently used models above this (0 = no limit)
+    response_cache_mb: int = 8  # in-memory cache of deterministic replies
+    response_cache_disk_mb: int = 64  # cache of deterministic replies in the database
+    history_page_size: int = 50  # messages loaded at a time when opening or scrolling a chat
+    history_memory_mb: int = 4  # message text kept in memory per open chat
+    history_cache_messages: int = 2000  # messages kept loaded across recently viewed chats
+    history_cache_mb: int = 16  # message text kept loaded across recently viewed chats
+    record_cassette: str = ""  # append every reply stream to this file for replay
     database_url: str = f"sqlite:///{os.path.expanduser('~')}/Library/Application Support/LlamaChat/llamachat.db"
     log_level: str = "INFO"
     
+    @property
+    def host_urls(self) -> List[Optional[str]]:
+        """Return the configured Ollama hosts; ``None`` is the client's default."""
+        return [host.strip() for host in self.ollama_hosts.split(",") if host.strip()] or [None]
+
     @classmethod
     def load(cls, config_path: Optional[str] = None) -> 'AppConfig':
         """Load configuration from file or environment."""
@@ -30,6 +49,22 @@ class AppConfig:
             model_name=os.getenv("LLAMA_MODEL", cls.model_name),
             temperature=float(os.getenv("LLAMA_TEMPERATURE", cls.temperature)),
             max_retries=int(os.getenv("LLAMA_MAX_RETRIES", cls.max_retries)),
+            resume_streams=os.getenv(
+                "LLAMA_RESUME_STREAMS", str(cls.resume_streams)
+            ).lower() in ("1", "true", "yes"),
+            ollama_hosts=os.getenv("OLLAMA_HOSTS", cls.ollama_hosts),
+            num_parallel=int(os.getenv("OLLAMA_NUM_PARALLEL", cls.num_parallel)),
+            context_tokens=int(os.getenv("LLAMA_CONTEXT_TOKENS", cls.context_tokens)),
+            keep_alive=os.getenv("LLAMA_KEEP_ALIVE", cls.keep_alive),
+            idle_unload_minutes=float(os.getenv("LLAMA_IDLE_UNLOAD_MINUTES", cls.idle_unload_minutes)),
+            model_memory_limit_mb=int(os.getenv("LLAMA_MODEL_MEMORY_LIMIT_MB", cls.model_memory_limit_mb)),
+            response_cache_mb=int(os.getenv("LLAMA_RESPONSE_CACHE_MB", cls.response_cache_mb)),
+            response_cache_disk_mb=int(os.getenv("LLAMA_RESPONSE_CACHE_DISK_MB", cls.response_cache_disk_mb)),
+            history_page_size=int(os.getenv("LLAMA_HISTORY_PAGE_SIZE", cls.history_page_size)),
+            history_memory_mb=int(os.getenv("LLAMA_HISTORY_MEMORY_MB", cls.history_memory_mb)),
+            history_cache_messages=int(os.getenv("LLAMA_HISTORY_CACHE_MESSAGES", cls.history_cache_messages)),
+            history_cache_mb=int(os.getenv("LLAMA_HISTORY_CACHE_MB", cls.history_cache_mb)),
+            record_cassette=os.getenv("LLAMA_RECORD_CASSETTE", cls.record_cassette),
             database_url=os.getenv("DATABASE_URL", cls.database_url),
             log_level=os.getenv("LOG_LEVEL", cls.log_level)
         ) 
\ No newline at end of file
@@ -1,18 +1,46 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event
 from typing import Generator
 from llamachat.config import AppConfig
+from llamachat.database.migrations import migrate
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Per-connection SQLite settings. WAL lets the reader threads query while the
+# writer commits, and with synchronous=NORMAL a commit only appends to the
+# log instead of syncing the database file; a power loss can lose the last
+# commits but never corrupts the database.
+SQLITE_PRAGMAS = {
+    # Lets freed pages be returned to the file system a few at a time; takes
+    # effect on new databases, and on older ones after their next VACUUM
+    # (see enable_incremental_vacuum)
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -32 * 1024,  # KiB, per connection
+    "mmap_size": 256 * 1024 * 1024,  # bytes of the file read through memory mapping
+    "temp_store": "MEMORY",
+}
+AUTO_VACUUM_INCREMENTAL = 2  # value of PRAGMA auto_vacuum
+
 def get_engine():
     """Get SQLAlchemy engine with proper configuration."""
-    return create_engine(
+    engine = create_engine(
         AppConfig.database_url,
         pool_pre_ping=True,
         pool_recycle=3600,
         echo=False
     )
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    return engine
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
 
 engine = None
 
@@ -22,6 +50,9 @@ def init_db():
     try:
         engine = get_engine()
         SQLModel.metadata.create_all(engine)
+        migrate(engine)
+        if engine.dialect.name == "sqlite":
+            enable_incremental_vacuum()
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
@@ -32,4 +63,40 @@ def get_session() -> Generator[Session, None, None]:
     if engine is None:
         init_db()
     with Session(engine) as session:
-        yield session 
\ No newline at end of file
+        yield session
+
+def open_session() -> Session:
+    """Open a session for one unit of work.
+
+    Objects stay readable after the commit, so they can be handed to code
+    that runs after the session is closed.
+    """
+    if engine is None:
+        init_db()
+    return Session(engine, expire_on_commit=False)
+
+def open_connection():
+    """Open a DB-API connection for statements that can't run in a transaction."""
+    if engine is None:
+        init_db()
+    return engine.raw_connection()
+
+def enable_incremental_vacuum():
+    """Switch a database from before incremental auto-vacuum to it.
+
+    An existing database only changes its auto_vacuum mode with a full
+    VACUUM, which rewrites the file and would hold up every write if run
+    later. It runs here, at startup before anything else uses the
+    database, and only once there are free pages worth reclaiming.
+    """
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+            return
+        if not cursor.execute("PRAGMA freelist_count").fetchone()[0]:
+            return
+        logger.info("Converting the database to incremental auto-vacuum")
+        cursor.execute("VACUUM")
+    finally:
+        connection.close()
@@ -0,0 +1,114 @@
+from typing import Callable, List, Tuple
+import logging
+from sqlmodel import SQLModel
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from llamachat.database.models import CHARS_PER_TOKEN, MESSAGE_OVERHEAD_TOKENS, PREVIEW_LENGTH
+
+logger = logging.getLogger(__name__)
+
+def add_missing_columns(connection: Connection):
+    """Add columns introduced after a table was created.
+
+    ``create_all`` only creates missing tables, so databases from older
+    versions would otherwise lack newly added model fields.
+    """
+    inspector = inspect(connection)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(connection.dialect)
+            default = column.default.arg if column.default is not None and column.default.is_scalar else None
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+            if default is not None:
+                ddl += f" NOT NULL DEFAULT {int(default) if isinstance(default, bool) else repr(default)}"
+            connection.execute(text(ddl))
+            logger.info(f"Added column {table.name}.{column.name}")
+
+def fill_last_message_times(connection: Connection):
+    """Set ``chat.last_message_at`` on chats from before the column existed."""
+    connection.execute(text(
+        "UPDATE chat SET last_message_at = COALESCE("
+        "(SELECT MAX(created_at) FROM message WHERE message.chat_id = chat.id), created_at) "
+        "WHERE last_message_at IS NULL"
+    ))
+
+def fill_chat_totals(connection: Connection):
+    """Set the message totals and previews of chats from before the columns existed."""
+    connection.execute(text(
+        "UPDATE chat SET "
+        "message_count = (SELECT COUNT(*) FROM message WHERE message.chat_id = chat.id), "
+        "token_total = (SELECT COALESCE(SUM(COALESCE(token_count, "
+        f"LENGTH(content) / {CHARS_PER_TOKEN} + {MESSAGE_OVERHEAD_TOKENS})), 0) "
+        "FROM message WHERE message.chat_id = chat.id), "
+        f"preview = COALESCE((SELECT SUBSTR(content, 1, {PREVIEW_LENGTH}) FROM message "
+        "WHERE message.chat_id = chat.id ORDER BY created_at DESC, id DESC LIMIT 1), '')"
+    ))
+
+def create_missing_indexes(connection: Connection):
+    """Create the models' indexes that tables created by older versions lack."""
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    # Let the query planner see the new indexes' statistics
+    connection.execute(text("ANALYZE"))
+
+def create_search_index(connection: Connection):
+    """Index message text and chat titles for full-text search.
+
+    The FTS5 tables read their text from ``message`` and ``chat`` and are
+    kept in step with them by triggers, so writes index themselves.
+    """
+    for table, column in (("message", "content"), ("chat", "title")):
+        fts = f"{table}_fts"
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{column}, content='{table}', content_rowid='id', "
+            # Prefix indexes keep searches for partly typed words fast
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {column} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+            f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END"
+        ))
+        # Index the rows written before the table existed
+        connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+# Applied in order to databases whose schema version is lower than their
+# position in the list (1-based). Append new migrations; never reorder them.
+# Fresh databases run them too, after ``create_all``, so they must be no-ops
+# on an up-to-date schema.
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("add columns introduced before schema versioning", add_missing_columns),
+    ("fill chat.last_message_at", fill_last_message_times),
+    ("index messages by chat and time, chats by creation time", create_missing_indexes),
+    ("full-text index of messages and chat titles", create_search_index),
+    ("add chat.deleted", add_missing_columns),
+    ("add chat.message_count, token_total and preview", add_missing_columns),
+    ("fill chat message totals and previews", fill_chat_totals),
+]
+
+def schema_version(connection: Connection) -> int:
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+def migrate(engine: Engine):
+    """Bring the database schema up to date, recording its version in ``user_version``."""
+    with engine.begin() as connection:
+        version = schema_version(connection)
+        for number, (description, migration) in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(connection)
+            connection.execute(text(f"PRAGMA user_version = {number}"))
+            logger.info(f"Applied database migration {number}: {description}")
@@ -1,23 +1,62 @@
 from datetime import datetime
 from typing import Optional, List
 from sqlmodel import Field, SQLModel, Relationship
+from sqlalchemy import Index
+
+PREVIEW_LENGTH = 100  # characters of the newest message kept with its chat
+# Rough characters-per-token ratio for English text with Llama tokenizers
+CHARS_PER_TOKEN = 4
+# Per-message overhead for the chat template's role markers
+MESSAGE_OVERHEAD_TOKENS = 4
 
 class Chat(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    # Time of the newest message, or of creation while empty; orders the sidebar
+    last_message_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    summary: Optional[str] = None  # rolling summary of turns outside the context window
+    summary_until_id: Optional[int] = None  # last message covered by the summary
+    # Deleted chats are hidden at once and purged with their messages later
+    deleted: bool = Field(default=False)
+    # Totals of the chat's messages, kept up to date by each new message so
+    # the sidebar doesn't have to aggregate them
+    message_count: int = Field(default=0)
+    token_total: int = Field(default=0)  # estimated prompt tokens
+    preview: str = Field(default="")  # start of the newest message
     messages: List["Message"] = Relationship(back_populates="chat")
 
 class Message(SQLModel, table=True):
+    # A chat's messages in order, for paging through history and reading its tail
+    __table_args__ = (Index("ix_message_chat_id_created_at", "chat_id", "created_at", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     content: str
     role: str  # 'user' or 'assistant'
     created_at: datetime = Field(default_factory=datetime.utcnow)
     chat_id: int = Field(foreign_key="chat.id")
+    truncated: bool = Field(default=False)  # generation was stopped early
+    token_count: Optional[int] = None  # cached prompt token estimate
+    # Generation metrics of assistant replies (durations from Ollama in ns)
+    model: Optional[str] = None
+    host: Optional[str] = None
+    prompt_eval_count: Optional[int] = None
+    eval_count: Optional[int] = None
+    eval_duration: Optional[int] = None
+    load_duration: Optional[int] = None
+    time_to_first_token: Optional[float] = None  # seconds, measured by the client
+    wall_time: Optional[float] = None  # seconds, measured by the client
     chat: Chat = Relationship(back_populates="messages")
 
 class Settings(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     model_name: str = Field(default="llama3.2")
     temperature: float = Field(default=0.7)
-    max_tokens: int = Field(default=2000) 
\ No newline at end of file
+    max_tokens: int = Field(default=2000) 
+
+class CachedResponse(SQLModel, table=True):
+    key: str = Field(primary_key=True)  # hash of model, options and messages
+    model: str
+    content: str
+    size: int
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -89,7 +89,7 @@ def main():
         
         # Create main window
         try:
-            window = MainWindow()
+            window = MainWindow(config)
             window.show()
             logger.info("Main window created and shown")
         except Exception as e:
@@ -99,6 +99,10 @@ def main():
         # Run event loop
         with loop:
             loop.run_forever()
+            # The window is gone; close the connections to the Ollama hosts
+            # and commit the writes still queued
+            loop.run_until_complete(window.ollama_service.close())
+            loop.run_until_complete(window.db_service.close())
             
     except KeyboardInterrupt:
         logger.info("Application terminated by user")
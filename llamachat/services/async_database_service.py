@@ -0,0 +1,179 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Tuple
+import asyncio
+import functools
+import logging
+import threading
+
+from llamachat.services.database_service import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+_Write = Tuple[Callable[[], Any], Future]
+
+class AsyncDatabaseService:
+    """Run ``DatabaseService`` operations off the event loop thread.
+
+    Reads run on a small pool of reader threads, each operation in its own
+    session. Writes are serialized through a single writer thread: writes
+    that arrive while a commit is in progress are queued and committed
+    together in the next transaction, so a burst of writes costs one commit.
+    If a batch fails, its writes are retried one by one so that only the
+    failing write reports an error.
+
+    Methods mirror those of ``DatabaseService`` and return its results.
+    """
+
+    def __init__(self, db_service: DatabaseService = None, readers: int = 2):
+        self.db_service = db_service or DatabaseService()
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="db-reader")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._pending: Deque[_Write] = deque()
+        self._lock = threading.Lock()
+        self._draining = False
+
+    async def read(self, function: Callable, *args, **kwargs):
+        """Run a read operation on a reader thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, functools.partial(function, *args, **kwargs))
+
+    async def write(self, function: Callable, *args, **kwargs):
+        """Queue a write operation for the writer thread and wait until it is committed."""
+        future: Future = Future()
+        with self._lock:
+            self._pending.append((functools.partial(function, *args, **kwargs), future))
+            if not self._draining:
+                self._draining = True
+                self._writer.submit(self._drain)
+        return await asyncio.wrap_future(future)
+
+    def _drain(self):
+        try:
+            while True:
+                with self._lock:
+                    # Writes whose callers were cancelled while queued are
+                    # dropped; the others can no longer be cancelled
+                    batch = [write for write in self._pending if write[1].set_running_or_notify_cancel()]
+                    self._pending.clear()
+                    if not batch:
+                        return
+                self._commit(batch)
+        finally:
+            with self._lock:
+                # Writes queued while this drain was finishing or failing
+                # would otherwise wait forever
+                self._draining = bool(self._pending)
+                if self._draining:
+                    self._writer.submit(self._drain)
+
+    def _commit(self, batch: list):
+        results = []
+        try:
+            with self.db_service.batch():
+                for operation, _ in batch:
+                    results.append(operation())
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            logger.warning(f"Batch of {len(batch)} writes failed, retrying one by one: {e}")
+            for write in batch:
+                self._commit([write])
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    async def close(self):
+        """Finish queued writes and stop the threads."""
+        # Committed after the writes queued before it; shutting the writer
+        # down first would keep a running drain from scheduling the rest
+        await self.write(lambda: None)
+        await asyncio.to_thread(self._shutdown)
+
+    def _shutdown(self):
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+
+    # Reads
+
+    async def get_all_chats(self, *args, **kwargs):
+        return await self.read(self.db_service.get_all_chats, *args, **kwargs)
+
+    async def get_chat_page(self, *args, **kwargs):
+        return await self.read(self.db_service.get_chat_page, *args, **kwargs)
+
+    async def get_chat(self, *args, **kwargs):
+        return await self.read(self.db_service.get_chat, *args, **kwargs)
+
+    async def get_chat_messages(self, *args, **kwargs):
+        return await self.read(self.db_service.get_chat_messages, *args, **kwargs)
+
+    async def get_message_page(self, *args, **kwargs):
+        return await self.read(self.db_service.get_message_page, *args, **kwargs)
+
+    async def get_newer_message_page(self, *args, **kwargs):
+        return await self.read(self.db_service.get_newer_message_page, *args, **kwargs)
+
+    async def get_message_window(self, *args, **kwargs):
+        return await self.read(self.db_service.get_message_window, *args, **kwargs)
+
+    async def search(self, *args, **kwargs):
+        return await self.read(self.db_service.search, *args, **kwargs)
+
+    async def get_message_contents(self, *args, **kwargs):
+        return await self.read(self.db_service.get_message_contents, *args, **kwargs)
+
+    async def get_chat_metrics(self, *args, **kwargs):
+        return await self.read(self.db_service.get_chat_metrics, *args, **kwargs)
+
+    async def get_recent_messages(self, *args, **kwargs):
+        return await self.read(self.db_service.get_recent_messages, *args, **kwargs)
+
+    async def get_messages_between(self, *args, **kwargs):
+        return await self.read(self.db_service.get_messages_between, *args, **kwargs)
+
+    get_message_metrics = staticmethod(DatabaseService.get_message_metrics)
+
+    # Writes
+
+    async def create_chat(self, *args, **kwargs):
+        return await self.write(self.db_service.create_chat, *args, **kwargs)
+
+    async def add_message(self, *args, **kwargs):
+        return await self.write(self.db_service.add_message, *args, **kwargs)
+
+    async def update_chat_summary(self, *args, **kwargs):
+        return await self.write(self.db_service.update_chat_summary, *args, **kwargs)
+
+    async def get_cached_response(self, *args, **kwargs):
+        # Also records the access time of the entry
+        return await self.write(self.db_service.get_cached_response, *args, **kwargs)
+
+    async def put_cached_response(self, *args, **kwargs):
+        return await self.write(self.db_service.put_cached_response, *args, **kwargs)
+
+    async def evict_cached_responses(self, *args, **kwargs):
+        return await self.write(self.db_service.evict_cached_responses, *args, **kwargs)
+
+    async def delete_chats(self, *args, **kwargs):
+        return await self.write(self.db_service.delete_chats, *args, **kwargs)
+
+    async def purge_deleted_chats(self, *args, **kwargs):
+        return await self.write(self.db_service.purge_deleted_chats, *args, **kwargs)
+
+    async def merge_search_index(self, *args, **kwargs):
+        return await self.write(self.db_service.merge_search_index, *args, **kwargs)
+
+    async def rename_chat(self, *args, **kwargs):
+        return await self.write(self.db_service.rename_chat, *args, **kwargs)
+
+    # Maintenance
+
+    async def reclaim_space(self, *args, **kwargs):
+        # Can't run in a write batch's transaction; the writer thread runs it
+        # between batches
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._writer, functools.partial(self.db_service.reclaim_space, *args, **kwargs)
+        )
@@ -0,0 +1,75 @@
+from typing import Dict, List
+import hashlib
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+def cassette_key(path: str, request: dict) -> str:
+    """Return the key that identifies a request in a cassette.
+
+    Only what determines the reply is hashed: endpoint, model and the
+    conversation (or prompt). Options such as ``keep_alive`` are ignored.
+    """
+    payload = json.dumps(
+        {
+            "path": path,
+            "model": request.get("model"),
+            "messages": request.get("messages"),
+            "prompt": request.get("prompt"),
+        },
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def load_cassette(path: str) -> List[dict]:
+    """Read the interactions recorded in a cassette file."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+class Recording:
+    """One stream being captured; written to the cassette by ``finish``."""
+
+    def __init__(self, recorder: "CassetteRecorder", path: str, request: dict):
+        self.recorder = recorder
+        self.path = path
+        self.request = request
+        self.chunks: List[dict] = []
+        self.offsets: List[float] = []
+        self._start = time.perf_counter()
+
+    def add(self, chunk):
+        """Capture a streamed response object as it arrived."""
+        self.chunks.append(chunk.model_dump(mode="json", exclude_none=True))
+        self.offsets.append(time.perf_counter() - self._start)
+
+    def finish(self):
+        self.recorder.write({
+            "key": cassette_key(self.path, self.request),
+            "path": self.path,
+            "request": self.request,
+            "chunks": self.chunks,
+            "offsets": self.offsets,
+        })
+
+class CassetteRecorder:
+    """Append complete Ollama streams to a JSON Lines cassette file.
+
+    Cassettes are replayed by the stand-in server in ``llamachat.bench``
+    to reproduce real streams, including their timing, without a model.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def start(self, path: str, request: dict) -> Recording:
+        return Recording(self, path, request)
+
+    def write(self, interaction: Dict):
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(interaction, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write cassette {self.path}: {e}")
@@ -0,0 +1,92 @@
+from typing import Awaitable, Callable, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised instead of contacting a host that is known to be down."""
+    pass
+
+class CircuitBreaker:
+    """Fail fast while the Ollama host is unreachable.
+
+    After ``failure_threshold`` consecutive connection failures the circuit
+    opens and requests are rejected immediately instead of each waiting
+    through its own timeouts and retries. While open, ``probe`` (a cheap
+    health check) runs every ``reset_timeout`` seconds; the first success
+    closes the circuit again. Once the timeout has elapsed a single real
+    request is also let through as a trial.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, probe: Optional[Callable[[], Awaitable[bool]]] = None,
+                 failure_threshold: int = 3, reset_timeout: float = 10.0):
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @property
+    def retry_in(self) -> float:
+        """Return the seconds until the next trial request is allowed."""
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def check(self):
+        """Raise ``CircuitOpenError`` if requests should not be attempted."""
+        if self.state == self.CLOSED:
+            return
+        if not self.retry_in:
+            # Let one request through to find out whether the host is back
+            self.state = self.HALF_OPEN
+            self._opened_at = time.monotonic()
+            return
+        raise CircuitOpenError(
+            f"Ollama is not reachable, retrying in {self.retry_in:.0f}s"
+        )
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info("Ollama is reachable again, closing circuit")
+        self.state = self.CLOSED
+        self.failures = 0
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        if self.state != self.OPEN:
+            logger.warning(f"Ollama unreachable after {self.failures} failures, opening circuit")
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        if self.probe is not None and (self._probe_task is None or self._probe_task.done()):
+            try:
+                self._probe_task = asyncio.get_running_loop().create_task(self._probe_until_healthy())
+            except RuntimeError:
+                pass  # no running loop; the next request acts as the trial
+
+    async def _probe_until_healthy(self):
+        while self.state != self.CLOSED:
+            await asyncio.sleep(self.retry_in or self.reset_timeout)
+            try:
+                healthy = await self.probe()
+            except Exception as e:
+                logger.debug(f"Health probe failed: {e}")
+                healthy = False
+            if healthy:
+                self._probe_task = None
+                self.record_success()
+            else:
+                self._opened_at = time.monotonic()
@@ -0,0 +1,103 @@
+from typing import Dict, List, Optional, Set
+import asyncio
+import logging
+from llamachat.database.models import CHARS_PER_TOKEN, MESSAGE_OVERHEAD_TOKENS
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an "
+    "assistant. Update the summary with the new messages below. Keep names, "
+    "facts, decisions, code identifiers and open questions; drop small talk. "
+    "Answer with the updated summary only."
+)
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of prompt tokens a message costs."""
+    return len(text) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+class ContextBuilder:
+    """Fit a chat's history into a token budget for the next request.
+
+    The newest messages are sent verbatim for as long as they fit. Older turns
+    are represented by the chat's rolling summary, which is brought up to date
+    in the background after a reply so that building the context never waits
+    on the model. Only the newest rows are read from the database, so the cost
+    of a turn does not grow with the length of the chat.
+    """
+
+    def __init__(self, db_service, ollama_service, token_budget: int = 3072):
+        self.db_service = db_service
+        self.ollama_service = ollama_service
+        self.token_budget = token_budget
+        self._summarizing: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()  # summaries in progress
+
+    async def build(self, chat_id: int) -> List[Dict[str, str]]:
+        """Return the messages to send to Ollama for the chat's next reply."""
+        chat = await self.db_service.get_chat(chat_id)
+        summary = chat.summary if chat else None
+        budget = self.token_budget
+        if summary:
+            budget -= estimate_tokens(summary)
+
+        messages, has_older = await self.db_service.get_recent_messages(chat_id, budget)
+        context = [{"role": msg.role, "content": msg.content} for msg in messages]
+        if has_older and summary:
+            context.insert(0, {
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{summary}"
+            })
+        return context
+
+    def schedule_summary(self, chat_id: int):
+        """Bring the chat's summary up to date in the background if needed."""
+        if chat_id in self._summarizing:
+            return
+        self._summarizing.add(chat_id)
+        task = asyncio.create_task(self._update_summary(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(lambda _: self._summary_done(chat_id, task))
+
+    def _summary_done(self, chat_id: int, task: asyncio.Task):
+        self._summarizing.discard(chat_id)
+        self._tasks.discard(task)
+
+    async def _update_summary(self, chat_id: int):
+        try:
+            while True:
+                chat = await self.db_service.get_chat(chat_id)
+                if chat is None:
+                    return
+                summary = chat.summary or ""
+                budget = self.token_budget
+                if summary:
+                    budget -= estimate_tokens(summary)
+
+                recent, has_older = await self.db_service.get_recent_messages(chat_id, budget)
+                if not has_older or not recent:
+                    return
+                # Summarize the turns that fell out of the window and are not
+                # covered yet, at most one budget's worth per round
+                pending = await self.db_service.get_messages_between(
+                    chat_id,
+                    after_id=chat.summary_until_id,
+                    before_id=recent[0].id,
+                    token_budget=self.token_budget // 2
+                )
+                if not pending:
+                    return
+
+                transcript = "\n\n".join(f"{msg.role}: {msg.content}" for msg in pending)
+                prompt = f"Current summary:\n{summary or '(empty)'}\n\nNew messages:\n{transcript}"
+                new_summary = await self.ollama_service.get_completion(
+                    [
+                        {"role": "system", "content": SUMMARY_PROMPT},
+                        {"role": "user", "content": prompt},
+                    ],
+                    queue_key=("summary", chat_id)
+                )
+                await self.db_service.update_chat_summary(chat_id, new_summary.strip(), pending[-1].id)
+                logger.debug(f"Summarized {len(pending)} messages of chat {chat_id}")
+        except Exception as e:
+            logger.warning(f"Failed to update summary for chat {chat_id}: {e}")
@@ -0,0 +1,63 @@
+from typing import Awaitable, Callable, Optional
+import asyncio
+import logging
+from llamachat.services.async_database_service import AsyncDatabaseService
+
+logger = logging.getLogger(__name__)
+
+class DatabaseCompactor:
+    """Purge deleted chats and shrink the database file while the app is idle.
+
+    Work starts ``delay`` seconds after the last call to ``schedule`` and is
+    done in short steps on the database writer thread, so writes made in the
+    meantime wait for one step at most. It pauses while ``is_busy`` returns
+    true, e.g. while replies are being generated. After purging messages the
+    search index is merged to drop their entries, and finally free pages
+    are returned to the file system.
+    """
+
+    def __init__(self, db_service: AsyncDatabaseService, delay: float = 5.0,
+                 purge_batch: int = 100, merge_pages: int = 16, vacuum_pages: int = 256,
+                 is_busy: Callable[[], bool] = lambda: False):
+        self.db_service = db_service
+        self.delay = delay
+        self.purge_batch = purge_batch  # messages deleted per step
+        self.merge_pages = merge_pages  # search index pages written per step
+        self.vacuum_pages = vacuum_pages  # pages returned to the file system per step
+        self.is_busy = is_busy
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self):
+        """Compact once the app has been idle for ``delay`` seconds."""
+        if self._task is not None:
+            self._task.cancel()
+        self._task = asyncio.ensure_future(self._compact())
+        self._task.add_done_callback(self._task_done)
+
+    async def _compact(self):
+        await asyncio.sleep(self.delay)
+        purged = 0
+        while True:
+            removed = await self._step(self.db_service.purge_deleted_chats, self.purge_batch)
+            purged += removed
+            if removed < self.purge_batch:
+                break
+        if purged:
+            while await self._step(self.db_service.merge_search_index, self.merge_pages):
+                pass
+        while await self._step(self.db_service.reclaim_space, self.vacuum_pages):
+            pass
+
+    async def _step(self, operation: Callable[[int], Awaitable], amount: int):
+        """Run one step of work once the app isn't busy."""
+        while self.is_busy():
+            await asyncio.sleep(self.delay)
+        result = await operation(amount)
+        await asyncio.sleep(0)
+        return result
+
+    def _task_done(self, task: asyncio.Task):
+        if task is self._task:
+            self._task = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Compacting the database failed: {task.exception()}")
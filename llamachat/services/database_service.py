@@ -1,77 +1,435 @@
-from typing import List, Optional
-from sqlmodel import select
-from llamachat.database.models import Chat, Message, Settings
-from llamachat.database.database import get_session
+from contextlib import contextmanager
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+import threading
+from sqlmodel import Session, select, func
+from sqlalchemy import delete, exists, text, tuple_, update
+from llamachat.database.models import PREVIEW_LENGTH, Chat, Message, Settings, CachedResponse
+from llamachat.database.database import AUTO_VACUUM_INCREMENTAL, open_connection, open_session
+from llamachat.services.context_builder import estimate_tokens
+from llamachat.services.generation_metrics import ChatMetrics, GenerationMetrics
+from llamachat.services.search import HIGHLIGHT_END, HIGHLIGHT_START, SearchResult, fts_query, highlight
+
+logger = logging.getLogger(__name__)
+
+SNIPPET_TOKENS = 12  # words of context around matches in search results
+# Only the newest this many matching messages are ranked, which bounds the
+# cost of short, common search terms on long histories
+RANKED_MESSAGES = 2000
 
 class DatabaseService:
+    """Queries and updates of chats, messages and cached responses.
+
+    Every operation opens its own short-lived session, so loaded rows don't
+    accumulate in a long-lived identity map and operations can run on any
+    thread. Inside ``batch`` the operations of the calling thread share one
+    transaction that is committed at the end of the block.
+    """
+
     def __init__(self):
-        self.session = next(get_session())
+        self._local = threading.local()
+
+    @contextmanager
+    def session_scope(self) -> Iterator[Session]:
+        """Yield a session for one operation and commit it, unless inside ``batch``."""
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            yield session
+            session.flush()
+            return
+        with open_session() as session:
+            yield session
+            session.commit()
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Run this thread's operations in the block in a single transaction."""
+        with open_session() as session:
+            self._local.session = session
+            try:
+                yield
+                session.commit()
+            finally:
+                self._local.session = None
 
     def create_chat(self, title: str = "New Chat") -> Chat:
-        chat = Chat(title=title)
-        self.session.add(chat)
-        self.session.commit()
-        self.session.refresh(chat)
-        return chat
+        with self.session_scope() as session:
+            chat = Chat(title=title)
+            session.add(chat)
+            return chat
 
     def get_all_chats(self) -> List[Chat]:
-        statement = select(Chat).order_by(Chat.created_at.desc())
-        return self.session.exec(statement).all()
+        with self.session_scope() as session:
+            statement = select(Chat).where(Chat.deleted == False).order_by(Chat.created_at.desc())
+            return session.exec(statement).all()
+
+    def get_chat_page(self, after: Optional[Tuple[datetime, int]], limit: int) -> List[Chat]:
+        """Return up to ``limit`` chats by most recent activity, after ``after``.
+
+        ``after`` is the ``(last_message_at, id)`` of the last chat already
+        loaded, or None for the first page.
+        """
+        with self.session_scope() as session:
+            statement = select(Chat).where(Chat.deleted == False)
+            if after is not None:
+                statement = statement.where(tuple_(Chat.last_message_at, Chat.id) < tuple_(*after))
+            statement = statement.order_by(Chat.last_message_at.desc(), Chat.id.desc()).limit(limit)
+            return session.exec(statement).all()
 
     def get_chat(self, chat_id: int) -> Optional[Chat]:
-        statement = select(Chat).where(Chat.id == chat_id)
-        return self.session.exec(statement).first()
+        with self.session_scope() as session:
+            chat = session.get(Chat, chat_id)
+            return None if chat is None or chat.deleted else chat
 
-    def add_message(self, chat_id: int, content: str, role: str) -> Message:
-        message = Message(content=content, role=role, chat_id=chat_id)
-        self.session.add(message)
-        self.session.commit()
-        self.session.refresh(message)
-        return message
+    def add_message(self, chat_id: int, content: str, role: str, truncated: bool = False,
+                    metrics: Optional[GenerationMetrics] = None) -> Message:
+        with self.session_scope() as session:
+            message = Message(
+                content=content,
+                role=role,
+                chat_id=chat_id,
+                truncated=truncated,
+                token_count=estimate_tokens(content),
+                **(asdict(metrics) if metrics else {})
+            )
+            session.add(message)
+            session.execute(
+                update(Chat)
+                .where(Chat.id == chat_id)
+                .values(
+                    last_message_at=message.created_at,
+                    message_count=Chat.message_count + 1,
+                    token_total=Chat.token_total + message.token_count,
+                    preview=content[:PREVIEW_LENGTH]
+                )
+            )
+            return message
 
     def get_chat_messages(self, chat_id: int) -> List[Message]:
-        statement = select(Message).where(Message.chat_id == chat_id).order_by(Message.created_at)
-        return self.session.exec(statement).all()
+        with self.session_scope() as session:
+            statement = select(Message).where(Message.chat_id == chat_id).order_by(Message.created_at)
+            return session.exec(statement).all()
+
+    def get_message_page(self, chat_id: int, before: Optional[Tuple[datetime, int]],
+                         limit: int) -> List[Message]:
+        """Return up to ``limit`` messages older than ``before``, oldest first.
+
+        ``before`` is the ``(created_at, id)`` of the oldest message already
+        loaded, or None for the newest page. Seeking on the key instead of
+        using an offset keeps every page equally cheap in long chats.
+        """
+        with self.session_scope() as session:
+            statement = select(Message).where(Message.chat_id == chat_id)
+            if before is not None:
+                statement = statement.where(tuple_(Message.created_at, Message.id) < tuple_(*before))
+            statement = statement.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit)
+            messages = list(session.exec(statement))
+        messages.reverse()
+        return messages
+
+    def get_newer_message_page(self, chat_id: int, after: Tuple[datetime, int], limit: int) -> List[Message]:
+        """Return up to ``limit`` messages newer than ``after``, oldest first."""
+        with self.session_scope() as session:
+            statement = (
+                select(Message)
+                .where(Message.chat_id == chat_id, tuple_(Message.created_at, Message.id) > tuple_(*after))
+                .order_by(Message.created_at, Message.id)
+                .limit(limit)
+            )
+            return session.exec(statement).all()
+
+    def get_message_window(self, chat_id: int, message_id: int, limit: int) -> Tuple[List[Message], bool, bool]:
+        """Return about ``limit`` messages around a message, oldest first.
+
+        The second and third values tell whether there are older and newer
+        messages beyond the window. The window is empty if the message
+        doesn't exist in the chat.
+        """
+        with self.session_scope() as session:
+            target = session.get(Message, message_id)
+        if target is None or target.chat_id != chat_id:
+            return [], False, False
+        half = max(1, limit // 2)
+        key = (target.created_at, target.id)
+        older = self.get_message_page(chat_id, key, half)
+        newer = self.get_newer_message_page(chat_id, key, half)
+        return older + [target] + newer, len(older) == half, len(newer) == half
+
+    def search(self, query: str, limit: int = 50) -> List[SearchResult]:
+        """Return the chat titles and messages best matching ``query``, best first."""
+        match = fts_query(query)
+        if match is None:
+            return []
+        # The same snippet without and with highlight markers, to tell the
+        # markers from any marker characters in the text
+        snippet = (
+            f"snippet({{fts}}, 0, '', '', '…', {SNIPPET_TOKENS}), "
+            f"snippet({{fts}}, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', {SNIPPET_TOKENS})"
+        )
+        messages = text(
+            f"SELECT message.chat_id, chat.title, message.id, {snippet.format(fts='message_fts')}, message_fts.rank "
+            "FROM message_fts "
+            "JOIN message ON message.id = message_fts.rowid "
+            "JOIN chat ON chat.id = message.chat_id AND NOT chat.deleted "
+            "WHERE message_fts MATCH :match AND message_fts.rowid >= COALESCE(("
+            "SELECT rowid FROM message_fts WHERE message_fts MATCH :match "
+            "ORDER BY rowid DESC LIMIT 1 OFFSET :ranked), 0) "
+            "ORDER BY message_fts.rank LIMIT :limit"
+        )
+        titles = text(
+            f"SELECT chat.id, chat.title, NULL, {snippet.format(fts='chat_fts')}, chat_fts.rank "
+            "FROM chat_fts JOIN chat ON chat.id = chat_fts.rowid AND NOT chat.deleted "
+            "WHERE chat_fts MATCH :match ORDER BY chat_fts.rank LIMIT :limit"
+        )
+        with self.session_scope() as session:
+            results = [
+                SearchResult(chat_id, title, message_id, highlight(plain, marked), rank)
+                for statement in (titles, messages)
+                for chat_id, title, message_id, plain, marked, rank in session.execute(
+                    statement, {"match": match, "limit": limit, "ranked": RANKED_MESSAGES}
+                )
+            ]
+        results.sort(key=lambda result: result.rank)
+        return results[:limit]
+
+    def get_message_contents(self, message_ids: List[int]) -> Dict[int, str]:
+        """Return the content of the given messages by id."""
+        with self.session_scope() as session:
+            statement = select(Message.id, Message.content).where(Message.id.in_(message_ids))
+            return {message_id: content for message_id, content in session.exec(statement)}
+
+    @staticmethod
+    def get_message_metrics(message: Message) -> Optional[GenerationMetrics]:
+        """Return the generation metrics stored on a message, if any."""
+        if message.wall_time is None:
+            return None
+        return GenerationMetrics(
+            model=message.model,
+            host=message.host,
+            prompt_eval_count=message.prompt_eval_count,
+            eval_count=message.eval_count,
+            eval_duration=message.eval_duration,
+            load_duration=message.load_duration,
+            time_to_first_token=message.time_to_first_token,
+            wall_time=message.wall_time
+        )
+
+    def get_chat_metrics(self, chat_id: Optional[int] = None) -> Dict[int, ChatMetrics]:
+        """Return generation metrics aggregated per chat, for one or all chats."""
+        statement = (
+            select(
+                Message.chat_id,
+                func.count(Message.id),
+                func.coalesce(func.sum(Message.prompt_eval_count), 0),
+                func.coalesce(func.sum(Message.eval_count), 0),
+                func.coalesce(func.sum(Message.eval_duration), 0),
+                func.avg(Message.time_to_first_token),
+                func.coalesce(func.sum(Message.wall_time), 0.0)
+            )
+            .where(Message.wall_time.is_not(None))
+            .group_by(Message.chat_id)
+        )
+        if chat_id is not None:
+            statement = statement.where(Message.chat_id == chat_id)
+        with self.session_scope() as session:
+            return {
+                row[0]: ChatMetrics(
+                    replies=row[1],
+                    prompt_tokens=row[2],
+                    generated_tokens=row[3],
+                    eval_duration=row[4],
+                    average_time_to_first_token=row[5],
+                    wall_time=row[6]
+                )
+                for row in session.exec(statement)
+            }
+
+    def get_recent_messages(self, chat_id: int, token_budget: int) -> Tuple[List[Message], bool]:
+        """Return the newest messages that fit in ``token_budget``, oldest first.
+
+        Rows are read newest-first and reading stops at the first message that
+        does not fit, so only the tail of a long chat is loaded. The newest
+        message is always included. The second value tells whether older
+        messages were left out.
+        """
+        statement = (
+            select(Message)
+            .where(Message.chat_id == chat_id)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .execution_options(yield_per=50)
+        )
+        messages = []
+        used = 0
+        has_older = False
+        with self.session_scope() as session:
+            for message in session.exec(statement):
+                tokens = message.token_count or estimate_tokens(message.content)
+                if messages and used + tokens > token_budget:
+                    has_older = True
+                    break
+                messages.append(message)
+                used += tokens
+        messages.reverse()
+        return messages, has_older
+
+    def get_messages_between(self, chat_id: int, after_id: Optional[int], before_id: int,
+                             token_budget: int) -> List[Message]:
+        """Return messages after ``after_id`` and before ``before_id``, oldest first.
+
+        At most ``token_budget`` tokens' worth is returned (but at least one
+        message), so callers can work through a long range in batches.
+        """
+        statement = select(Message).where(Message.chat_id == chat_id, Message.id < before_id)
+        if after_id is not None:
+            statement = statement.where(Message.id > after_id)
+        statement = statement.order_by(Message.created_at, Message.id).execution_options(yield_per=50)
+        messages = []
+        used = 0
+        with self.session_scope() as session:
+            for message in session.exec(statement):
+                tokens = message.token_count or estimate_tokens(message.content)
+                if messages and used + tokens > token_budget:
+                    break
+                messages.append(message)
+                used += tokens
+        return messages
+
+    def update_chat_summary(self, chat_id: int, summary: str, until_id: int) -> bool:
+        with self.session_scope() as session:
+            chat = session.get(Chat, chat_id)
+            if not chat:
+                return False
+            chat.summary = summary
+            chat.summary_until_id = until_id
+            return True
+
+    def get_cached_response(self, key: str) -> Optional[str]:
+        with self.session_scope() as session:
+            entry = session.get(CachedResponse, key)
+            if entry is None:
+                return None
+            entry.last_used_at = datetime.utcnow()
+            return entry.content
+
+    def put_cached_response(self, key: str, model: str, content: str):
+        with self.session_scope() as session:
+            entry = session.get(CachedResponse, key)
+            if entry is None:
+                entry = CachedResponse(key=key, model=model, content=content, size=len(content.encode("utf-8")))
+                session.add(entry)
+            else:
+                entry.content = content
+                entry.last_used_at = datetime.utcnow()
+
+    def evict_cached_responses(self, max_bytes: int) -> int:
+        """Delete least recently used cache entries until they fit in ``max_bytes``."""
+        with self.session_scope() as session:
+            total = session.exec(select(func.coalesce(func.sum(CachedResponse.size), 0))).one()
+            if total <= max_bytes:
+                return 0
+            evicted = 0
+            statement = select(CachedResponse).order_by(CachedResponse.last_used_at)
+            for entry in session.exec(statement).all():
+                if total <= max_bytes:
+                    break
+                total -= entry.size
+                session.delete(entry)
+                evicted += 1
+            return evicted
 
     def get_settings(self) -> Settings:
-        statement = select(Settings)
-        settings = self.session.exec(statement).first()
-        if not settings:
-            settings = Settings()
-            self.session.add(settings)
-            self.session.commit()
-            self.session.refresh(settings)
-        return settings 
-
-    def delete_chat(self, chat_id: int) -> bool:
+        with self.session_scope() as session:
+            settings = session.exec(select(Settings)).first()
+            if not settings:
+                settings = Settings()
+                session.add(settings)
+            return settings
+
+    def delete_chats(self, chat_ids: List[int]) -> int:
+        """Delete chats, returning how many were deleted.
+
+        The chats are only marked as deleted, which hides them at once
+        however long they are; ``purge_deleted_chats`` removes them and
+        their messages later.
+        """
         try:
-            # First delete all messages associated with the chat
-            statement = select(Message).where(Message.chat_id == chat_id)
-            messages = self.session.exec(statement).all()
-            for message in messages:
-                self.session.delete(message)
-            
-            # Then delete the chat itself
-            chat = self.get_chat(chat_id)
-            if chat:
-                self.session.delete(chat)
-                self.session.commit()
-                return True
-            return False
+            with self.session_scope() as session:
+                statement = (
+                    update(Chat)
+                    .where(Chat.id.in_(chat_ids), Chat.deleted == False)
+                    .values(deleted=True)
+                )
+                return session.execute(statement).rowcount
         except Exception as e:
-            print(f"Error deleting chat: {e}")
-            self.session.rollback()
-            return False
+            logger.error(f"Error deleting chats: {e}")
+            return 0
+
+    def purge_deleted_chats(self, limit: int) -> int:
+        """Remove up to ``limit`` messages of deleted chats, and the chats once empty.
+
+        Returns the number of messages removed; fewer than ``limit`` means
+        the purge is complete. Deleting in bounded steps keeps each
+        transaction, and the full-text index updates its triggers make,
+        short enough not to hold up other writes.
+        """
+        deleted_chats = select(Chat.id).where(Chat.deleted == True)
+        with self.session_scope() as session:
+            batch = select(Message.id).where(Message.chat_id.in_(deleted_chats)).limit(limit)
+            removed = session.execute(delete(Message).where(Message.id.in_(batch))).rowcount
+            if removed < limit:
+                has_messages = exists().where(Message.chat_id == Chat.id)
+                session.execute(delete(Chat).where(Chat.deleted == True, ~has_messages))
+            return removed
+
+    def merge_search_index(self, pages: int) -> bool:
+        """Merge the message search index's segments by about ``pages`` pages.
+
+        Deleted messages stay in the index as delete markers until their
+        segments are merged; this frees their space a step at a time.
+        Returns whether there was anything to merge.
+        """
+        with self.session_scope() as session:
+            changes = session.execute(text("SELECT total_changes()")).scalar()
+            # A negative page count merges segments however few there are
+            session.execute(
+                text("INSERT INTO message_fts(message_fts, rank) VALUES ('merge', :pages)"),
+                {"pages": -pages}
+            )
+            return session.execute(text("SELECT total_changes()")).scalar() - changes >= 2
+
+    def reclaim_space(self, max_pages: int) -> int:
+        """Return up to ``max_pages`` free pages of the database file to the file system.
+
+        Returns the number of free pages left to reclaim. Runs outside any transaction,
+        so it must not be called inside ``batch``. Databases not yet switched
+        to incremental auto-vacuum are left alone; ``init_db`` converts them
+        at the next start.
+        """
+        connection = open_connection()
+        try:
+            cursor = connection.cursor()
+            free_pages = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free_pages:
+                return 0
+            if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+                return 0
+            # executescript steps the pragma to completion; execute would
+            # free a single page
+            connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({max_pages})")
+            return cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        finally:
+            connection.close()
 
     def rename_chat(self, chat_id: int, new_title: str) -> bool:
         try:
-            chat = self.get_chat(chat_id)
-            if chat:
-                chat.title = new_title
-                self.session.commit()
-                return True
-            return False
+            with self.session_scope() as session:
+                chat = session.get(Chat, chat_id)
+                if chat:
+                    chat.title = new_title
+                    return True
+                return False
         except Exception as e:
-            print(f"Error renaming chat: {e}")
-            self.session.rollback()
-            return False
\ No newline at end of file
+            logger.error(f"Error renaming chat: {e}")
+            return False
@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from typing import Optional
+
+NANOSECONDS = 1_000_000_000
+
+@dataclass
+class GenerationMetrics:
+    """Timings and token counts of one generated reply.
+
+    Counts and server-side durations come from the final chunk of the Ollama
+    stream (durations in nanoseconds, as Ollama reports them); the
+    time to first token and wall-clock time are measured by the client, in
+    seconds. Replies served from the response cache have no server counts.
+    """
+    model: Optional[str] = None
+    host: Optional[str] = None
+    prompt_eval_count: Optional[int] = None
+    eval_count: Optional[int] = None
+    eval_duration: Optional[int] = None
+    load_duration: Optional[int] = None
+    time_to_first_token: Optional[float] = None
+    wall_time: Optional[float] = None
+
+    def record_final_chunk(self, chunk):
+        """Add the counters of a stream's final chunk.
+
+        A resumed stream is made of several requests, so counters add up.
+        """
+        for name in ("prompt_eval_count", "eval_count", "eval_duration", "load_duration"):
+            value = getattr(chunk, name, None)
+            if value is not None:
+                setattr(self, name, (getattr(self, name) or 0) + value)
+
+    def record_shared(self, shared: "GenerationMetrics"):
+        """Take the host and server counters of a stream shared with other requests."""
+        self.host = shared.host
+        self.record_final_chunk(shared)  # same field names as the chunk
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        if not self.eval_count or not self.eval_duration:
+            return None
+        return self.eval_count * NANOSECONDS / self.eval_duration
+
+    def describe(self) -> str:
+        """Return a short human readable summary."""
+        lines = []
+        if self.model:
+            lines.append(f"Model: {self.model}" + (f" on {self.host}" if self.host else ""))
+        if self.time_to_first_token is not None:
+            lines.append(f"Time to first token: {self.time_to_first_token:.2f}s")
+        if self.tokens_per_second is not None:
+            lines.append(f"Generated {self.eval_count} tokens at {self.tokens_per_second:.1f} tokens/s")
+        if self.prompt_eval_count is not None:
+            lines.append(f"Prompt: {self.prompt_eval_count} tokens")
+        if self.load_duration:
+            lines.append(f"Model load: {self.load_duration / NANOSECONDS:.2f}s")
+        if self.wall_time is not None:
+            lines.append(f"Total: {self.wall_time:.2f}s")
+        return "\n".join(lines)
+
+@dataclass
+class ChatMetrics:
+    """Generation metrics aggregated over the replies of a chat."""
+    replies: int = 0
+    prompt_tokens: int = 0
+    generated_tokens: int = 0
+    eval_duration: int = 0
+    average_time_to_first_token: Optional[float] = None
+    wall_time: float = 0.0
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        if not self.generated_tokens or not self.eval_duration:
+            return None
+        return self.generated_tokens * NANOSECONDS / self.eval_duration
+
+    def describe(self) -> str:
+        """Return a short human readable summary."""
+        replies = "1 reply" if self.replies == 1 else f"{self.replies} replies"
+        lines = [f"{replies}, {self.generated_tokens} tokens generated"]
+        if self.tokens_per_second is not None:
+            lines.append(f"Average speed: {self.tokens_per_second:.1f} tokens/s")
+        if self.average_time_to_first_token is not None:
+            lines.append(f"Average time to first token: {self.average_time_to_first_token:.2f}s")
+        lines.append(f"Prompt tokens: {self.prompt_tokens}, total time: {self.wall_time:.1f}s")
+        return "\n".join(lines)
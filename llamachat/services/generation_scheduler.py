@@ -0,0 +1,177 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Callable, Deque, Dict, FrozenSet, List, Optional
+import asyncio
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+QueuePositionCallback = Callable[[int], None]
+
+# Slots held by the current task, so nested acquisitions don't deadlock
+_held_slots: ContextVar[FrozenSet[tuple]] = ContextVar("held_generation_slots", default=frozenset())
+
+class _Ticket:
+    """A queued generation request."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, chat_id, on_position: Optional[QueuePositionCallback]):
+        self.id = next(self._ids)
+        self.chat_id = chat_id
+        self.on_position = on_position
+        self.granted = asyncio.get_running_loop().create_future()
+        self.last_position: Optional[int] = None
+
+class GenerationScheduler:
+    """Admit generation requests to Ollama with a concurrency limit.
+
+    Every chat has its own FIFO queue and at most one request in flight, so a
+    conversation's turns are answered in order. Free slots are handed out
+    round-robin across chats, which keeps a chat with a long backlog from
+    starving the others. The limit should match the server's
+    ``OLLAMA_NUM_PARALLEL``; anything above it just queues on the server.
+    """
+
+    def __init__(self, max_concurrent: int = 1):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self._queues: Dict[object, Deque[_Ticket]] = {}
+        self._rotation: Deque[object] = deque()  # chats with waiting tickets
+        self._running: Dict[object, _Ticket] = {}
+
+    @property
+    def active_count(self) -> int:
+        """Return the number of requests currently generating."""
+        return len(self._running)
+
+    @property
+    def pending_count(self) -> int:
+        """Return the number of requests waiting for a slot."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def is_busy(self, chat_id) -> bool:
+        """Return whether the chat has a request running or queued."""
+        return chat_id in self._running or bool(self._queues.get(chat_id))
+
+    def queue_position(self, ticket: _Ticket) -> int:
+        """Return the 1-based position of a waiting ticket, 0 once it runs."""
+        if ticket.granted.done():
+            return 0
+        for position, queued in enumerate(self._dispatch_order(), start=1):
+            if queued is ticket:
+                return position
+        return 0
+
+    @asynccontextmanager
+    async def slot(self, chat_id=None, on_position: Optional[QueuePositionCallback] = None):
+        """Wait for a generation slot for ``chat_id`` and hold it.
+
+        ``on_position`` is called with the ticket's queue position whenever it
+        changes, and with 0 when the request is admitted. The slot is
+        reentrant: a task that already holds it for ``chat_id`` gets through
+        immediately, which lets callers keep the slot across a stream and the
+        work that has to finish before the chat's next turn starts.
+        """
+        key = (id(self), chat_id)
+        held = _held_slots.get()
+        if key in held:
+            yield
+            return
+
+        ticket = _Ticket(chat_id, on_position)
+        self._enqueue(ticket)
+        try:
+            await ticket.granted
+        except BaseException:
+            self._discard(ticket)
+            raise
+
+        _held_slots.set(held | {key})
+        try:
+            yield
+        finally:
+            # Not Token.reset(): an abandoned stream may be finalized from
+            # another context
+            _held_slots.set(_held_slots.get() - {key})
+            self._running.pop(chat_id, None)
+            self._dispatch()
+
+    def _enqueue(self, ticket: _Ticket):
+        queue = self._queues.setdefault(ticket.chat_id, deque())
+        queue.append(ticket)
+        if ticket.chat_id not in self._rotation:
+            self._rotation.append(ticket.chat_id)
+        self._dispatch()
+
+    def _discard(self, ticket: _Ticket):
+        """Drop a ticket whose waiter went away (e.g. was cancelled)."""
+        if ticket.granted.done() and not ticket.granted.cancelled():
+            # Admitted concurrently with the cancellation: give the slot back
+            if self._running.get(ticket.chat_id) is ticket:
+                del self._running[ticket.chat_id]
+        else:
+            queue = self._queues.get(ticket.chat_id)
+            if queue and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    self._forget_chat(ticket.chat_id)
+        self._dispatch()
+
+    def _forget_chat(self, chat_id):
+        self._queues.pop(chat_id, None)
+        if chat_id in self._rotation:
+            self._rotation.remove(chat_id)
+
+    def _dispatch(self):
+        """Admit waiting tickets while slots are free, then report positions."""
+        while len(self._running) < self.max_concurrent:
+            ticket = self._next_ticket()
+            if ticket is None:
+                break
+            if ticket.granted.done():
+                # The waiter was cancelled before it could clean up
+                continue
+            self._running[ticket.chat_id] = ticket
+            ticket.granted.set_result(None)
+            self._notify(ticket, 0)
+        for position, ticket in enumerate(self._dispatch_order(), start=1):
+            self._notify(ticket, position)
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        """Pop the head of the next eligible chat queue in round-robin order."""
+        for _ in range(len(self._rotation)):
+            chat_id = self._rotation.popleft()
+            if chat_id in self._running:
+                # One request per chat at a time; keep its turn in the rotation
+                self._rotation.append(chat_id)
+                continue
+            queue = self._queues[chat_id]
+            ticket = queue.popleft()
+            if queue:
+                self._rotation.append(chat_id)
+            else:
+                self._queues.pop(chat_id, None)
+            return ticket
+        return None
+
+    def _dispatch_order(self) -> List[_Ticket]:
+        """Return waiting tickets in the order they would be admitted."""
+        queues = [list(self._queues[chat_id]) for chat_id in self._rotation]
+        order = []
+        for round_ in itertools.zip_longest(*queues):
+            order.extend(ticket for ticket in round_ if ticket is not None)
+        return order
+
+    @staticmethod
+    def _notify(ticket: _Ticket, position: int):
+        if ticket.on_position is None or ticket.last_position == position:
+            return
+        ticket.last_position = position
+        try:
+            ticket.on_position(position)
+        except Exception as e:
+            logger.warning(f"Queue position callback failed: {e}")
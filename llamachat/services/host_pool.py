@@ -0,0 +1,181 @@
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set
+from ollama import AsyncClient
+import httpx
+import asyncio
+import logging
+
+from llamachat.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from llamachat.services.model_residency import ModelResidencyManager, KeepAlive, normalize_model_name
+
+logger = logging.getLogger(__name__)
+
+# Connection pool settings for the async transport. Ollama streams can pause for
+# a long time during prompt evaluation, so only the connect phase is bounded.
+POOL_LIMITS = httpx.Limits(max_connections=8, max_keepalive_connections=4, keepalive_expiry=300)
+REQUEST_TIMEOUT = httpx.Timeout(None, connect=5.0)
+
+class OllamaHost:
+    """One Ollama endpoint with its connection pool and health state."""
+
+    def __init__(self, url: Optional[str] = None, keep_alive: KeepAlive = "30m",
+                 idle_unload: Optional[float] = None, memory_limit: int = 0):
+        self.url = url
+        self.outstanding = 0  # requests currently using the host
+        self.available_models: Optional[Set[str]] = None  # from /api/tags, None until known
+        self._client: Optional[AsyncClient] = None
+        self.residency = ModelResidencyManager(
+            self,
+            keep_alive=keep_alive,
+            idle_unload=idle_unload,
+            memory_limit=memory_limit
+        )
+        self.circuit_breaker = CircuitBreaker(probe=self.check_health)
+
+    def __repr__(self) -> str:
+        return f"OllamaHost({self.url or 'default'})"
+
+    @property
+    def client(self) -> AsyncClient:
+        """Return the pooled async client, creating it on first use.
+
+        The client keeps its keep-alive connections to the host open between
+        requests, so consecutive messages skip the TCP handshake.
+        """
+        if self._client is None:
+            self._client = AsyncClient(host=self.url, timeout=REQUEST_TIMEOUT, limits=POOL_LIMITS)
+        return self._client
+
+    async def close(self):
+        """Close the pooled connections."""
+        if self._client is not None:
+            # AsyncClient.close() only exists in newer ollama releases
+            await self._client._client.aclose()
+            self._client = None
+
+    @property
+    def is_available(self) -> bool:
+        """Return whether requests may currently be sent to the host."""
+        breaker = self.circuit_breaker
+        return breaker.state == CircuitBreaker.CLOSED or not breaker.retry_in
+
+    def has_model(self, model: str) -> Optional[bool]:
+        """Return whether the host has the model installed, None if unknown."""
+        if self.available_models is None:
+            return None
+        return normalize_model_name(model) in self.available_models
+
+    async def check_health(self) -> bool:
+        """Cheaply check that the server answers, without touching any model."""
+        try:
+            await self.client.ps()
+            return True
+        except Exception as e:
+            logger.debug(f"Health check of {self} failed: {e}")
+            return False
+
+    async def refresh(self):
+        """Update installed and loaded models; feeds the circuit breaker."""
+        try:
+            tags = await self.client.list()
+            self.available_models = {
+                normalize_model_name(model.model or model.name) for model in tags.models
+            }
+            await self.residency.refresh()
+        except Exception as e:
+            logger.debug(f"Refreshing {self} failed: {e}")
+            self.circuit_breaker.record_failure()
+            return
+        self.circuit_breaker.record_success()
+        await self.residency.enforce_policy()
+
+class HostPool:
+    """Route requests across several Ollama hosts.
+
+    A request goes to the host with the fewest outstanding requests among
+    those that are reachable and have the model, preferring hosts where the
+    model is already loaded. Requests for a chat stick to the host that served
+    it before, so the conversation keeps reusing that host's warm KV cache,
+    until the host becomes unavailable.
+    """
+
+    def __init__(self, hosts: List[OllamaHost], health_interval: float = 30.0):
+        if not hosts:
+            raise ValueError("HostPool needs at least one host")
+        self.hosts = hosts
+        self.health_interval = health_interval
+        self._affinity: Dict[object, OllamaHost] = {}
+        self._health_task: Optional[asyncio.Task] = None
+
+    def select(self, model: str, chat_id=None, exclude: Optional[Set[OllamaHost]] = None) -> OllamaHost:
+        """Return the host that should serve the next request for the chat."""
+        candidates = [host for host in self.hosts if host.is_available]
+        if not candidates:
+            raise CircuitOpenError("No Ollama host is reachable")
+        # Hosts that just failed are only retried when nothing else is left
+        if exclude:
+            candidates = [host for host in candidates if host not in exclude] or candidates
+
+        # Hosts known to lack the model are a last resort
+        with_model = [host for host in candidates if host.has_model(model) is not False]
+        candidates = with_model or candidates
+
+        preferred = self._affinity.get(chat_id) if chat_id is not None else None
+        if preferred in candidates:
+            return preferred
+
+        host = min(
+            candidates,
+            key=lambda host: (
+                host.outstanding,
+                not host.residency.is_loaded(model),
+                self.hosts.index(host)
+            )
+        )
+        if chat_id is not None:
+            self._affinity[chat_id] = host
+        return host
+
+    def assign(self, chat_id, url: Optional[str]):
+        """Make the chat stick to the host at ``url``, e.g. one that served it a shared reply."""
+        for host in self.hosts:
+            if host.url == url:
+                self._affinity[chat_id] = host
+
+    def forget(self, chat_id):
+        """Drop the chat's host affinity."""
+        self._affinity.pop(chat_id, None)
+
+    @asynccontextmanager
+    async def lease(self, host: OllamaHost):
+        """Count a request against the host while it runs."""
+        host.outstanding += 1
+        try:
+            yield host
+        finally:
+            host.outstanding -= 1
+
+    def is_loaded(self, model: str) -> bool:
+        return any(host.residency.is_loaded(model) for host in self.hosts)
+
+    async def refresh(self):
+        await asyncio.gather(*(host.refresh() for host in self.hosts))
+
+    def start(self):
+        """Start periodic health checks of all hosts."""
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._check_health())
+
+    def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+    async def close(self):
+        self.stop()
+        await asyncio.gather(*(host.close() for host in self.hosts))
+
+    async def _check_health(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.health_interval)
@@ -0,0 +1,150 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Union
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+KeepAlive = Union[float, str]
+
+def normalize_model_name(model: str) -> str:
+    """Return the model name with an explicit tag, as ``/api/ps`` reports it."""
+    return model if ":" in model else f"{model}:latest"
+
+@dataclass
+class LoadedModel:
+    """A model the server reports as loaded in ``/api/ps``."""
+    name: str
+    size: int
+    size_vram: int
+    expires_at: Optional[datetime]
+
+class ModelResidencyManager:
+    """Keep the models the app uses loaded on the Ollama server.
+
+    Every request carries ``keep_alive`` so the server doesn't evict a model
+    after its default idle timeout, models are preloaded with a zero-token
+    request before they are needed, and the host's health checks call
+    ``refresh`` and ``enforce_policy`` to know what is resident. Models this
+    app used are unloaded again when they sit idle for ``idle_unload``
+    seconds, or least-recently-used first when the loaded models exceed
+    ``memory_limit`` bytes.
+    """
+
+    def __init__(self, service, keep_alive: KeepAlive = "30m",
+                 idle_unload: Optional[float] = None, memory_limit: int = 0):
+        self.service = service
+        self.keep_alive = keep_alive
+        self.idle_unload = idle_unload
+        self.memory_limit = memory_limit
+        self.loaded: Dict[str, LoadedModel] = {}
+        self._last_used: Dict[str, float] = {}
+        self._in_use: Dict[str, int] = {}
+        self._preloads: Dict[str, asyncio.Task] = {}
+
+    def is_loaded(self, model: str) -> bool:
+        """Return whether the model was resident at the last poll."""
+        return self._normalize(model) in self.loaded
+
+    def acquire(self, model: str):
+        """Mark the model as used by a request until ``release`` is called."""
+        model = self._normalize(model)
+        self._in_use[model] = self._in_use.get(model, 0) + 1
+        self._last_used[model] = time.monotonic()
+
+    def release(self, model: str):
+        model = self._normalize(model)
+        count = self._in_use.get(model, 0) - 1
+        if count > 0:
+            self._in_use[model] = count
+        else:
+            self._in_use.pop(model, None)
+        self._last_used[model] = time.monotonic()
+
+    async def refresh(self) -> Dict[str, LoadedModel]:
+        """Poll ``/api/ps`` and update the set of loaded models."""
+        response = await self.service.client.ps()
+        self.loaded = {
+            self._normalize(model.model or model.name): LoadedModel(
+                name=self._normalize(model.model or model.name),
+                size=model.size or 0,
+                size_vram=model.size_vram or 0,
+                expires_at=model.expires_at
+            )
+            for model in response.models
+        }
+        return self.loaded
+
+    async def preload(self, model: str) -> bool:
+        """Load the model on the server without generating any tokens.
+
+        Concurrent calls for the same model share one request.
+        """
+        model = self._normalize(model)
+        if model in self.loaded:
+            self._last_used[model] = time.monotonic()
+            return True
+        task = self._preloads.get(model)
+        if task is None:
+            task = asyncio.create_task(self._preload(model))
+            self._preloads[model] = task
+            task.add_done_callback(lambda _: self._preloads.pop(model, None))
+        return await asyncio.shield(task)
+
+    async def _preload(self, model: str) -> bool:
+        start_time = time.time()
+        try:
+            # A generate request without a prompt only loads the model
+            await self.service.client.generate(model=model, keep_alive=self.keep_alive)
+        except Exception as e:
+            logger.warning(f"Preloading {model} failed: {e}")
+            return False
+        self._last_used[model] = time.monotonic()
+        logger.debug(f"Preloaded {model} in {time.time() - start_time:.2f}s")
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.debug(f"Could not refresh loaded models: {e}")
+        return True
+
+    async def unload(self, model: str) -> bool:
+        """Ask the server to evict the model now."""
+        model = self._normalize(model)
+        try:
+            await self.service.client.generate(model=model, keep_alive=0)
+        except Exception as e:
+            logger.warning(f"Unloading {model} failed: {e}")
+            return False
+        self.loaded.pop(model, None)
+        self._last_used.pop(model, None)
+        logger.debug(f"Unloaded {model}")
+        return True
+
+    async def enforce_policy(self):
+        """Unload idle models and stay under the memory limit."""
+        now = time.monotonic()
+        # Only models this app used are candidates, never ones in use
+        candidates = sorted(
+            (last_used, model) for model, last_used in self._last_used.items()
+            if model in self.loaded and model not in self._in_use
+        )
+        if self.idle_unload is not None:
+            for last_used, model in list(candidates):
+                if now - last_used >= self.idle_unload:
+                    await self.unload(model)
+                    candidates.remove((last_used, model))
+
+        if self.memory_limit:
+            total = sum(loaded.size for loaded in self.loaded.values())
+            for _, model in candidates:
+                if total <= self.memory_limit:
+                    break
+                size = self.loaded[model].size
+                if await self.unload(model):
+                    total -= size
+
+    @staticmethod
+    def _normalize(model: str) -> str:
+        return normalize_model_name(model)
@@ -1,123 +1,353 @@
-from typing import AsyncGenerator, List, Dict, Optional
-from ollama import chat
+from typing import AsyncGenerator, List, Dict, Optional, Sequence, Set
+from contextlib import aclosing, asynccontextmanager
+from ollama import ResponseError
+import httpx
 import asyncio
 import threading
 import logging
 import time
-from concurrent.futures import ThreadPoolExecutor
-import backoff  # New dependency for retry logic
+import backoff
+from llamachat.services.generation_metrics import GenerationMetrics
+from llamachat.services.generation_scheduler import GenerationScheduler, QueuePositionCallback
+from llamachat.services.cassette import CassetteRecorder, Recording
+from llamachat.services.circuit_breaker import CircuitOpenError
+from llamachat.services.host_pool import HostPool, OllamaHost
+from llamachat.services.model_residency import KeepAlive
+from llamachat.services.response_cache import ResponseCache
 
 logger = logging.getLogger(__name__)
 
+# Server responses worth retrying: overloaded or restarting
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def is_retryable(error: Exception) -> bool:
+    """Return whether a request failure is transient and worth retrying."""
+    if isinstance(error, ResponseError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, ConnectionError))
+
 class OllamaService:
-    def __init__(self, model_name: str = "llama3.2", temperature: float = 0.7, max_retries: int = 3):
+    def __init__(self, model_name: str = "llama3.2", temperature: float = 0.7, max_retries: int = 3,
+                 hosts: Sequence[Optional[str]] = (None,), num_parallel: int = 4,
+                 keep_alive: KeepAlive = "30m", idle_unload: Optional[float] = None, memory_limit: int = 0,
+                 response_cache: Optional[ResponseCache] = None, resume_streams: bool = True,
+                 recorder: Optional[CassetteRecorder] = None):
         self.model_name = model_name
         self.temperature = temperature
         self.max_retries = max_retries
-        self._is_warmed_up = False
-        self._warmup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ollama_warmup")
-        self._warmup_task: Optional[asyncio.Task] = None
-        self._lock = asyncio.Lock()  # Prevent concurrent model access
+        self.resume_streams = resume_streams
+        self.keep_alive = keep_alive
+        self.pool = HostPool([
+            OllamaHost(url, keep_alive=keep_alive, idle_unload=idle_unload, memory_limit=memory_limit)
+            for url in hosts or (None,)
+        ])
+        # Every host runs num_parallel requests at once
+        self.scheduler = GenerationScheduler(max_concurrent=num_parallel * len(self.pool.hosts))
+        self.response_cache = response_cache or ResponseCache()
+        self.recorder = recorder  # captures streams for replay by the stand-in server
+        self._generations: Dict[Optional[int], Set[asyncio.Task]] = {}
+        self._cancel_requested: Set[asyncio.Task] = set()
+
+    async def close(self, timeout: float = 5.0):
+        """Stop every generation, then close the pooled connections of every host.
+
+        Replies still streaming are cancelled as by ``cancel`` and given up to
+        ``timeout`` seconds to wind down before their connections are closed.
+        """
+        tasks = set().union(*self._generations.values())
+        for chat_id in list(self._generations):
+            self.cancel(chat_id)
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        await self.pool.close()
+
+    def is_generating(self, chat_id: Optional[int]) -> bool:
+        """Return whether a reply for the chat is streaming or queued."""
+        return bool(self._generations.get(chat_id))
+
+    def cancel(self, chat_id: Optional[int]) -> bool:
+        """Abort every queued or streaming reply for the chat.
+
+        The owning tasks are cancelled, which closes the HTTP stream; Ollama
+        stops generating as soon as the client disconnects. The callers see
+        ``GenerationCancelled`` and can keep whatever was streamed so far.
+        Returns whether anything was cancelled.
+        """
+        tasks = self._generations.get(chat_id, set())
+        for task in tasks:
+            if task not in self._cancel_requested:
+                self._cancel_requested.add(task)
+                task.cancel()
+        if tasks:
+            logger.debug(f"Cancelled {len(tasks)} generation(s) for chat {chat_id}")
+        return bool(tasks)
+
+    @asynccontextmanager
+    async def generation(self, chat_id: Optional[int] = None,
+                         on_queue_position: Optional[QueuePositionCallback] = None):
+        """Hold the chat's generation slot as a cancellable unit of work.
+
+        Everything inside the block, including waiting in the queue, is
+        aborted by ``cancel(chat_id)`` and surfaces as ``GenerationCancelled``.
+        Nested use by the same task is a no-op wrapper around the outer block.
+        """
+        task = asyncio.current_task()
+        tasks = self._generations.setdefault(chat_id, set())
+        if task in tasks:
+            async with self.scheduler.slot(chat_id, on_queue_position):
+                yield
+            return
+
+        tasks.add(task)
+        try:
+            async with self.scheduler.slot(chat_id, on_queue_position):
+                yield
+        except asyncio.CancelledError:
+            if task not in self._cancel_requested:
+                raise
+            self._cancel_requested.discard(task)
+            task.uncancel()
+            raise GenerationCancelled("Generation was stopped") from None
+        finally:
+            self._cancel_requested.discard(task)
+            tasks.discard(task)
+            if not tasks:
+                self._generations.pop(chat_id, None)
 
     @property
     def is_warmed_up(self) -> bool:
-        """Return whether the model has been warmed up."""
-        return self._is_warmed_up
+        """Return whether the model was loaded on any host at the last check."""
+        return self.pool.is_loaded(self.model_name)
+
+    async def warmup(self) -> bool:
+        """Load the model ahead of the first message and start health checks."""
+        await self.pool.refresh()
+        self.pool.start()
+        success = await self.preload()
+        if not success:
+            logger.warning("Warmup failed, the first response might be slower")
+        return success
 
-    def _do_warmup(self) -> bool:
-        """Execute warmup in a separate thread."""
+    async def preload(self, chat_id: Optional[int] = None) -> bool:
+        """Load the model on the host that will serve the chat's next reply."""
         try:
-            logger.debug(f"Starting warmup in thread: {threading.current_thread().name}")
-            # Just initialize the model without streaming
-            chat(
-                model=self.model_name,
-                messages=[{"role": "user", "content": "hi"}],
-                stream=False,
-                options={"temperature": self.temperature}
-            )
-            logger.debug("Warmup completed successfully")
-            return True
-        except Exception as e:
-            logger.warning(f"Warmup failed: {str(e)}")
+            host = self.pool.select(self.model_name, chat_id)
+        except CircuitOpenError as e:
+            logger.warning(f"Cannot preload {self.model_name}: {e}")
             return False
+        return await host.residency.preload(self.model_name)
 
-    async def warmup(self) -> bool:
-        """Start warmup in background thread."""
-        if self._is_warmed_up:
-            return True
+    async def check_health(self) -> bool:
+        """Return whether at least one host answers."""
+        results = await asyncio.gather(*(host.check_health() for host in self.pool.hosts))
+        return any(results)
 
-        if self._warmup_task is not None:
-            # Warmup already in progress
-            return await self._warmup_task
+    async def get_response(
+        self,
+        messages: List[Dict[str, str]],
+        chat_id: Optional[int] = None,
+        on_queue_position: Optional[QueuePositionCallback] = None,
+        metrics: Optional[GenerationMetrics] = None
+    ) -> AsyncGenerator[str, None]:
+        """Stream the model's reply to ``messages``.
 
-        logger.debug("Scheduling warmup")
-        try:
-            # Run warmup in thread pool
-            self._warmup_task = asyncio.create_task(
-                asyncio.to_thread(self._do_warmup)
-            )
-            success = await self._warmup_task
-            self._is_warmed_up = success
-            return success
-        except Exception as e:
-            logger.error(f"Error during warmup: {str(e)}")
-            self._is_warmed_up = False
-            return False
-        finally:
-            self._warmup_task = None
-
-    @backoff.on_exception(
-        backoff.expo,
-        Exception,
-        max_tries=3,
-        giveup=lambda e: isinstance(e, KeyboardInterrupt)
-    )
-    async def get_response(self, messages: List[Dict[str, str]]) -> AsyncGenerator[str, None]:
-        async with self._lock:  # Ensure only one request at a time
+        The request waits in ``chat_id``'s queue of the scheduler until a slot
+        is free, unless the caller already holds that chat's generation.
+        Replies come from the response cache when possible, and identical
+        deterministic requests in flight share a single stream, whose host
+        and server counters every request gets once it has read the reply.
+        If ``metrics`` is given it is filled in as the reply streams; time is
+        measured from the moment the request leaves the queue.
+        Raises ``GenerationCancelled`` if ``cancel(chat_id)`` is called.
+        """
+        async with self.generation(chat_id, on_queue_position):
+            start_time = time.perf_counter()
+            if metrics is not None:
+                metrics.model = self.model_name
+            try:
+                options = {"temperature": self.temperature}
+                served = metrics if metrics is not None else GenerationMetrics()
+                stream = self.response_cache.stream(
+                    self.model_name,
+                    options,
+                    messages,
+                    lambda upstream: self._stream_chat(messages, options, chat_id, upstream),
+                    served
+                )
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        if metrics is not None and metrics.time_to_first_token is None:
+                            metrics.time_to_first_token = time.perf_counter() - start_time
+                        yield chunk
+                # A stream shared with another chat was routed by that chat's
+                # affinity; stay on the host that now has this prompt cached
+                if chat_id is not None and served.host is not None:
+                    self.pool.assign(chat_id, served.host)
+
+            except OllamaServiceError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in get_response: {str(e)}", exc_info=True)
+                raise OllamaServiceError(f"Failed to get response: {str(e)}") from e
+            finally:
+                if metrics is not None:
+                    metrics.wall_time = time.perf_counter() - start_time
+
+    async def _stream_chat(self, messages: List[Dict[str, str]], options: dict, chat_id: Optional[int] = None,
+                           metrics: Optional[GenerationMetrics] = None) -> AsyncGenerator[str, None]:
+        """Stream a reply from the server, bypassing cache and scheduler.
+
+        The host is picked by the pool, preferring the one that served the
+        chat before. Transient failures before the first token are retried
+        with exponential backoff, up to ``max_retries`` times, on another host
+        when one is available. If the stream breaks after partial output, the
+        request is resumed by sending the partial reply back as the start of
+        the assistant message, so the caller sees one continuous reply; with
+        ``resume_streams`` off, or once retries run out, ``StreamInterrupted``
+        is raised carrying the partial text. Server-side counters of every
+        attempt are added to ``metrics``.
+        """
+        # If not warmed up, responses might be slower
+        if not self.is_warmed_up:
+            logger.warning("Model not warmed up, response might be slower")
+
+        received: List[str] = []
+        failed: Set[OllamaHost] = set()
+        retries = 0
+        delays = backoff.expo(factor=0.5, max_value=8)
+        next(delays)  # backoff's wait generators start by yielding None
+        while True:
+            host = self.pool.select(self.model_name, chat_id, exclude=failed)
+            host.circuit_breaker.check()
+            request_messages = messages
+            if received:
+                request_messages = messages + [{"role": "assistant", "content": "".join(received)}]
+
+            start_time = time.time()
+            logger.debug(f"Starting stream on {host} in thread: {threading.current_thread().name}")
+            if metrics is not None:
+                metrics.host = host.url
+            host.residency.acquire(self.model_name)
             try:
-                # If not warmed up, responses might be slower
-                if not self._is_warmed_up:
-                    logger.warning("Model not warmed up, response might be slower")
-                    
-                start_time = time.time()
-                logger.debug(f"Starting get_response in thread: {threading.current_thread().name}")
-                
-                # Define the blocking chat operation
-                def execute_chat():
-                    logger.debug(f"Executing chat in thread: {threading.current_thread().name}")
-                    return chat(
+                async with self.pool.lease(host):
+                    # Open the stream on the async client; chunks are awaited on the
+                    # event loop without ever blocking the GUI thread
+                    response = await host.client.chat(
                         model=self.model_name,
-                        messages=messages,
+                        messages=request_messages,
                         stream=True,
-                        options={"temperature": self.temperature}
+                        options=options,
+                        keep_alive=self.keep_alive
                     )
+                    recording = None
+                    if self.recorder is not None:
+                        recording = self.recorder.start("/api/chat", {
+                            "model": self.model_name,
+                            "messages": request_messages,
+                            "options": options,
+                        })
 
-                # Run the blocking operation in a separate thread
-                response = await asyncio.to_thread(execute_chat)
-                logger.debug(f"ollama.chat completed in {time.time() - start_time:.2f}s, starting stream")
-
-                chunk_count = 0
-                stream_start = time.time()
-                async for chunk in self._process_stream(response):
-                    chunk_count += 1
-                    if chunk_count % 10 == 0:  # Log every 10th chunk to avoid spam
-                        logger.debug(
-                            f"Streaming chunk {chunk_count} in thread: {threading.current_thread().name}, "
-                            f"time since start: {time.time() - stream_start:.2f}s"
-                        )
-                    yield chunk
+                    chunk_count = 0
+                    async for chunk in self._process_stream(response, metrics, recording):
+                        if not chunk_count:
+                            logger.debug(f"First token after {time.time() - start_time:.2f}s")
+                            host.circuit_breaker.record_success()
+                        chunk_count += 1
+                        if chunk_count % 10 == 0:  # Log every 10th chunk to avoid spam
+                            logger.debug(
+                                f"Streaming chunk {chunk_count} in thread: {threading.current_thread().name}, "
+                                f"time since start: {time.time() - start_time:.2f}s"
+                            )
+                        received.append(chunk)
+                        yield chunk
+                    if recording is not None:
+                        recording.finish()
+                host.circuit_breaker.record_success()
+                return
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                host.circuit_breaker.record_failure()
+                failed.add(host)
+                partial = "".join(received)
+                if retries >= self.max_retries or (partial and not self.resume_streams):
+                    if partial:
+                        raise StreamInterrupted(partial, e) from e
+                    raise
+                retries += 1
+                delay = backoff.full_jitter(next(delays))
+                logger.warning(
+                    f"Stream from {host} failed ({e!r}) after {len(partial)} characters, "
+                    f"retry {retries}/{self.max_retries} in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+            finally:
+                host.residency.release(self.model_name)
+
+    async def get_completion(self, messages: List[Dict[str, str]], queue_key=None) -> str:
+        """Return the model's complete reply to ``messages`` without streaming.
 
+        Used for background work such as summaries; ``queue_key`` selects the
+        scheduler queue the request waits in.
+        """
+        async with self.generation(queue_key):
+            try:
+                host = self.pool.select(self.model_name)
+                host.circuit_breaker.check()
+            except CircuitOpenError as e:
+                raise OllamaServiceError(f"Failed to get completion: {str(e)}") from e
+
+            host.residency.acquire(self.model_name)
+            try:
+                async with self.pool.lease(host):
+                    response = await host.client.chat(
+                        model=self.model_name,
+                        messages=messages,
+                        stream=False,
+                        options={"temperature": self.temperature},
+                        keep_alive=self.keep_alive
+                    )
+                host.circuit_breaker.record_success()
+                return response.message.content
             except Exception as e:
-                logger.error(f"Error in get_response: {str(e)}", exc_info=True)
-                raise OllamaServiceError(f"Failed to get response: {str(e)}") from e
+                if is_retryable(e):
+                    host.circuit_breaker.record_failure()
+                logger.error(f"Error in get_completion: {str(e)}", exc_info=True)
+                raise OllamaServiceError(f"Failed to get completion: {str(e)}") from e
+            finally:
+                host.residency.release(self.model_name)
 
-    async def _process_stream(self, response):
-        """Process the stream in chunks asynchronously."""
-        for chunk in response:
-            # Give other tasks a chance to run
-            await asyncio.sleep(0)
-            yield chunk.message.content
+    async def _process_stream(self, response, metrics: Optional[GenerationMetrics] = None,
+                              recording: Optional[Recording] = None):
+        """Yield the text content of each streamed chunk.
+
+        The counters of the final chunk are recorded in ``metrics``, and
+        every chunk is captured by ``recording`` when given.
+        """
+        try:
+            async for chunk in response:
+                if recording is not None:
+                    recording.add(chunk)
+                if chunk.message.content:
+                    yield chunk.message.content
+                if chunk.done and metrics is not None:
+                    metrics.record_final_chunk(chunk)
+        finally:
+            # Release the connection back to the pool (or drop it if the
+            # stream was abandoned half way)
+            await response.aclose()
 
 class OllamaServiceError(Exception):
     """Custom exception for Ollama service errors."""
+    pass
+
+class StreamInterrupted(OllamaServiceError):
+    """Raised when a stream breaks after part of the reply was received."""
+
+    def __init__(self, partial: str, cause: Exception):
+        super().__init__(f"Stream interrupted after partial output: {cause}")
+        self.partial = partial
+
+class GenerationCancelled(OllamaServiceError):
+    """Raised when a generation is stopped through ``OllamaService.cancel``."""
     pass
\ No newline at end of file
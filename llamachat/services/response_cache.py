@@ -0,0 +1,225 @@
+from collections import OrderedDict
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional, Set
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from llamachat.services.generation_metrics import GenerationMetrics
+
+logger = logging.getLogger(__name__)
+
+# A cached reply is replayed one word (plus trailing whitespace) at a time
+REPLAY_CHUNK_PATTERN = re.compile(r"\S*\s*")
+
+@dataclass
+class CacheStats:
+    """Counters for measuring what the cache saves."""
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+class _InFlight:
+    """One upstream stream shared by every identical request waiting on it.
+
+    The stream is pumped by its own task so that subscribers can come and go;
+    it is cancelled (closing the HTTP connection) once the last subscriber
+    leaves before it finished. ``metrics`` is filled in by the upstream
+    request and shared by all subscribers.
+    """
+
+    def __init__(self, source: AsyncIterator[str], on_complete: Callable[[str], None],
+                 metrics: GenerationMetrics):
+        self.chunks: List[str] = []
+        self.metrics = metrics
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._pump(source, on_complete))
+
+    async def _pump(self, source: AsyncIterator[str], on_complete: Callable[[str], None]):
+        try:
+            async with aclosing(source):
+                async for chunk in source:
+                    self.chunks.append(chunk)
+                    self._notify()
+            on_complete("".join(self.chunks))
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncGenerator[str, None]:
+        """Yield every chunk of the stream, including those already received."""
+        self.subscribers += 1
+        position = 0
+        try:
+            while True:
+                while position < len(self.chunks):
+                    yield self.chunks[position]
+                    position += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if not self.subscribers and not self.done:
+                self.abandoned = True
+                self.task.cancel()
+
+class ResponseCache:
+    """Cache and coalesce identical generation requests.
+
+    Requests are identified by a hash of model, options and messages.
+    Identical deterministic requests that overlap in time share one Ollama
+    stream; sampled ones always get their own reply. Completed replies of
+    deterministic requests are kept in an LRU memory
+    tier and, when an async database service is given, a persistent SQLite tier;
+    both are bounded in bytes and evict the least recently used entries.
+    """
+
+    def __init__(self, db_service=None, memory_limit: int = 8 * 1024 * 1024,
+                 disk_limit: int = 64 * 1024 * 1024):
+        self.db_service = db_service
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.stats = CacheStats()
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_size = 0
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._writes: Set[asyncio.Future] = set()  # disk writes in progress
+
+    @staticmethod
+    def make_key(model: str, options: dict, messages: List[Dict[str, str]]) -> str:
+        payload = json.dumps(
+            {"model": model, "options": options, "messages": messages},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_cacheable(options: dict) -> bool:
+        """Return whether the request always produces the same reply."""
+        return options.get("temperature") == 0 or options.get("seed") is not None
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return a cached reply, promoting disk hits into memory."""
+        content = self._memory.get(key)
+        if content is not None:
+            self._memory.move_to_end(key)
+            self.stats.memory_hits += 1
+            return content
+        if self.db_service is not None:
+            try:
+                content = await self.db_service.get_cached_response(key)
+            except Exception as e:
+                logger.warning(f"Reading the response cache failed: {e}")
+                content = None
+            if content is not None:
+                self._remember(key, content)
+                self.stats.disk_hits += 1
+                return content
+        return None
+
+    def put(self, key: str, model: str, content: str):
+        self._remember(key, content)
+        if self.db_service is not None:
+            task = asyncio.ensure_future(self._store(key, model, content))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def _store(self, key: str, model: str, content: str):
+        try:
+            await self.db_service.put_cached_response(key, model, content)
+            await self.db_service.evict_cached_responses(self.disk_limit)
+        except Exception as e:
+            logger.warning(f"Writing the response cache failed: {e}")
+
+    def _remember(self, key: str, content: str):
+        size = len(content.encode("utf-8"))
+        if size > self.memory_limit:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous.encode("utf-8"))
+        self._memory[key] = content
+        self._memory_size += size
+        while self._memory_size > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted.encode("utf-8"))
+
+    async def stream(self, model: str, options: dict, messages: List[Dict[str, str]],
+                     open_stream: Callable[[GenerationMetrics], AsyncIterator[str]],
+                     metrics: Optional[GenerationMetrics] = None) -> AsyncGenerator[str, None]:
+        """Yield the reply from the cache, a matching in-flight stream or a new one.
+
+        ``open_stream`` starts the upstream request, filling in the metrics
+        it is given. Every subscriber of a stream gets its host and server
+        counters copied into ``metrics`` when it stops reading.
+        """
+        key = self.make_key(model, options, messages)
+        cacheable = self.is_cacheable(options)
+        if cacheable:
+            content = await self.get(key)
+            if content is not None:
+                logger.debug(f"Response cache hit ({self.stats})")
+                async for chunk in self.replay(content):
+                    yield chunk
+                return
+
+        flight = self._in_flight.get(key) if cacheable else None
+        if flight is None or flight.done or flight.abandoned:
+            self.stats.misses += 1
+
+            def on_complete(content: str):
+                if cacheable and content:
+                    self.put(key, model, content)
+
+            upstream = GenerationMetrics(model=model)
+            flight = _InFlight(open_stream(upstream), on_complete, upstream)
+            if cacheable:
+                self._in_flight[key] = flight
+                flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.stats.coalesced += 1
+            logger.debug(f"Joining in-flight request ({self.stats})")
+
+        try:
+            async with aclosing(flight.subscribe()) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+        finally:
+            if metrics is not None:
+                metrics.record_shared(flight.metrics)
+
+    def _forget(self, key: str, flight: _InFlight):
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+
+    @staticmethod
+    async def replay(content: str) -> AsyncGenerator[str, None]:
+        """Yield a cached reply word by word without waiting between chunks."""
+        for match in REPLAY_CHUNK_PATTERN.finditer(content):
+            if match.group():
+                yield match.group()
+                await asyncio.sleep(0)
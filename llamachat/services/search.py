@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+from typing import Optional
+import re
+
+# Wrapped around matched terms in snippets, so the UI can escape the rest and
+# turn these into markup. Pasted text and model output can contain them as
+# well; ``highlight`` removes those from the text
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+MARKERS = (HIGHLIGHT_START, HIGHLIGHT_END)
+
+WORD = re.compile(r"\w+")
+
+@dataclass
+class SearchResult:
+    """A chat title or message matching a search."""
+    chat_id: int
+    chat_title: str
+    message_id: Optional[int]  # None if the chat title matched
+    snippet: str  # matched text with terms between HIGHLIGHT_START and HIGHLIGHT_END
+    rank: float  # lower is better
+
+def highlight(plain: str, marked: str) -> str:
+    """Return a snippet with matched terms marked and no other marker characters.
+
+    ``plain`` and ``marked`` are the same FTS5 snippet without and with the
+    highlight markers; ``marked`` has the markers inserted, so walking both
+    tells them apart from marker characters that were in the text.
+    """
+    result = []
+    position = 0
+    for char in marked:
+        if position < len(plain) and char == plain[position]:
+            position += 1
+            if char in MARKERS:
+                continue  # part of the text
+        result.append(char)
+    return "".join(result)
+
+def fts_query(text: str) -> Optional[str]:
+    """Turn what the user typed into an FTS5 query matching all of its words.
+
+    Words are quoted, so FTS5 operators and punctuation are taken literally.
+    The last word also matches as a prefix, so results appear while typing,
+    unless it is a single character, which would match most of the history.
+    Returns None if there is nothing to search for.
+    """
+    words = WORD.findall(text)
+    if not words:
+        return None
+    query = " ".join(f'"{word}"' for word in words)
+    return query + "*" if len(words[-1]) > 1 else query
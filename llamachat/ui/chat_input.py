@@ -3,6 +3,7 @@ from PyQt6.QtCore import pyqtSignal, Qt, QEvent
 
 class ChatInput(QWidget):
     message_submitted = pyqtSignal(str)
+    stop_requested = pyqtSignal()
     
     def __init__(self):
         super().__init__()
@@ -18,8 +19,12 @@ class ChatInput(QWidget):
         self.send_button = QPushButton("Send")
         self.setup_send_button()
         
+        self.stop_button = QPushButton("Stop")
+        self.setup_stop_button()
+        
         layout.addWidget(self.message_input)
         layout.addWidget(self.send_button)
+        layout.addWidget(self.stop_button)
         
         self.message_input.installEventFilter(self)
         self.setup_tooltip()
@@ -39,6 +44,27 @@ class ChatInput(QWidget):
             }
         """)
     
+    def setup_stop_button(self):
+        self.stop_button.clicked.connect(self.stop_requested.emit)
+        self.stop_button.setToolTip("Stop generating the response")
+        self.stop_button.setStyleSheet("""
+            QPushButton {
+                background-color: #e0e0e0;
+                color: #333;
+                border: none;
+                padding: 5px 15px;
+                border-radius: 5px;
+            }
+            QPushButton:hover {
+                background-color: #d0d0d0;
+            }
+        """)
+        self.stop_button.hide()
+    
+    def set_generating(self, generating: bool):
+        """Show the Stop button while a response is being generated."""
+        self.stop_button.setVisible(generating)
+    
     def setup_tooltip(self):
         modifier_key = "⌘" if self.is_macos() else "Ctrl"
         self.message_input.setToolTip(
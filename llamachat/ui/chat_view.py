@@ -0,0 +1,115 @@
+from typing import Optional
+from PyQt6.QtWidgets import QListView
+from PyQt6.QtCore import QModelIndex, QPoint
+
+class ChatView(QListView):
+    """Message list that loads older history as it is scrolled towards the top.
+
+    When the model prepends older messages, the scroll position is moved by
+    their height so the messages on screen stay where they were; the first
+    page of a chat is shown from the bottom, or from the model's anchor row
+    when it was loaded around a message. After every scroll the visible rows
+    are reported to the model so that it can keep their text loaded.
+    Models can be swapped to show another chat where it was left.
+    """
+    FETCH_MARGIN = 300  # pixels from the top (bottom) at which older (newer) messages are fetched
+
+    def __init__(self):
+        super().__init__()
+        self._distance_from_bottom = None  # set while older rows are being inserted
+        self._adjusting = False  # the view is moving itself; don't react to scrolling
+        self.verticalScrollBar().rangeChanged.connect(self.update_visible_rows)
+
+    def setModel(self, model):
+        previous, selection = self.model(), self.selectionModel()
+        if previous is not None:
+            previous.rowsAboutToBeInserted.disconnect(self._remember_position)
+            previous.rowsInserted.disconnect(self._restore_position)
+            previous.modelReset.disconnect(self._show_start)
+        self._distance_from_bottom = None
+        self._adjusting = False
+        super().setModel(model)
+        if selection is not None:
+            selection.deleteLater()
+        model.rowsAboutToBeInserted.connect(self._remember_position)
+        model.rowsInserted.connect(self._restore_position)
+        model.modelReset.connect(self._show_start)
+
+    def scroll_to(self, value: Optional[int]):
+        """Lay out the rows and scroll to ``value``, or to the bottom if None."""
+        self._adjusting = True
+        try:
+            self.executeDelayedItemsLayout()
+            if value is None:
+                self.scrollToBottom()
+            else:
+                self.verticalScrollBar().setValue(value)
+        finally:
+            self._adjusting = False
+        self.update_visible_rows()
+
+    def verticalScrollbarValueChanged(self, value: int):
+        super().verticalScrollbarValueChanged(value)
+        self.update_visible_rows()
+
+    def scroll_to_row(self, row: int):
+        """Lay out the rows and show ``row`` in the middle of the view."""
+        self._adjusting = True
+        try:
+            self.executeDelayedItemsLayout()
+            self.scrollTo(self.model().index(row), QListView.ScrollHint.PositionAtCenter)
+        finally:
+            self._adjusting = False
+        self.update_visible_rows()
+
+    def update_visible_rows(self):
+        model = self.model()
+        if model is None or not model.rowCount() or self._adjusting:
+            return
+        first = self._row_at(0, self.spacing())
+        last = self._row_at(self.viewport().height() - 1, -self.spacing())
+        model.set_visible_rows(
+            first if first >= 0 else 0,
+            last if last >= 0 else model.rowCount() - 1
+        )
+        scrollbar = self.verticalScrollBar()
+        model.set_near_top(scrollbar.value() <= self.FETCH_MARGIN)
+        model.set_near_bottom(scrollbar.value() >= scrollbar.maximum() - self.FETCH_MARGIN)
+        if model.canFetchMore(QModelIndex()):
+            model.fetchMore(QModelIndex())
+
+    def _row_at(self, y: int, step: int) -> int:
+        """Return the row at ``y``, looking past the spacing between rows."""
+        for offset in (0, step):
+            index = self.indexAt(QPoint(self.viewport().width() // 2, y + offset))
+            if index.isValid():
+                return index.row()
+        return -1
+
+    def _show_start(self):
+        """Open a chat at its anchor message if any, else at its newest message."""
+        row = self.model().anchor_row
+        if row is None:
+            self.scroll_to(None)
+        else:
+            self.scroll_to_row(row)
+
+    def _remember_position(self, parent: QModelIndex, first: int, last: int):
+        if first == 0:
+            self._adjusting = True
+            self.executeDelayedItemsLayout()
+            scrollbar = self.verticalScrollBar()
+            self._distance_from_bottom = scrollbar.maximum() - scrollbar.value()
+
+    def _restore_position(self, parent: QModelIndex, first: int, last: int):
+        if self._distance_from_bottom is None:
+            return
+        distance, self._distance_from_bottom = self._distance_from_bottom, None
+        try:
+            # Lay out now so the scroll range includes the new rows
+            self.doItemsLayout()
+            scrollbar = self.verticalScrollBar()
+            scrollbar.setValue(scrollbar.maximum() - distance)
+        finally:
+            self._adjusting = False
+        self.update_visible_rows()
@@ -1,62 +1,81 @@
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QListView
-from PyQt6.QtCore import pyqtSignal, Qt, QTimer
+from PyQt6.QtCore import pyqtSignal, Qt
+from contextlib import aclosing
 import asyncio
+import functools
 import qasync
 import threading
 import logging
 import time
+from typing import List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 from .models.chat_message import ChatMessage
 from .models.chat_list_model import ChatListModel
+from .models.chat_model_cache import CachedChat, ChatModelCache
+from .chat_view import ChatView
 from .delegates.chat_delegate import ChatDelegate
 from .chat_input import ChatInput
-from ..services.database_service import DatabaseService
-from ..services.ollama_service import OllamaService
+from .stream_buffer import StreamBuffer
+from .stream_session import StreamSession
+from .repaint_scheduler import RepaintScheduler
+from ..database.models import Message
+from ..services.async_database_service import AsyncDatabaseService
+from ..services.ollama_service import OllamaService, GenerationCancelled, StreamInterrupted
+from ..services.context_builder import ContextBuilder
+from ..services.generation_metrics import GenerationMetrics
+from ..config import AppConfig
 from .widgets.inline_loading import InlineLoading
 
 class ChatWidget(QWidget):
-    message_sent = pyqtSignal(str)
+    message_sent = pyqtSignal(int)  # chat id, after the user's message was stored
     error_occurred = pyqtSignal(str)  # New signal for error handling
+    reply_saved = pyqtSignal(int)  # chat id, after an assistant reply was stored
+    generation_progress = pyqtSignal(int, str)  # chat id, progress of its reply ("" when done)
     
-    def __init__(self):
+    def __init__(self, ollama_service: OllamaService = None, config: AppConfig = None,
+                 db_service: AsyncDatabaseService = None):
         super().__init__()
-        self.db_service = DatabaseService()
-        self.ollama_service = OllamaService()
+        self.config = config or AppConfig()
+        self.db_service = db_service or AsyncDatabaseService()
+        self.ollama_service = ollama_service or OllamaService()
+        self.context_builder = ContextBuilder(
+            self.db_service,
+            self.ollama_service,
+            token_budget=self.config.context_tokens
+        )
         self.current_chat_id = None
-        self.is_processing = False  # Flag to prevent multiple simultaneous requests
+        self.active_responses = 0  # Responses streaming or queued
+        self.sessions: List[StreamSession] = []  # replies being generated, oldest first
         
         # Create inline loading indicator
         self.loading = InlineLoading(self)
         self.loading.hide()
         
-        self.setup_timers()
         self.setup_ui()
         logger.debug(f"ChatWidget initialized in thread: {threading.current_thread().name}")
 
-    def setup_timers(self):
-        """Setup all timers used by the widget."""
-        self.scroll_timer = QTimer()
-        self.scroll_timer.setSingleShot(True)
-        self.scroll_timer.timeout.connect(self._perform_scroll)
-        
-        self.scroll_start = 0
-        self.scroll_start_time = 0
-        self.scroll_duration = 0.3
-
     def setup_ui(self):
         layout = QVBoxLayout(self)
         
         # Chat display
-        self.chat_view = QListView()
-        self.chat_model = ChatListModel()
+        self.chat_view = ChatView()
+        self.chat_model = self.create_chat_model(None)
+        # Recently viewed chats stay loaded for switching back to them
+        self.chat_models = ChatModelCache(
+            max_messages=self.config.history_cache_messages,
+            max_chars=self.config.history_cache_mb * 1024 * 1024,
+            busy=lambda chat_id: bool(self.sessions_of(chat_id))
+        )
         self.chat_delegate = ChatDelegate()
         self.setup_chat_view()
+        self.repaint_scheduler = RepaintScheduler(self.chat_view, self.chat_delegate)
         
         # Chat input
         self.chat_input = ChatInput()
         self.chat_input.message_submitted.connect(self.send_message)
+        self.chat_input.stop_requested.connect(self.stop_generation)
         
         layout.addWidget(self.chat_view)
         layout.addWidget(self.chat_input)
@@ -79,165 +98,289 @@ class ChatWidget(QWidget):
         scrollbar.setSingleStep(10)
         scrollbar.setPageStep(self.chat_view.height())
 
-    def smooth_scroll_to_bottom(self):
-        """Schedule a smooth scroll to bottom."""
-        scrollbar = self.chat_view.verticalScrollBar()
-        if not self.scroll_timer.isActive():
-            self.scroll_timer.start(16)  # ~60 FPS for smoother animation
-            self.scroll_start = scrollbar.value()
-            self.scroll_target = scrollbar.maximum()
-            self.scroll_start_time = time.time()
-            self.scroll_duration = 0.3  # 300ms animation
-
-    def _perform_scroll(self):
-        """Perform smooth scroll animation using easing."""
-        scrollbar = self.chat_view.verticalScrollBar()
-        current_time = time.time()
-        elapsed = current_time - self.scroll_start_time
-        
-        if elapsed < self.scroll_duration:
-            # Easing function (ease-out cubic)
-            progress = elapsed / self.scroll_duration
-            t = 1 - (1 - progress) ** 3
-            
-            # Calculate new position
-            new_value = self.scroll_start + (self.scroll_target - self.scroll_start) * t
-            scrollbar.setValue(int(new_value))
-            
-            # Continue animation
-            self.scroll_timer.start(16)
-        else:
-            # Ensure we reach the exact target
-            scrollbar.setValue(self.scroll_target)
-
-    def set_chat(self, chat_id: int):
-        """Set the current chat and load its history."""
-        self.current_chat_id = chat_id
-        self.load_chat_history()
-
-    def load_chat_history(self):
-        """Load chat history from database."""
-        if self.current_chat_id is None:
-            return
-        
-        # Start loading indicator without text
-        self.loading.start()
-        
-        # Clear existing messages
-        self.chat_model.clear()
-        
-        # Load messages from database
-        messages = self.db_service.get_chat_messages(self.current_chat_id)
-        for msg in messages:
-            chat_message = ChatMessage(content=msg.content, role=msg.role)
-            self.chat_model.add_message(chat_message)
-        
-        self.loading.stop()
-        
-        # Schedule scroll after the view has been updated
-        QTimer.singleShot(100, self.delayed_scroll_to_bottom)
+    def create_chat_model(self, chat_id: Optional[int]) -> ChatListModel:
+        stored = chat_id is not None
+        return ChatListModel(
+            fetch_page=functools.partial(self.fetch_history_page, chat_id) if stored else None,
+            fetch_newer=functools.partial(self.fetch_newer_page, chat_id) if stored else None,
+            fetch_window=functools.partial(self.fetch_message_window, chat_id) if stored else None,
+            fetch_contents=self.db_service.get_message_contents,
+            page_size=self.config.history_page_size,
+            memory_limit=self.config.history_memory_mb * 1024 * 1024
+        )
 
-    def delayed_scroll_to_bottom(self):
-        """Scroll to bottom after the view has been updated."""
-        scrollbar = self.chat_view.verticalScrollBar()
-        if scrollbar.maximum() > 0:  # Only scroll if there's content
-            self.smooth_scroll_to_bottom()
-        else:  # If content not ready yet, try again
-            QTimer.singleShot(50, self.delayed_scroll_to_bottom)
+    def set_chat(self, chat_id: int, message_id: Optional[int] = None):
+        """Show a chat: where it was left if it is cached, else its newest messages.
 
-    def send_message(self, message: str):
-        logger.debug(f"send_message called in thread: {threading.current_thread().name}")
-        if self.current_chat_id is None:
-            chat = self.db_service.create_chat()
-            self.current_chat_id = chat.id
-            self.message_sent.emit(chat.title)
+        With ``message_id``, show that message instead, loading only the
+        messages around it if it isn't loaded.
+        """
+        if chat_id != self.current_chat_id:
+            self.leave_current_chat()
+            self.current_chat_id = chat_id
+            self.update_generating_state()
+
+            cached = self.chat_models.get(chat_id)
+            if cached is None:
+                cached = CachedChat(self.create_chat_model(chat_id))
+                self.chat_models.put(chat_id, cached)
+                self.show_model(cached.model, None, pinned=message_id is None)
+                if message_id is None:
+                    cached.model.reload()
+            else:
+                self.show_model(cached.model, None if cached.pinned else cached.scroll_value, cached.pinned)
+            self.chat_models.trim(keep=chat_id)
+
+        if message_id is not None:
+            self.repaint_scheduler.reset(pinned=False)
+            row = self.chat_model.row_of_id(message_id)
+            if row >= 0:
+                self.chat_view.scroll_to_row(row)
+            else:
+                self.chat_model.load_around(message_id)
+
+    def leave_current_chat(self):
+        """Remember where the chat was left for switching back to it.
+
+        Its replies keep generating in the background.
+        """
+        cached = self.chat_models.get(self.current_chat_id) if self.current_chat_id is not None else None
+        if cached is not None:
+            cached.scroll_value = self.chat_view.verticalScrollBar().value()
+            cached.pinned = self.repaint_scheduler.pinned
+
+    def show_model(self, model: ChatListModel, scroll_value: Optional[int], pinned: bool):
+        """Display a chat's model, scrolled to ``scroll_value`` or the bottom."""
+        self.repaint_scheduler.reset(pinned)
+        self.chat_model = model
+        self.chat_view.setModel(model)
+        self.chat_view.scroll_to(scroll_value)
+        # Paint the replies streaming into this chat, and only those
+        for session in self.sessions:
+            session.attached = session.model is model
+            if session.attached:
+                self.refresh_message(session.reply)
+
+    def sessions_of(self, chat_id: int) -> List[StreamSession]:
+        return [session for session in self.sessions if session.chat_id == chat_id]
 
-        # Save and display user message
-        self.db_service.add_message(self.current_chat_id, message, "user")
-        self.chat_model.add_message(ChatMessage(content=message, role="user"))
+    def start_session(self, session: StreamSession):
+        session.attached = session.model is self.chat_model
+        session.model.add_message(session.reply)
+        self.sessions.append(session)
 
-        # Get chat history
-        messages = [
-            {"role": msg.role, "content": msg.content}
-            for msg in self.db_service.get_chat_messages(self.current_chat_id)
-        ]
+    def session_updated(self, session: StreamSession):
+        """Repaint a session's reply if its chat is shown and report its progress."""
+        if session.attached:
+            self.refresh_message(session.reply)
+        if session.chat_id is not None:
+            self.generation_progress.emit(session.chat_id, self.sessions_of(session.chat_id)[0].progress)
+
+    def end_session(self, session: StreamSession):
+        self.sessions.remove(session)
+        if session.chat_id is not None:
+            remaining = self.sessions_of(session.chat_id)
+            self.generation_progress.emit(session.chat_id, remaining[0].progress if remaining else "")
+        # A reply can grow a cached chat past the limits while another is shown
+        self.chat_models.trim(keep=self.current_chat_id)
+
+    def stop_generation(self):
+        """Stop generating the reply in the current chat."""
+        self.ollama_service.cancel(self.current_chat_id)
+
+    def update_generating_state(self):
+        """Show the Stop button while the current chat has a reply pending."""
+        self.chat_input.set_generating(self.ollama_service.is_generating(self.current_chat_id))
+
+    def refresh_message(self, message: ChatMessage):
+        """Repaint a message on the next frame if it is still shown."""
+        self.repaint_scheduler.mark_dirty(message)
+
+    def forget_chat(self, chat_id: int):
+        """Drop a deleted chat's messages, clearing the view if it is shown."""
+        self.chat_models.discard(chat_id)
+        if self.current_chat_id == chat_id:
+            self.clear_chat()
+
+    async def fetch_history_page(self, chat_id: int, before: Optional[ChatMessage],
+                                 limit: int) -> List[ChatMessage]:
+        """Return up to ``limit`` stored messages of the chat older than ``before``."""
+        if before is not None and before.message_id is None:
+            return []
+        cursor = (before.timestamp, before.message_id) if before is not None else None
+        messages = await self.db_service.get_message_page(chat_id, cursor, limit)
+        return [self.to_chat_message(msg) for msg in messages]
+
+    async def fetch_newer_page(self, chat_id: int, after: ChatMessage, limit: int) -> List[ChatMessage]:
+        """Return up to ``limit`` stored messages of the chat newer than ``after``."""
+        messages = await self.db_service.get_newer_message_page(chat_id, (after.timestamp, after.message_id), limit)
+        return [self.to_chat_message(msg) for msg in messages]
+
+    async def fetch_message_window(self, chat_id: int, message_id: int,
+                                   limit: int) -> Tuple[List[ChatMessage], bool, bool]:
+        """Return about ``limit`` stored messages around a message of the chat."""
+        messages, has_older, has_newer = await self.db_service.get_message_window(chat_id, message_id, limit)
+        return [self.to_chat_message(msg) for msg in messages], has_older, has_newer
+
+    def to_chat_message(self, msg: Message) -> ChatMessage:
+        return ChatMessage(
+            content=msg.content,
+            role=msg.role,
+            timestamp=msg.created_at,
+            message_id=msg.id,
+            truncated=msg.truncated,
+            metrics=self.db_service.get_message_metrics(msg)
+        )
+
+    def send_message(self, message: str):
+        logger.debug(f"send_message called in thread: {threading.current_thread().name}")
+        # Display the user message right away; it is stored before the reply starts
+        user_message = ChatMessage(content=message, role="user")
+        if self.chat_model.has_newer:
+            # Showing older messages, e.g. from a search: go back to the newest
+            self.chat_model.reload()
+        self.chat_model.add_message(user_message)
+        self.repaint_scheduler.scroll_to_bottom()
 
         logger.debug("Calling handle_ai_response")
-        self.handle_ai_response(messages)
+        self.handle_ai_response(self.current_chat_id, user_message, self.chat_model)
+
+    async def store_user_message(self, chat_id: Optional[int], user_message: ChatMessage,
+                                 model: ChatListModel) -> int:
+        """Store the user's message, creating a chat for it if needed, and return the chat id."""
+        if chat_id is None:
+            chat = await self.db_service.create_chat()
+            chat_id = chat.id
+            # The new chat's messages so far are all in the model showing them
+            self.chat_models.put(chat_id, CachedChat(model))
+            if self.current_chat_id is None and self.chat_model is model:
+                self.current_chat_id = chat_id
+        saved = await self.db_service.add_message(chat_id, user_message.content, "user")
+        user_message.timestamp = saved.created_at
+        user_message.message_id = saved.id
+        self.message_sent.emit(chat_id)
+        return chat_id
 
     @qasync.asyncSlot()
-    async def handle_ai_response(self, messages):
-        if self.is_processing:
-            logger.warning("Already processing a response, ignoring request")
-            return
-            
-        self.is_processing = True
+    async def handle_ai_response(self, chat_id: Optional[int], user_message: ChatMessage,
+                                 model: ChatListModel):
+        self.active_responses += 1
         self.loading.start()
         
         start_time = time.time()
         logger.debug(f"handle_ai_response started in thread: {threading.current_thread().name}")
         
-        # Add temporary message with loading indicator
-        temp_message = ChatMessage(content="", role="assistant")  # Empty content initially
-        self.chat_model.add_message(temp_message)
-        last_index = len(self.chat_model.messages) - 1
-        response_content = ""
-        chunk_count = 0
-        last_scroll_time = 0
-        scroll_interval = 0.1  # seconds
+        # The reply streams into its chat's model, shown or not
+        session = StreamSession(model, ChatMessage(content="", role="assistant"), chat_id)
+        self.start_session(session)
+        temp_message = session.reply
+        metrics = GenerationMetrics()
+        save: Optional[asyncio.Future] = None  # storing the complete reply
+
+        def show_partial_response(text: str):
+            model.set_content(temp_message, text)
+            session.chunk_count = buffer.chunk_count
+            self.session_updated(session)
+
+        # Coalesces chunks; the scheduler repaints the bubble at most once per frame
+        buffer = StreamBuffer(show_partial_response)
+
+        def show_queue_position(position: int):
+            if buffer:
+                return
+            session.queue_position = position
+            model.set_content(temp_message, f"Waiting in queue (position {position})..." if position else "")
+            self.session_updated(session)
 
         try:
-            logger.debug("Starting to process AI response stream")
-            async for chunk in self.ollama_service.get_response(messages):
-                chunk_count += 1
-                response_content += chunk
-                
-                # Update UI less frequently to reduce overhead
-                if chunk_count % 3 == 0:  # Update every 3 chunks
-                    temp_message.content = response_content
-                    model_index = self.chat_model.index(last_index)
-                    self.chat_model.dataChanged.emit(model_index, model_index)
-                    
-                    # Log every 30 chunks
-                    if chunk_count % 30 == 0:
-                        logger.debug(
-                            f"Processing chunk {chunk_count} in thread: {threading.current_thread().name}, "
-                            f"content length: {len(response_content)}, "
-                            f"time elapsed: {time.time() - start_time:.2f}s"
-                        )
-                    
-                    # Smooth scrolling with rate limiting
-                    current_time = time.time()
-                    if current_time - last_scroll_time >= scroll_interval:
-                        self.smooth_scroll_to_bottom()
-                        last_scroll_time = current_time
-                        await asyncio.sleep(0.01)
-
-            # Final update with complete response
-            temp_message.content = response_content
-            model_index = self.chat_model.index(last_index)
-            self.chat_model.dataChanged.emit(model_index, model_index)
-            self.smooth_scroll_to_bottom()
-
-            logger.debug(f"Stream completed in {time.time() - start_time:.2f}s, saving to database")
-            await asyncio.to_thread(
-                self.db_service.add_message,
-                self.current_chat_id,
-                response_content,
-                "assistant"
-            )
+            chat_id = session.chat_id = await self.store_user_message(chat_id, user_message, model)
+            self.session_updated(session)
+
+            # Hold the chat's slot until the answer is saved, so a queued
+            # follow-up in the same chat sees it in its history
+            async with self.ollama_service.generation(chat_id, show_queue_position):
+                self.update_generating_state()
+                messages = await self.context_builder.build(chat_id)
+
+                logger.debug("Starting to process AI response stream")
+                stream = self.ollama_service.get_response(messages, chat_id=chat_id, metrics=metrics)
+                async with aclosing(stream):
+                    try:
+                        async for chunk in stream:
+                            buffer.append(chunk)
+
+                            # Log every 30 chunks
+                            if buffer.chunk_count % 30 == 0:
+                                logger.debug(
+                                    f"Processing chunk {buffer.chunk_count} in thread: "
+                                    f"{threading.current_thread().name}, "
+                                    f"time elapsed: {time.time() - start_time:.2f}s"
+                                )
+                    finally:
+                        buffer.stop()
+                response_content = buffer.text()
+
+                # Final update with complete response
+                model.set_content(temp_message, response_content)
+                temp_message.metrics = metrics
+                self.session_updated(session)
+
+                logger.debug(f"Stream completed in {time.time() - start_time:.2f}s, saving to database")
+                save = asyncio.ensure_future(
+                    self.db_service.add_message(chat_id, response_content, "assistant", metrics=metrics)
+                )
+                # Shielded, so that a Stop arriving now doesn't lose track of
+                # a reply the writer stores anyway
+                reply = await asyncio.shield(save)
+                temp_message.timestamp = reply.created_at
+                temp_message.message_id = reply.id
+            self.reply_saved.emit(chat_id)
+            self.context_builder.schedule_summary(chat_id)
 
+        except GenerationCancelled:
+            logger.debug(f"Generation for chat {chat_id} stopped after {buffer.chunk_count} chunks")
+            response_content = buffer.text()
+            if save is not None:
+                # Stopped after the complete reply was handed to the writer
+                reply = await save
+                temp_message.timestamp = reply.created_at
+                temp_message.message_id = reply.id
+                self.reply_saved.emit(chat_id)
+            elif response_content:
+                # Keep the partial answer, marked as truncated
+                model.set_content(temp_message, response_content)
+                temp_message.truncated = True
+                temp_message.metrics = metrics
+                self.session_updated(session)
+                if await self.db_service.get_chat(chat_id):  # not stopped by deleting the chat
+                    await self.db_service.add_message(chat_id, response_content, "assistant", True, metrics)
+                    self.reply_saved.emit(chat_id)
+            else:
+                model.remove_message(temp_message)
+        except StreamInterrupted as e:
+            # The connection broke part way and could not be resumed: keep
+            # what arrived, marked as truncated
+            logger.error(f"Stream for chat {chat_id} interrupted: {e}")
+            self.error_occurred.emit(f"Error generating response: {str(e)}")
+            model.set_content(temp_message, e.partial)
+            temp_message.truncated = True
+            temp_message.metrics = metrics
+            self.session_updated(session)
+            await self.db_service.add_message(chat_id, e.partial, "assistant", True, metrics)
+            self.reply_saved.emit(chat_id)
         except Exception as e:
             error_msg = f"Error generating response: {str(e)}"
             logger.error(error_msg, exc_info=True)
             self.error_occurred.emit(error_msg)
             if temp_message:
-                temp_message.content = error_msg
-                model_index = self.chat_model.index(last_index)
-                self.chat_model.dataChanged.emit(model_index, model_index)
+                model.set_content(temp_message, error_msg)
+                self.session_updated(session)
         finally:
-            self.is_processing = False
-            self.loading.stop()
+            self.end_session(session)
+            self.active_responses -= 1
+            if not self.active_responses:
+                self.loading.stop()
+            self.update_generating_state()
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
@@ -250,8 +393,10 @@ class ChatWidget(QWidget):
 
     def clear_chat(self):
         """Clear the current chat and reset state."""
+        self.leave_current_chat()
         self.current_chat_id = None
-        self.chat_model.clear()
+        self.update_generating_state()
+        self.show_model(self.create_chat_model(None), None, pinned=True)
         
         # Stop any ongoing loading
         if self.loading and self.loading.isVisible():
@@ -1,43 +1,132 @@
+from dataclasses import dataclass
+from typing import Optional
+from weakref import WeakKeyDictionary
 from PyQt6.QtWidgets import QStyledItemDelegate
-from PyQt6.QtCore import Qt, QRect, QSize, QRectF
-from PyQt6.QtGui import QPainter, QColor, QPainterPath, QFont, QFontMetrics
+from PyQt6.QtCore import Qt, QSize, QRectF, QPointF
+from PyQt6.QtGui import QPainter, QColor, QPainterPath, QFont, QFontMetrics, QTextLayout, QTextOption
 from llamachat.ui.models.chat_message import ChatMessage
+from llamachat.ui.markdown_document import MarkdownDocument
+
+@dataclass
+class BubbleLayout:
+    """The measured and wrapped text of one message at one view width.
+
+    Assistant messages are drawn from a Markdown ``document``, user messages
+    from a plain text ``layout``.
+    """
+    version: int
+    view_width: int
+    text_width: int  # bubble width including padding
+    text_height: int  # bubble height including padding
+    layout: Optional[QTextLayout] = None
+    document: Optional[MarkdownDocument] = None
 
 class ChatDelegate(QStyledItemDelegate):
     PADDING = 10
     BUBBLE_RADIUS = 15
     MIN_WIDTH = 200
     WIDTH_RATIO = 0.7
-    
+
     def __init__(self):
         super().__init__()
         self.font = QFont()
         self.font.setPointSize(12)
         self.metrics = QFontMetrics(self.font)
-    
+        # Layouts are reused until the message's text or the view width
+        # changes, so repaints and scrolling don't re-measure every bubble
+        self._layouts: "WeakKeyDictionary[ChatMessage, BubbleLayout]" = WeakKeyDictionary()
+        # Markdown documents outlive layouts so streamed text updates them incrementally
+        self._documents: "WeakKeyDictionary[ChatMessage, MarkdownDocument]" = WeakKeyDictionary()
+
+    def bubble_layout(self, message: ChatMessage, view_width: int) -> BubbleLayout:
+        """Return the cached layout of the message, computing it if stale."""
+        cached = self._layouts.get(message)
+        if cached and cached.version == message.version:
+            if message.evicted:
+                # Far off screen: keep the size for the view's layout, free the text
+                cached.layout = cached.document = None
+                self._documents.pop(message, None)
+                return cached
+            if cached.view_width == view_width and (cached.layout is not None or cached.document is not None):
+                return cached
+        if message.evicted:
+            return BubbleLayout(
+                version=-1,
+                view_width=view_width,
+                text_width=self.MIN_WIDTH,
+                text_height=self.metrics.lineSpacing() + 2 * self.PADDING
+            )
+
+        text = message.display_text
+        max_width = max(self.MIN_WIDTH, int(view_width * self.WIDTH_RATIO))
+        if message.role == "assistant":
+            cached = self._markdown_layout(message, text, max_width)
+            cached.view_width = view_width
+            self._layouts[message] = cached
+            return cached
+
+        text_width = min(self.metrics.horizontalAdvance(text) + 2 * self.PADDING, max_width)
+
+        # QTextLayout only breaks lines at Unicode line separators
+        layout = QTextLayout(text.replace("\n", "\u2028"), self.font)
+        option = QTextOption()
+        option.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+        layout.setTextOption(option)
+        height = 0.0
+        layout.beginLayout()
+        while True:
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(text_width - 2 * self.PADDING)
+            line.setPosition(QPointF(0, height))
+            height += line.height()
+        layout.endLayout()
+
+        cached = BubbleLayout(
+            version=message.version,
+            view_width=view_width,
+            text_width=text_width,
+            text_height=int(height) + 2 * self.PADDING,
+            layout=layout
+        )
+        self._layouts[message] = cached
+        return cached
+
+    def _markdown_layout(self, message: ChatMessage, text: str, max_width: int) -> BubbleLayout:
+        document = self._documents.get(message)
+        if document is None:
+            document = MarkdownDocument(self.font)
+            self._documents[message] = document
+        document.set_text(text)
+        document.set_text_width(max_width - 2 * self.PADDING)
+        return BubbleLayout(
+            version=message.version,
+            view_width=0,
+            text_width=min(int(document.ideal_width()) + 2 * self.PADDING, max_width),
+            text_height=int(document.height()) + 2 * self.PADDING,
+            document=document
+        )
+
+    def text_top(self, bubble: BubbleLayout) -> int:
+        """Return the offset within the row below which appending to the message changes it."""
+        if bubble.document is None:
+            return 0
+        return 2 * self.PADDING + int(bubble.document.tail_offset())
+
     def paint(self, painter: QPainter, option, index):
         message: ChatMessage = index.data()
-        
+
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         painter.setFont(self.font)
-        
-        # Calculate maximum width based on view width
+
         view_width = option.widget.width() if option.widget else 800
-        max_width = max(self.MIN_WIDTH, int(view_width * self.WIDTH_RATIO))
-        
-        # Calculate text dimensions
-        text_width = min(self.metrics.horizontalAdvance(message.content) + 2 * self.PADDING, 
-                        max_width)
-        text_height = self.metrics.boundingRect(
-            QRect(0, 0, text_width - 2 * self.PADDING, 0),
-            Qt.TextFlag.TextWordWrap,
-            message.content
-        ).height() + 2 * self.PADDING
-        
+        bubble = self.bubble_layout(message, view_width)
+
         # Calculate bubble dimensions and position
-        bubble_width = text_width
-        bubble_height = text_height
-        
+        bubble_width = bubble.text_width
+        bubble_height = bubble.text_height
+
         if message.role == "user":
             bubble_x = min(option.rect.right() - bubble_width - self.PADDING,
                          view_width - bubble_width - self.PADDING * 2)
@@ -45,7 +134,7 @@ class ChatDelegate(QStyledItemDelegate):
         else:
             bubble_x = self.PADDING
             bubble_color = QColor("#FFFFFF")
-        
+
         # Convert QRect to QRectF for the bubble
         bubble_rect = QRectF(
             bubble_x,
@@ -53,41 +142,25 @@ class ChatDelegate(QStyledItemDelegate):
             bubble_width,
             bubble_height
         )
-        
+
         # Draw bubble
         path = QPainterPath()
         path.addRoundedRect(bubble_rect, self.BUBBLE_RADIUS, self.BUBBLE_RADIUS)
-        
+
         painter.setPen(Qt.PenStyle.NoPen)
         painter.setBrush(bubble_color)
         painter.drawPath(path)
-        
+
         # Draw text
-        text_rect = QRect(
-            int(bubble_rect.x() + self.PADDING),
-            int(bubble_rect.y() + self.PADDING),
-            int(bubble_rect.width() - 2 * self.PADDING),
-            int(bubble_rect.height() - 2 * self.PADDING)
-        )
         painter.setPen(QColor("#000000"))
-        painter.drawText(text_rect, Qt.TextFlag.TextWordWrap, message.content)
-    
+        origin = QPointF(bubble_rect.x() + self.PADDING, bubble_rect.y() + self.PADDING)
+        if bubble.document is not None:
+            bubble.document.draw(painter, origin, bubble_width - 2 * self.PADDING)
+        elif bubble.layout is not None:
+            bubble.layout.draw(painter, origin)
+
     def sizeHint(self, option, index):
         message: ChatMessage = index.data()
-        
-        # Calculate maximum width based on view width
         view_width = option.widget.width() if option.widget else 800
-        max_width = max(self.MIN_WIDTH, int(view_width * self.WIDTH_RATIO))
-        
-        # Calculate text dimensions
-        text_width = min(self.metrics.horizontalAdvance(message.content) + 2 * self.PADDING,
-                        max_width)
-        text_height = self.metrics.boundingRect(
-            QRect(0, 0, text_width - 2 * self.PADDING, 0),
-            Qt.TextFlag.TextWordWrap,
-            message.content
-        ).height() + 2 * self.PADDING
-        
-        return QSize(view_width, text_height + 2 * self.PADDING)
-    
-    # ... rest of the ChatDelegate implementation ... 
\ No newline at end of file
+        bubble = self.bubble_layout(message, view_width)
+        return QSize(view_width, bubble.text_height + 2 * self.PADDING)
@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle
+from PyQt6.QtCore import Qt, QSize, QRect
+from PyQt6.QtGui import QPainter, QColor, QFont, QFontMetrics
+from llamachat.ui.models.chat_sidebar_model import ENTRY_ROLE, ChatEntry
+
+def format_activity_time(when: datetime, now: datetime) -> str:
+    """Return a short local time for the sidebar: the time today, the weekday this week, else the date."""
+    if when.date() == now.date():
+        return when.strftime("%H:%M")
+    if (now.date() - when.date()).days < 7:
+        return when.strftime("%a")
+    if when.year == now.year:
+        return when.strftime("%d %b")
+    return when.strftime("%d %b %Y")
+
+class ChatSidebarDelegate(QStyledItemDelegate):
+    """Draws a chat as its title and last activity above a preview of its newest message."""
+    PADDING = 6
+    SPACING = 8
+
+    def __init__(self):
+        super().__init__()
+        self.font = QFont()
+        self.title_font = QFont(self.font)
+        self.title_font.setWeight(QFont.Weight.DemiBold)
+        self.metrics = QFontMetrics(self.font)
+        self.title_metrics = QFontMetrics(self.title_font)
+
+    def paint(self, painter: QPainter, option, index):
+        entry: ChatEntry = index.data(ENTRY_ROLE)
+        painter.save()
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        if selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+            text_color = detail_color = option.palette.highlightedText().color()
+        else:
+            if option.state & QStyle.StateFlag.State_MouseOver:
+                painter.fillRect(option.rect, QColor("#f0f0f0"))
+            text_color = option.palette.text().color()
+            detail_color = QColor("#888888")
+
+        rect = option.rect.adjusted(self.PADDING, self.PADDING, -self.PADDING, -self.PADDING)
+        line_height = self.metrics.lineSpacing()
+        title_line = QRect(rect.left(), rect.top(), rect.width(), line_height)
+        preview_line = title_line.translated(0, line_height)
+        left = Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter
+        right = Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+
+        # Activity time and message count, right-aligned
+        now = datetime.now().astimezone()
+        when = format_activity_time(entry.last_message_at.replace(tzinfo=timezone.utc).astimezone(), now)
+        count = str(entry.message_count) if entry.message_count else ""
+        painter.setFont(self.font)
+        painter.setPen(detail_color)
+        painter.drawText(title_line, right, when)
+        painter.drawText(preview_line, right, count)
+
+        # Title (with any reply progress) and preview, elided before them
+        title_width = title_line.width() - self.metrics.horizontalAdvance(when) - self.SPACING
+        preview_width = preview_line.width() - (self.metrics.horizontalAdvance(count) + self.SPACING if count else 0)
+        preview = " ".join(entry.preview.split())
+        painter.drawText(
+            preview_line, left, self.metrics.elidedText(preview, Qt.TextElideMode.ElideRight, preview_width)
+        )
+        painter.setFont(self.title_font)
+        painter.setPen(text_color)
+        title = index.data(Qt.ItemDataRole.DisplayRole)
+        painter.drawText(
+            title_line, left, self.title_metrics.elidedText(title, Qt.TextElideMode.ElideRight, title_width)
+        )
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.metrics.lineSpacing() * 2 + 2 * self.PADDING)
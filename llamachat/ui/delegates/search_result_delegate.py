@@ -0,0 +1,61 @@
+import html
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle
+from PyQt6.QtCore import QSize, QRectF
+from PyQt6.QtGui import QPainter, QColor, QFont, QFontMetrics, QTextDocument
+from llamachat.services.search import HIGHLIGHT_END, HIGHLIGHT_START, SearchResult
+
+def snippet_html(snippet: str) -> str:
+    """Return a search snippet as HTML with the matched terms in bold."""
+    return (
+        html.escape(" ".join(snippet.split()))
+        .replace(HIGHLIGHT_START, "<b>")
+        .replace(HIGHLIGHT_END, "</b>")
+    )
+
+class SearchResultDelegate(QStyledItemDelegate):
+    """Draws a search result as its chat's title above the matching text.
+
+    When the title itself matched, the title is shown highlighted instead.
+    """
+    PADDING = 6
+    SNIPPET_LINES = 2
+
+    def __init__(self):
+        super().__init__()
+        self.font = QFont()
+        self.metrics = QFontMetrics(self.font)
+
+    def paint(self, painter: QPainter, option, index):
+        result: SearchResult = index.data()
+        painter.save()
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        elif option.state & QStyle.StateFlag.State_MouseOver:
+            painter.fillRect(option.rect, QColor("#f0f0f0"))
+
+        if result.message_id is None:
+            title = snippet_html(result.snippet)
+            snippet = '<span style="color: #888888;">Chat title</span>'
+        else:
+            title = html.escape(result.chat_title)
+            snippet = snippet_html(result.snippet)
+
+        rect = QRectF(option.rect).adjusted(self.PADDING, self.PADDING, -self.PADDING, -self.PADDING)
+        line_height = self.metrics.lineSpacing()
+        painter.translate(rect.topLeft())
+        self._draw_html(painter, f'<span style="font-weight: 600;">{title}</span>', rect.width(), line_height)
+        painter.translate(0, line_height)
+        self._draw_html(painter, snippet, rect.width(), line_height * self.SNIPPET_LINES)
+        painter.restore()
+
+    def _draw_html(self, painter: QPainter, markup: str, width: float, height: float):
+        """Draw rich text wrapped to ``width`` and clipped to ``height``."""
+        document = QTextDocument()
+        document.setDocumentMargin(0)
+        document.setDefaultFont(self.font)
+        document.setHtml(markup)
+        document.setTextWidth(width)
+        document.drawContents(painter, QRectF(0, 0, width, height))
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.metrics.lineSpacing() * (1 + self.SNIPPET_LINES) + 2 * self.PADDING)
@@ -1,19 +1,29 @@
+from typing import List
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, 
-    QPushButton, QSplitter, QListWidget,
-    QListWidgetItem, QMessageBox, QMenu,
-    QInputDialog
+    QPushButton, QSplitter, QListView, QLineEdit,
+    QMessageBox, QMenu, QInputDialog, QAbstractItemView
 )
 from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QAction, QKeySequence
 from llamachat.ui.chat_widget import ChatWidget
-from llamachat.services.database_service import DatabaseService
+from llamachat.ui.models.chat_sidebar_model import ChatSidebarModel
+from llamachat.ui.models.search_results_model import SearchResultsModel
+from llamachat.ui.delegates.search_result_delegate import SearchResultDelegate
+from llamachat.ui.delegates.chat_sidebar_delegate import ChatSidebarDelegate
+from llamachat.services.async_database_service import AsyncDatabaseService
+from llamachat.services.database_compactor import DatabaseCompactor
 from llamachat.ui.widgets.overlay_loading import OverlayLoading
 from llamachat.services.ollama_service import OllamaService
+from llamachat.services.response_cache import ResponseCache
+from llamachat.services.cassette import CassetteRecorder
+from llamachat.config import AppConfig
 import qasync
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, config: AppConfig = None):
         super().__init__()
+        self.config = config or AppConfig()
         self.setup_services()
         
         # Create loading overlay before UI setup
@@ -26,22 +36,46 @@ class MainWindow(QMainWindow):
 
     def setup_services(self):
         """Initialize all services."""
-        self.db_service = DatabaseService()
-        self.ollama_service = OllamaService()
+        self.db_service = AsyncDatabaseService()
+        # Purges deleted chats and shrinks the database while no reply streams
+        self.compactor = DatabaseCompactor(self.db_service, is_busy=lambda: bool(self.chat_widget.sessions))
+        self.ollama_service = OllamaService(
+            model_name=self.config.model_name,
+            temperature=self.config.temperature,
+            max_retries=self.config.max_retries,
+            resume_streams=self.config.resume_streams,
+            hosts=self.config.host_urls,
+            num_parallel=self.config.num_parallel,
+            keep_alive=self.config.keep_alive,
+            idle_unload=self.config.idle_unload_minutes * 60 or None,
+            memory_limit=self.config.model_memory_limit_mb * 1024 * 1024,
+            response_cache=ResponseCache(
+                self.db_service,
+                memory_limit=self.config.response_cache_mb * 1024 * 1024,
+                disk_limit=self.config.response_cache_disk_mb * 1024 * 1024
+            ),
+            recorder=CassetteRecorder(self.config.record_cassette) if self.config.record_cassette else None
+        )
 
     def setup_connections(self):
         """Setup all signal connections."""
-        self.chat_widget.message_sent.connect(self.update_chat_list)
+        self.chat_widget.message_sent.connect(self.chat_list_model.touch_chat)
+        self.chat_widget.reply_saved.connect(self.chat_list_model.touch_chat)
+        self.chat_widget.reply_saved.connect(self.update_chat_metrics)
+        self.chat_widget.generation_progress.connect(self.chat_list_model.set_progress)
         self.chat_widget.error_occurred.connect(self.show_error_dialog)
         
     def show_error_dialog(self, message: str):
         """Show error dialog to user."""
-        QMessageBox.critical(
-            self,
-            "Error",
-            message,
-            QMessageBox.StandardButton.Ok
-        )
+        self.show_message_dialog(QMessageBox.Icon.Critical, "Error", message)
+
+    def show_message_dialog(self, icon: QMessageBox.Icon, title: str, message: str):
+        """Show a message without blocking, so it is safe from coroutines."""
+        dialog = QMessageBox(icon, title, message, QMessageBox.StandardButton.Ok, self)
+        dialog.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        # Messages are shown from running coroutines; exec() would start a
+        # nested event loop that qasync cannot re-enter
+        dialog.open()
 
     @qasync.asyncSlot()
     async def initialize_app(self):
@@ -50,20 +84,22 @@ class MainWindow(QMainWindow):
         try:
             # Load chats
             self.load_chats()
+            # Finish purging chats deleted before the app last quit
+            self.compactor.schedule()
             
             # Warm up Ollama
             self.loading.setText("Warming up AI model...")
             success = await self.ollama_service.warmup()
             
             if not success:
-                QMessageBox.warning(
-                    self,
+                self.show_message_dialog(
+                    QMessageBox.Icon.Warning,
                     "Warmup Warning",
                     "AI model warmup failed. The first response might be slower than usual."
                 )
         except Exception as e:
-            QMessageBox.critical(
-                self,
+            self.show_message_dialog(
+                QMessageBox.Icon.Critical,
                 "Initialization Error",
                 f"Error during initialization: {str(e)}"
             )
@@ -99,15 +135,46 @@ class MainWindow(QMainWindow):
             }
         """)
         
-        self.chat_list = QListWidget()
-        self.chat_list.itemClicked.connect(self.chat_selected)
+        self.chat_list_model = ChatSidebarModel(self.db_service)
+        self.chat_list = QListView()
+        self.chat_list.setModel(self.chat_list_model)
+        self.chat_list.setItemDelegate(ChatSidebarDelegate())
+        self.chat_list.setUniformItemSizes(True)
+        self.chat_list.setMouseTracking(True)
+        self.chat_list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.chat_list.clicked.connect(self.chat_selected)
+        delete_action = QAction("Delete Chats", self.chat_list)
+        delete_action.setShortcuts([QKeySequence(QKeySequence.StandardKey.Delete), QKeySequence(Qt.Key.Key_Backspace)])
+        delete_action.setShortcutContext(Qt.ShortcutContext.WidgetShortcut)
+        delete_action.triggered.connect(self.confirm_delete_selected_chats)
+        self.chat_list.addAction(delete_action)
+        
+        # Full-text search; results replace the chat list while there is a query
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search chats")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.textChanged.connect(self.search_changed)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)  # wait for a pause in typing
+        self.search_timer.timeout.connect(self.run_search)
+        
+        self.search_results_model = SearchResultsModel(self.db_service)
+        self.search_results = QListView()
+        self.search_results.setModel(self.search_results_model)
+        self.search_results.setItemDelegate(SearchResultDelegate())
+        self.search_results.setUniformItemSizes(True)
+        self.search_results.setMouseTracking(True)
+        self.search_results.clicked.connect(self.search_result_selected)
+        self.search_results.hide()
         
         sidebar_layout.addWidget(new_chat_btn)
+        sidebar_layout.addWidget(self.search_box)
         sidebar_layout.addWidget(self.chat_list)
+        sidebar_layout.addWidget(self.search_results)
         
         # Chat widget
-        self.chat_widget = ChatWidget()
-        self.chat_widget.message_sent.connect(self.update_chat_list)
+        self.chat_widget = ChatWidget(self.ollama_service, self.config, self.db_service)
         
         splitter.addWidget(sidebar)
         splitter.addWidget(self.chat_widget)
@@ -120,51 +187,87 @@ class MainWindow(QMainWindow):
         self.chat_list.customContextMenuRequested.connect(self.show_context_menu)
 
     def load_chats(self):
-        self.chat_list.clear()
-        chats = self.db_service.get_all_chats()
-        for chat in chats:
-            item = QListWidgetItem(chat.title)
-            item.setData(Qt.ItemDataRole.UserRole, chat.id)
-            self.chat_list.addItem(item)
-
-    def create_new_chat(self):
-        chat = self.db_service.create_chat()
-        item = QListWidgetItem(chat.title)
-        item.setData(Qt.ItemDataRole.UserRole, chat.id)
-        self.chat_list.insertItem(0, item)
-        self.chat_list.setCurrentItem(item)
+        self.chat_list_model.reload()
+
+    def update_chat_metrics(self, chat_id: int):
+        """Refresh the aggregate metrics shown in the chat's sidebar tooltip."""
+        self.chat_list_model.invalidate_tooltip(chat_id)
+
+    @qasync.asyncSlot()
+    async def create_new_chat(self):
+        chat = await self.db_service.create_chat()
+        self.chat_list_model.add_chat(chat)
+        self.chat_list.setCurrentIndex(self.chat_list_model.index(0))
         self.chat_widget.set_chat(chat.id)
+        self.preload_model(chat.id)
 
-    def chat_selected(self, item):
-        chat_id = item.data(Qt.ItemDataRole.UserRole)
+    def chat_selected(self, index):
+        if len(self.chat_list.selectionModel().selectedRows()) > 1:
+            return  # extending a selection to delete
+        chat_id = index.data(Qt.ItemDataRole.UserRole)
         self.chat_widget.set_chat(chat_id)
+        self.preload_model(chat_id)
 
-    def update_chat_list(self, title):
-        self.load_chats()
+    def search_changed(self, text: str):
+        searching = bool(text.strip())
+        self.chat_list.setVisible(not searching)
+        self.search_results.setVisible(searching)
+        if searching:
+            self.search_timer.start()
+        else:
+            self.search_timer.stop()
+            self.search_results_model.search("")
+
+    def run_search(self):
+        self.search_results_model.search(self.search_box.text())
+
+    def search_result_selected(self, index):
+        """Show the chat of a search result at the matching message."""
+        result = index.data()
+        self.chat_widget.set_chat(result.chat_id, result.message_id)
+        self.preload_model(result.chat_id)
+
+    @qasync.asyncSlot(int)
+    async def preload_model(self, chat_id: int):
+        """Make sure the model is loaded on the chat's host before the user sends a message."""
+        await self.ollama_service.preload(chat_id)
 
     def show_context_menu(self, position):
-        item = self.chat_list.itemAt(position)
-        if item is None:
+        index = self.chat_list.indexAt(position)
+        if not index.isValid():
             return
+        if not self.chat_list.selectionModel().isSelected(index):
+            self.chat_list.setCurrentIndex(index)
+        selected = self.selected_chat_ids()
 
         menu = QMenu()
         rename_action = menu.addAction("Rename Chat")
-        delete_action = menu.addAction("Delete Chat")
+        rename_action.setEnabled(len(selected) == 1)
+        delete_action = menu.addAction("Delete Chat" if len(selected) == 1 else f"Delete {len(selected)} Chats")
         
         action = menu.exec(self.chat_list.mapToGlobal(position))
         
         if action == delete_action:
-            self.confirm_delete_chat(item)
+            self.confirm_delete_chats(selected)
         elif action == rename_action:
-            self.rename_chat(item)
+            self.rename_chat(index)
 
-    def confirm_delete_chat(self, item):
-        chat_id = item.data(Qt.ItemDataRole.UserRole)
-        
+    def selected_chat_ids(self) -> List[int]:
+        return [index.data(Qt.ItemDataRole.UserRole) for index in self.chat_list.selectionModel().selectedRows()]
+
+    def confirm_delete_selected_chats(self):
+        selected = self.selected_chat_ids()
+        if selected:
+            self.confirm_delete_chats(selected)
+
+    def confirm_delete_chats(self, chat_ids: List[int]):
         # Show confirmation dialog
         msg_box = QMessageBox()
         msg_box.setIcon(QMessageBox.Icon.Warning)
-        msg_box.setText("Are you sure you want to delete this chat?")
+        msg_box.setText(
+            "Are you sure you want to delete this chat?" if len(chat_ids) == 1
+            else f"Are you sure you want to delete these {len(chat_ids)} chats?"
+        )
         msg_box.setInformativeText("This action cannot be undone.")
         msg_box.setWindowTitle("Confirm Delete")
         msg_box.setStandardButtons(
@@ -173,16 +276,22 @@ class MainWindow(QMainWindow):
         msg_box.setDefaultButton(QMessageBox.StandardButton.No)
         
         if msg_box.exec() == QMessageBox.StandardButton.Yes:
-            if self.db_service.delete_chat(chat_id):
-                row = self.chat_list.row(item)
-                self.chat_list.takeItem(row)
-                # Clear the chat widget if the deleted chat was selected
-                if self.chat_widget.current_chat_id == chat_id:
-                    self.chat_widget.clear_chat()
+            self.delete_chats(chat_ids)
 
-    def rename_chat(self, item):
-        chat_id = item.data(Qt.ItemDataRole.UserRole)
-        current_title = item.text()
+    @qasync.asyncSlot(list)
+    async def delete_chats(self, chat_ids: List[int]):
+        for chat_id in chat_ids:
+            self.ollama_service.cancel(chat_id)
+        if await self.db_service.delete_chats(chat_ids):
+            self.chat_list_model.remove_chats(set(chat_ids))
+            for chat_id in chat_ids:
+                # Clears the chat widget if the deleted chat was selected
+                self.chat_widget.forget_chat(chat_id)
+            self.compactor.schedule()
+
+    def rename_chat(self, index):
+        chat_id = index.data(Qt.ItemDataRole.UserRole)
+        current_title = index.data(Qt.ItemDataRole.EditRole)
         
         new_title, ok = QInputDialog.getText(
             self,
@@ -192,5 +301,9 @@ class MainWindow(QMainWindow):
         )
         
         if ok and new_title.strip():
-            if self.db_service.rename_chat(chat_id, new_title):
-                item.setText(new_title)
\ No newline at end of file
+            self.save_chat_title(chat_id, new_title)
+
+    @qasync.asyncSlot(int, str)
+    async def save_chat_title(self, chat_id: int, title: str):
+        if await self.db_service.rename_chat(chat_id, title):
+            self.chat_list_model.rename_chat(chat_id, title)
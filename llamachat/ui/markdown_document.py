@@ -0,0 +1,266 @@
+from typing import List, Optional, Tuple
+import html
+import re
+from PyQt6.QtCore import QPointF, QRectF
+from PyQt6.QtGui import QFont, QFontMetrics, QPainter, QTextCursor, QTextDocument
+import markdown
+
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables", "sane_lists"]
+
+STYLE_SHEET = """
+h1 { font-size: x-large; }
+h2 { font-size: large; }
+h3 { font-size: medium; }
+p, ul, ol, pre, table, h1, h2, h3, h4 { margin-top: 6px; margin-bottom: 0; }
+pre, code { font-family: Menlo, Consolas, monospace; }
+pre { background-color: #f4f4f4; }
+table { border-collapse: collapse; }
+th, td { border: 1px solid #cccccc; padding: 3px 6px; }
+th { background-color: #f4f4f4; }
+"""
+
+FENCES = ("```", "~~~")
+# Lines that continue the block above a blank line: list items and indented text
+CONTINUATION = re.compile(r"\s|[-*+]\s|\d+[.)]\s")
+# Unfinished segments longer than this are split, so a long paragraph isn't
+# converted again in full on every flush
+TAIL_LIMIT = 2000
+# Lines other than plain paragraph text, which are never split
+BLOCK_LINE = re.compile(r"\s|[#>|=]|[-*+]\s|\d+[.)]\s")
+# Where a paragraph can be split: between words, before a letter
+SPLIT_POINT = re.compile(r"\s(?=[^\W\d_])")
+
+class MarkdownDocument:
+    """A message's Markdown rendered into cached text documents.
+
+    The text is split into segments at blank lines outside fenced code,
+    unless the next line continues a list or indented block; a fence at the
+    start of a line gets a segment of its own. A segment is complete once
+    the next one has started: it is converted and laid out once, and kept.
+    Only the trailing, unfinished segment changes when more text streams in.
+    An open code block is extended in place with the new lines and only
+    converted once its fence closes, and a paragraph longer than
+    ``TAIL_LIMIT`` is split between words, so a flush costs about the size
+    of the new text rather than of the whole reply. Text that does not
+    extend the previous text (an edit rather than an append) is rendered
+    from scratch.
+
+    Raw HTML in the text is shown as text, not interpreted.
+    """
+
+    def __init__(self, font: QFont):
+        self.font = font
+        self.spacing = QFontMetrics(font).lineSpacing() // 2  # between segments
+        self._markdown = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+        # Model output is not trusted markup: let raw HTML be escaped like text
+        self._markdown.preprocessors.deregister("html_block")
+        self._markdown.inlinePatterns.deregister("html")
+        self._segments: List[QTextDocument] = []
+        self._joined: List[bool] = []  # segment continues a paragraph split from the one above
+        self._tail: Optional[QTextDocument] = None
+        self._tail_joined = False
+        self._code: Optional[str] = None  # code shown in the tail while its fence is open
+        self._complete = ""  # source of the complete segments
+        self._text = ""
+        self._text_width = -1.0
+        self._reset_scan()
+
+    def _reset_scan(self):
+        """Forget how far the text has been scanned for segment boundaries."""
+        self._scanned = 0  # offset of the first line not scanned yet
+        self._in_fence = False
+        self._fenced_segment = False  # the unfinished segment is a code block from its first line
+        self._blank_after: Optional[int] = None  # offset after a blank line, waiting for the next line
+
+    def set_text(self, text: str):
+        if text == self._text:
+            return
+        if not text.startswith(self._complete):
+            self._segments.clear()
+            self._joined.clear()
+            self._tail = self._code = None
+            self._tail_joined = False
+            self._complete = ""
+            self._reset_scan()
+
+        start = len(self._complete)
+        for end, continues in self._boundaries(text, start):
+            self._segments.append(self._render(text[start:end]))
+            self._joined.append(self._tail_joined)
+            self._tail_joined = continues
+            self._tail = self._code = None
+            start = end
+        self._complete = text[:start]
+
+        self._update_tail(text[start:])
+        self._text = text
+
+    def _update_tail(self, tail: str):
+        """Show the unfinished segment, extending an open code block in place."""
+        code = self._open_code(tail)
+        if not code:
+            self._tail = self._render(tail) if tail.strip() else None
+            self._code = None
+            return
+        if self._tail is not None and self._code is not None and code.startswith(self._code):
+            self._append_code(code[len(self._code):])
+        else:
+            self._tail = self._new_document()
+            self._tail.setHtml(f"<pre><code>{html.escape(code)}</code></pre>")
+            if self._text_width >= 0:
+                self._tail.setTextWidth(self._text_width)
+        self._code = code
+
+    @staticmethod
+    def _open_code(tail: str) -> Optional[str]:
+        """Return the code so far if ``tail`` is a code block whose fence is still open."""
+        if not tail.startswith(FENCES):
+            return None
+        first_line_end = tail.find("\n")
+        if first_line_end < 0:
+            return None
+        code = tail[first_line_end + 1:]
+        # A complete closing fence line would have ended the segment, so only
+        # the line being received can be one
+        if code[code.rfind("\n") + 1:].strip().startswith(FENCES):
+            return None
+        # Markdown drops the newline ending the code; it shows once more follows
+        return code[:-1] if code.endswith("\n") else code
+
+    def _append_code(self, code: str):
+        cursor = QTextCursor(self._tail)
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        line_format = cursor.blockFormat()
+        line_format.setTopMargin(0)  # only the block's first line is spaced from the text above
+        lines = code.split("\n")
+        cursor.insertText(lines[0])
+        for line in lines[1:]:
+            cursor.insertBlock(line_format)
+            cursor.insertText(line)
+
+    def set_text_width(self, width: float):
+        """Lay the documents out for ``width``; complete segments only on change."""
+        if width != self._text_width:
+            self._text_width = width
+            for document in self._segments:
+                document.setTextWidth(width)
+        # Setting the width lays the whole document out again, even if unchanged
+        if self._tail is not None and self._tail.textWidth() != width:
+            self._tail.setTextWidth(width)
+
+    @property
+    def documents(self) -> List[QTextDocument]:
+        return self._segments + ([self._tail] if self._tail is not None else [])
+
+    def ideal_width(self) -> float:
+        return max((document.idealWidth() for document in self.documents), default=0.0)
+
+    def _gaps(self) -> List[float]:
+        """Return the space above each document."""
+        joined = self._joined + ([self._tail_joined] if self._tail is not None else [])
+        return [0.0 if index == 0 or continues else self.spacing for index, continues in enumerate(joined)]
+
+    def height(self) -> float:
+        return sum(document.size().height() for document in self.documents) + sum(self._gaps())
+
+    def tail_offset(self) -> float:
+        """Return the offset of the unfinished segment, below which streamed text changes."""
+        gaps = self._gaps()
+        return sum(
+            gaps[index] + document.size().height() for index, document in enumerate(self._segments)
+        ) + (gaps[-1] if self._tail is not None and self._segments else 0.0)
+
+    def draw(self, painter: QPainter, origin: QPointF, width: float):
+        """Draw the documents stacked from ``origin``, clipped to ``width``."""
+        painter.save()
+        painter.translate(origin)
+        for document, gap in zip(self.documents, self._gaps()):
+            painter.translate(0, gap)
+            height = document.size().height()
+            document.drawContents(painter, QRectF(0, 0, width, height))
+            painter.translate(0, height)
+        painter.restore()
+
+    def _new_document(self) -> QTextDocument:
+        document = QTextDocument()
+        document.setDefaultFont(self.font)
+        document.setDefaultStyleSheet(STYLE_SHEET)
+        document.setDocumentMargin(0)
+        return document
+
+    def _render(self, source: str) -> QTextDocument:
+        self._markdown.reset()
+        document = self._new_document()
+        html = self._markdown.convert(source.strip("\n"))
+        # Code blocks end with a newline that would show as an empty line
+        document.setHtml(html.replace("\n</code></pre>", "</code></pre>"))
+        if self._text_width >= 0:
+            document.setTextWidth(self._text_width)
+        return document
+
+    def _boundaries(self, text: str, start: int) -> List[Tuple[int, bool]]:
+        """Return the offsets where complete segments end, after ``start``.
+
+        Each comes with whether the next segment continues a split paragraph.
+        A blank line outside a fence ends a segment once the following
+        non-blank line has arrived and doesn't continue the segment. A fence
+        at the start of a line starts a segment, which its closing fence line
+        ends. The unfinished segment is split if it is too long. Scanning
+        resumes after the last complete line seen by the previous call.
+        """
+        boundaries = []
+        segment_start = start
+        position = self._scanned
+        while True:
+            end = text.find("\n", position)
+            if end < 0:
+                break
+            line = text[position:end]
+            stripped = line.strip()
+            if not stripped:
+                if not self._in_fence and self._blank_after is None and position > segment_start:
+                    self._blank_after = end + 1
+            else:
+                if self._blank_after is not None and not CONTINUATION.match(line):
+                    boundaries.append((self._blank_after, False))
+                    segment_start = self._blank_after
+                self._blank_after = None
+                if stripped.startswith(FENCES):
+                    if not self._in_fence and line.startswith(FENCES):
+                        if position > segment_start:
+                            boundaries.append((position, False))
+                            segment_start = position
+                        self._fenced_segment = True
+                    elif self._in_fence and self._fenced_segment:
+                        boundaries.append((end + 1, False))
+                        segment_start = end + 1
+                        self._fenced_segment = False
+                    self._in_fence = not self._in_fence
+            position = end + 1
+        self._scanned = position
+
+        if not self._in_fence and len(text) - segment_start > TAIL_LIMIT:
+            split = self._split_point(text, segment_start)
+            if split is not None:
+                boundaries.append((split, True))
+                if self._blank_after is not None and self._blank_after <= split:
+                    self._blank_after = None
+        return boundaries
+
+    @staticmethod
+    def _split_point(text: str, start: int) -> Optional[int]:
+        """Return the last offset after ``start`` where a paragraph can be split.
+
+        Only plain paragraph lines are split, between words, and not where a
+        code span, emphasis or link of the line is still open.
+        """
+        for match in reversed(list(SPLIT_POINT.finditer(text, start))):
+            offset = match.end()
+            line_start = max(start, text.rfind("\n", 0, offset) + 1)
+            line = text[line_start:offset]
+            if offset > line_start and BLOCK_LINE.match(text, line_start):
+                continue
+            if line.count("`") % 2 or line.count("*") % 2 or line.count("[") != line.count("]"):
+                continue
+            return offset
+        return None
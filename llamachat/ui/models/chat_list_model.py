@@ -1,28 +1,314 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
 from PyQt6.QtCore import QAbstractListModel, Qt, QModelIndex
 from llamachat.ui.models.chat_message import ChatMessage
 
+logger = logging.getLogger(__name__)
+
+# Returns up to ``limit`` messages older than the given one (newest if None), oldest first
+PageFetcher = Callable[[Optional[ChatMessage], int], Awaitable[List[ChatMessage]]]
+# Returns up to ``limit`` messages newer than the given one, oldest first
+NewerPageFetcher = Callable[[ChatMessage, int], Awaitable[List[ChatMessage]]]
+# Returns about ``limit`` messages around a stored message, oldest first, and
+# whether there are older and newer ones beyond them
+WindowFetcher = Callable[[int, int], Awaitable[Tuple[List[ChatMessage], bool, bool]]]
+# Returns the text of stored messages by database id
+ContentFetcher = Callable[[List[int]], Awaitable[Dict[int, str]]]
+
 class ChatListModel(QAbstractListModel):
-    def __init__(self):
+    """Messages of one chat, loaded a page at a time from the newest.
+
+    Older pages are prepended through ``fetchMore``. Qt's views ask for more
+    rows whenever the end of the list is in view, but chat history grows
+    upwards, so more rows are only offered while the view reports that its
+    top is near (``set_near_top``). To bound memory, the text of stored
+    messages far from the visible rows is evicted once the loaded text
+    exceeds ``memory_limit`` and read back when they scroll into reach.
+
+    ``load_around`` shows the messages around one message instead, e.g. a
+    search result; newer pages are then appended as the view nears the
+    bottom (``set_near_bottom``). Messages added while newer ones are not
+    loaded yet are held back and shown once the newest page has arrived.
+
+    Pages and evicted text are loaded asynchronously; rows are inserted or
+    repainted when they arrive. Loads that complete after the model was
+    reset are dropped.
+    """
+
+    def __init__(self, fetch_page: Optional[PageFetcher] = None,
+                 fetch_contents: Optional[ContentFetcher] = None,
+                 page_size: int = 50, memory_limit: int = 4 * 1024 * 1024,
+                 fetch_newer: Optional[NewerPageFetcher] = None,
+                 fetch_window: Optional[WindowFetcher] = None):
         super().__init__()
-        self.messages = []
-    
+        self.messages: List[ChatMessage] = []
+        self.fetch_page = fetch_page
+        self.fetch_newer = fetch_newer
+        self.fetch_window = fetch_window
+        self.fetch_contents = fetch_contents
+        self.page_size = page_size
+        self.memory_limit = memory_limit  # characters of resident message text
+        self.has_older = False
+        self.has_newer = False
+        self.near_top = False
+        self.near_bottom = False
+        self.anchor_row: Optional[int] = None  # row to show after a reset, instead of the newest
+        self._unlisted: List[ChatMessage] = []  # added while newer messages aren't loaded
+        self.resident_size = 0
+        self._visible = (0, -1)
+        self._loading: Optional[asyncio.Future] = None  # page being loaded
+        self._restoring: Set[int] = set()  # ids of evicted messages being read back
+        self._tasks: Set[asyncio.Future] = set()  # loads and restores in progress
+        self._generation = 0  # bumped on reset
+
     def data(self, index: QModelIndex, role: int):
         if not index.isValid():
             return None
-            
+
         if role == Qt.ItemDataRole.DisplayRole:
             return self.messages[index.row()]
-            
+
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self.messages[index.row()].tooltip
+
         return None
-    
+
     def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
         return len(self.messages)
-    
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return (
+            not parent.isValid() and self._loading is None
+            and (self.has_older and self.near_top or self.has_newer and self.near_bottom)
+        )
+
+    def fetchMore(self, parent: QModelIndex):
+        if not self.canFetchMore(parent):
+            return
+        # Stay put until the view has restored its position and reports again
+        if self.has_older and self.near_top:
+            self.near_top = False
+            self._load_page(self.messages[0] if self.messages else None)
+        else:
+            self.near_bottom = False
+            self._start(self._append_page(self.messages[-1], self._generation))
+
+    def _load_page(self, before: Optional[ChatMessage]):
+        self._start(self._insert_page(before, self._generation))
+
+    def _start(self, coroutine):
+        self._loading = self._run(coroutine)
+
+    def _run(self, coroutine) -> asyncio.Future:
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._load_done)
+        return task
+
+    def _load_done(self, task: asyncio.Future):
+        self._tasks.discard(task)
+        if self._loading is task:
+            self._loading = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Failed to load messages", exc_info=task.exception())
+
+    async def _insert_page(self, before: Optional[ChatMessage], generation: int):
+        page = await self.fetch_page(before, self.page_size)
+        if generation != self._generation:
+            return
+        self.has_older = len(page) == self.page_size
+        # Messages shown before they were stored may be in the page as well
+        shown = {message.message_id for message in self.messages if message.message_id is not None}
+        page = [message for message in page if message.message_id not in shown]
+        if not page:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(page) - 1)
+        self.messages[0:0] = page
+        first, last = self._visible
+        self._visible = (first + len(page), last + len(page))
+        self.resident_size += sum(len(message.content) for message in page)
+        self.endInsertRows()
+        self.evict()
+
+    async def _append_page(self, after: ChatMessage, generation: int):
+        page = await self.fetch_newer(after, self.page_size)
+        if generation != self._generation:
+            return
+        self.has_newer = len(page) == self.page_size
+        if not self.has_newer:
+            # Caught up with the newest messages: show the held back ones,
+            # unless they have been stored meanwhile and came with the page
+            stored = {message.message_id for message in page}
+            page += [message for message in self._unlisted if message.message_id not in stored]
+            self._unlisted = []
+        if not page:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.messages), len(self.messages) + len(page) - 1)
+        self.messages.extend(page)
+        self.resident_size += sum(len(message.content) for message in page)
+        self.endInsertRows()
+        self.evict()
+
+    def set_near_top(self, near_top: bool):
+        self.near_top = near_top
+
+    def set_near_bottom(self, near_bottom: bool):
+        self.near_bottom = near_bottom
+
+    def reload(self):
+        """Replace the rows with the newest page of messages."""
+        live = self._live_messages()
+        self.clear()
+        if live:
+            self.beginInsertRows(QModelIndex(), 0, len(live) - 1)
+            self.messages = live
+            self.resident_size = sum(len(message.content) for message in live)
+            self.endInsertRows()
+        if self.fetch_page:
+            self._load_page(None)
+
+    def load_around(self, message_id: int):
+        """Replace the rows with the messages around a stored message."""
+        self._start(self._reset_to_window(message_id, self._generation))
+
+    async def _reset_to_window(self, message_id: int, generation: int):
+        window, has_older, has_newer = await self.fetch_window(message_id, self.page_size)
+        if generation != self._generation or not window:
+            return
+        live = self._live_messages()
+        self.beginResetModel()
+        self._generation += 1
+        self.messages = window
+        self.has_older = has_older
+        self.has_newer = has_newer
+        if has_newer:
+            self._unlisted = live
+        else:
+            self.messages += live
+        self.near_top = self.near_bottom = False
+        self.resident_size = sum(len(message.content) for message in self.messages)
+        self.anchor_row = next(row for row, message in enumerate(window) if message.message_id == message_id)
+        self._visible = (self.anchor_row, self.anchor_row)
+        try:
+            self.endResetModel()
+        finally:
+            self.anchor_row = None
+        self.evict()
+
+    def _live_messages(self) -> List[ChatMessage]:
+        """Return the shown messages that aren't stored yet, such as streaming replies."""
+        return [message for message in self.messages + self._unlisted if message.message_id is None]
+
     def add_message(self, message: ChatMessage):
+        if self.has_newer:
+            self._unlisted.append(message)
+            return
         self.beginInsertRows(QModelIndex(), len(self.messages), len(self.messages))
         self.messages.append(message)
+        self.resident_size += len(message.content or "")
         self.endInsertRows()
 
+    def set_content(self, message: ChatMessage, content: str):
+        """Change the text of a message, such as a streaming reply, keeping ``resident_size`` exact."""
+        if self.row_of(message) >= 0:
+            self.resident_size += len(content) - len(message.content or "")
+        message.content = content
+
+    def remove_message(self, message: ChatMessage) -> bool:
+        """Remove a message instance from the model."""
+        if any(existing is message for existing in self._unlisted):
+            self._unlisted = [existing for existing in self._unlisted if existing is not message]
+            return True
+        for row, existing in enumerate(self.messages):
+            if existing is message:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.messages[row]
+                self.resident_size -= len(message.content or "")
+                self.endRemoveRows()
+                return True
+        return False
+
+    def row_of_id(self, message_id: int) -> int:
+        """Return the row of a stored message, or -1 if it is not loaded."""
+        for row, message in enumerate(self.messages):
+            if message.message_id == message_id:
+                return row
+        return -1
+
+    def row_of(self, message: ChatMessage) -> int:
+        """Return the row of a message instance, or -1 if it is not shown."""
+        for row in range(len(self.messages) - 1, -1, -1):
+            if self.messages[row] is message:
+                return row
+        return -1
+
+    def set_visible_rows(self, first: int, last: int):
+        """Load the text of rows near the visible ones and evict far ones if needed."""
+        self._visible = (first, last)
+        start, end = self._resident_range()
+        evicted = [
+            message for message in self.messages[start:end]
+            if message.evicted and message.message_id not in self._restoring
+        ]
+        if evicted and self.fetch_contents:
+            self._restoring.update(message.message_id for message in evicted)
+            self._run(self._restore(evicted, self._generation))
+        self.evict()
+
+    async def _restore(self, messages: List[ChatMessage], generation: int):
+        ids = [message.message_id for message in messages]
+        try:
+            contents = await self.fetch_contents(ids)
+        finally:
+            self._restoring.difference_update(ids)
+        if generation != self._generation:
+            return
+        for message in messages:
+            if message.evicted:
+                content = contents.get(message.message_id, "")
+                message.restore(content)
+                self.resident_size += len(content)
+        restored = set(map(id, messages))
+        rows = [row for row, message in enumerate(self.messages) if id(message) in restored]
+        if rows:
+            self.dataChanged.emit(self.index(rows[0]), self.index(rows[-1]))
+
+    def evict(self):
+        """Drop the text of stored messages farthest from the visible rows until under the limit."""
+        if self.resident_size <= self.memory_limit:
+            return
+        start, end = self._resident_range()
+        first, last = self._visible
+        candidates = [
+            row for row in range(len(self.messages))
+            if not start <= row < end
+            and not self.messages[row].evicted
+            and self.messages[row].message_id is not None
+        ]
+        candidates.sort(key=lambda row: first - row if row < first else row - last, reverse=True)
+        for row in candidates:
+            if self.resident_size <= self.memory_limit:
+                break
+            message = self.messages[row]
+            self.resident_size -= len(message.content)
+            message.evict()
+
+    def _resident_range(self):
+        """Return the rows kept in memory: the visible ones and a page either side."""
+        first, last = self._visible
+        return max(0, first - self.page_size), min(len(self.messages), last + 1 + self.page_size)
+
     def clear(self):
-        self.messages.clear()
-        self.layoutChanged.emit() 
\ No newline at end of file
+        self.beginResetModel()
+        self._generation += 1
+        self._loading = None
+        self.messages = []
+        self._unlisted = []
+        self.has_older = False
+        self.has_newer = False
+        self.near_top = False
+        self.near_bottom = False
+        self.resident_size = 0
+        self._visible = (0, -1)
+        self.endResetModel()
@@ -1,12 +1,50 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import Optional
+from llamachat.services.generation_metrics import GenerationMetrics
 
-@dataclass
+# Fields that change how a message is drawn
+_LAYOUT_FIELDS = ("content", "truncated")
+
+@dataclass(eq=False)  # messages are compared and cached by identity
 class ChatMessage:
-    content: str
+    content: Optional[str]  # None while evicted from memory, see ChatListModel
     role: str  # 'user' or 'assistant'
     timestamp: datetime = None
-    
+    message_id: Optional[int] = None  # database id once stored
+    truncated: bool = False  # generation was stopped before it finished
+    metrics: Optional[GenerationMetrics] = None  # set on finished assistant replies
+    version: int = field(default=0, init=False)  # bumped whenever the drawn text changes
+
     def __post_init__(self):
         if self.timestamp is None:
-            self.timestamp = datetime.now() 
\ No newline at end of file
+            self.timestamp = datetime.now()
+
+    def __setattr__(self, name, value):
+        if name in _LAYOUT_FIELDS:
+            object.__setattr__(self, "version", getattr(self, "version", 0) + 1)
+        object.__setattr__(self, name, value)
+
+    @property
+    def evicted(self) -> bool:
+        return self.content is None
+
+    def evict(self):
+        """Drop the text to save memory; the drawn size stays cached."""
+        object.__setattr__(self, "content", None)
+
+    def restore(self, content: str):
+        """Put back the text dropped by ``evict`` without invalidating layouts."""
+        object.__setattr__(self, "content", content)
+
+    @property
+    def display_text(self) -> str:
+        """Return the text shown in the bubble."""
+        if self.truncated:
+            return f"{self.content}\n\n[Response stopped]" if self.content else "[Response stopped]"
+        return self.content
+
+    @property
+    def tooltip(self) -> Optional[str]:
+        """Return the generation metrics shown when hovering the bubble."""
+        return self.metrics.describe() if self.metrics else None
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+from llamachat.ui.models.chat_list_model import ChatListModel
+
+@dataclass
+class CachedChat:
+    """A chat's loaded messages and where its view was left."""
+    model: ChatListModel
+    scroll_value: int = 0
+    pinned: bool = True  # was scrolled to the bottom
+
+class ChatModelCache:
+    """Models of recently viewed chats, so switching back needs no reload.
+
+    Chats are kept in least recently used order. Once the cached chats hold
+    more than ``max_messages`` messages or ``max_chars`` characters of text,
+    the least recently used ones are dropped, except the one being shown and
+    those ``busy`` reports as still receiving messages. Text is measured by
+    the models' ``resident_size``, which counts sent and streamed messages
+    as well as loaded ones. The messages' bubble layouts live as long as
+    the messages, so they are kept with them.
+    """
+
+    def __init__(self, max_messages: int, max_chars: int,
+                 busy: Callable[[int], bool] = lambda chat_id: False):
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.busy = busy
+        self._chats: "OrderedDict[int, CachedChat]" = OrderedDict()
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self._chats
+
+    def __len__(self) -> int:
+        return len(self._chats)
+
+    def get(self, chat_id: int) -> Optional[CachedChat]:
+        """Return a cached chat and mark it as the most recently used."""
+        entry = self._chats.get(chat_id)
+        if entry is not None:
+            self._chats.move_to_end(chat_id)
+        return entry
+
+    def put(self, chat_id: int, entry: CachedChat):
+        self._chats[chat_id] = entry
+        self._chats.move_to_end(chat_id)
+        self.trim(keep=chat_id)
+
+    def discard(self, chat_id: int):
+        self._chats.pop(chat_id, None)
+
+    def trim(self, keep: Optional[int] = None):
+        """Drop least recently used chats until the cache fits its limits."""
+        messages = sum(len(entry.model.messages) for entry in self._chats.values())
+        chars = sum(entry.model.resident_size for entry in self._chats.values())
+        for chat_id in list(self._chats):
+            if messages <= self.max_messages and chars <= self.max_chars:
+                break
+            if chat_id == keep or self.busy(chat_id):
+                continue
+            model = self._chats.pop(chat_id).model
+            messages -= len(model.messages)
+            chars -= model.resident_size
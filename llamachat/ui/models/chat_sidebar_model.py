@@ -0,0 +1,238 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+import asyncio
+import logging
+from PyQt6.QtCore import QAbstractListModel, Qt, QModelIndex
+from llamachat.database.models import Chat
+from llamachat.services.async_database_service import AsyncDatabaseService
+
+logger = logging.getLogger(__name__)
+
+# Data role of the ``ChatEntry`` of a row, for delegates
+ENTRY_ROLE = Qt.ItemDataRole.UserRole + 1
+
+@dataclass
+class ChatEntry:
+    id: int
+    title: str
+    last_message_at: datetime
+    message_count: int = 0
+    token_total: int = 0
+    preview: str = ""
+
+    def describe_totals(self) -> str:
+        messages = "1 message" if self.message_count == 1 else f"{self.message_count} messages"
+        return f"{messages}, about {self.token_total} tokens"
+
+class ChatSidebarModel(QAbstractListModel):
+    """Chats ordered by most recent activity, loaded a page at a time.
+
+    Views fetch further pages as they are scrolled down. Creating, renaming,
+    deleting and new messages change only the affected row, so keeping the
+    sidebar current doesn't depend on how many chats there are. Pages and
+    metrics tooltips are loaded asynchronously; a tooltip is queried when it
+    is first asked for and shown once it has arrived. Chats with a reply
+    being generated show its progress after their title. Message totals and
+    previews come with the chats themselves, so a page is one query of the
+    chat table.
+    """
+
+    def __init__(self, db_service: AsyncDatabaseService, page_size: int = 100):
+        super().__init__()
+        self.db_service = db_service
+        self.page_size = page_size
+        self.entries: List[ChatEntry] = []
+        self.has_more = False
+        self._tooltips: Dict[int, Optional[str]] = {}
+        self._progress: Dict[int, str] = {}
+        self._tasks: Set[asyncio.Future] = set()
+        self._loading = False
+        self._generation = 0  # bumped on reset
+
+    def data(self, index: QModelIndex, role: int):
+        if not index.isValid():
+            return None
+        entry = self.entries[index.row()]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            progress = self._progress.get(entry.id)
+            return f"{entry.title}  ·  {progress}" if progress else entry.title
+
+        if role == Qt.ItemDataRole.EditRole:
+            return entry.title
+
+        if role == Qt.ItemDataRole.UserRole:
+            return entry.id
+
+        if role == ENTRY_ROLE:
+            return entry
+
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if entry.id not in self._tooltips:
+                self._tooltips[entry.id] = None
+                self._run(self._load_tooltip(entry.id))
+            metrics = self._tooltips[entry.id]
+            return f"{entry.describe_totals()}\n{metrics}" if metrics else entry.describe_totals()
+
+        return None
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.entries)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not parent.isValid() and self.has_more and not self._loading
+
+    def fetchMore(self, parent: QModelIndex):
+        if not self.canFetchMore(parent):
+            return
+        last = self.entries[-1] if self.entries else None
+        self._loading = True
+        self._run(self._append_page((last.last_message_at, last.id) if last else None, self._generation))
+
+    def reload(self):
+        """Reset to the first page of chats."""
+        self.beginResetModel()
+        self._generation += 1
+        self.entries = []
+        self._tooltips.clear()
+        self.has_more = True
+        self._loading = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    async def _append_page(self, after, generation: int):
+        try:
+            chats = await self.db_service.get_chat_page(after, self.page_size)
+        finally:
+            if generation == self._generation:
+                self._loading = False
+        if generation != self._generation:
+            return
+        self.has_more = len(chats) == self.page_size
+        # Chats moved to the top while the page was loading are already shown
+        shown = {entry.id for entry in self.entries}
+        entries = [self._entry(chat) for chat in chats if chat.id not in shown]
+        if not entries:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.entries), len(self.entries) + len(entries) - 1)
+        self.entries.extend(entries)
+        self.endInsertRows()
+
+    async def _load_tooltip(self, chat_id: int):
+        metrics = (await self.db_service.get_chat_metrics(chat_id)).get(chat_id)
+        if chat_id not in self._tooltips:  # invalidated meanwhile
+            return
+        self._tooltips[chat_id] = metrics.describe() if metrics else None
+        row = self.row_of(chat_id)
+        if row >= 0:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.ToolTipRole])
+
+    def row_of(self, chat_id: int) -> int:
+        """Return the row of a chat, or -1 if it isn't loaded."""
+        for row, entry in enumerate(self.entries):
+            if entry.id == chat_id:
+                return row
+        return -1
+
+    def add_chat(self, chat: Chat):
+        """Show a new chat at the top."""
+        if self.row_of(chat.id) >= 0:
+            return
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self.entries.insert(0, self._entry(chat))
+        self.endInsertRows()
+
+    def rename_chat(self, chat_id: int, title: str):
+        row = self.row_of(chat_id)
+        if row < 0:
+            return
+        self.entries[row].title = title
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+
+    def remove_chats(self, chat_ids: Set[int]):
+        """Remove chats, a run of adjacent rows at a time."""
+        rows = [row for row, entry in enumerate(self.entries) if entry.id in chat_ids]
+        while rows:
+            last = first = rows.pop()
+            while rows and rows[-1] == first - 1:
+                first = rows.pop()
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.entries[first:last + 1]
+            self.endRemoveRows()
+        for chat_id in chat_ids:
+            self._tooltips.pop(chat_id, None)
+            self._progress.pop(chat_id, None)
+        # Refill a sidebar emptied below a page, which views wouldn't scroll to load
+        if len(self.entries) < self.page_size:
+            self.fetchMore(QModelIndex())
+
+    def touch_chat(self, chat_id: int):
+        """Move a chat with new activity to the top."""
+        row = self.row_of(chat_id)
+        if row < 0:
+            # Not loaded yet (or created elsewhere): pages past the loaded ones
+            # no longer contain it, as its activity time is now the newest
+            self._run(self._add_stored_chat(chat_id))
+            return
+        self.entries[row].last_message_at = datetime.utcnow()
+        if row > 0:
+            self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), 0)
+            self.entries.insert(0, self.entries.pop(row))
+            self.endMoveRows()
+        self._run(self._refresh_chat(chat_id))
+
+    async def _refresh_chat(self, chat_id: int):
+        """Show a chat's stored message totals and preview."""
+        chat = await self.db_service.get_chat(chat_id)
+        row = self.row_of(chat_id)
+        if chat is None or row < 0:
+            return
+        self.entries[row] = self._entry(chat)
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    async def _add_stored_chat(self, chat_id: int):
+        chat = await self.db_service.get_chat(chat_id)
+        if chat is not None:
+            self.add_chat(chat)
+
+    def set_progress(self, chat_id: int, progress: str):
+        """Show the progress of a chat's reply next to its title, or nothing if empty."""
+        if self._progress.get(chat_id, "") == progress:
+            return
+        if progress:
+            self._progress[chat_id] = progress
+        else:
+            del self._progress[chat_id]
+        row = self.row_of(chat_id)
+        if row >= 0:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+
+    def invalidate_tooltip(self, chat_id: int):
+        """Query the chat's metrics again the next time its tooltip is shown."""
+        self._tooltips.pop(chat_id, None)
+
+    def _run(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Future):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Failed to load chats: {task.exception()}")
+
+    @staticmethod
+    def _entry(chat: Chat) -> ChatEntry:
+        return ChatEntry(
+            id=chat.id,
+            title=chat.title,
+            last_message_at=chat.last_message_at,
+            message_count=chat.message_count,
+            token_total=chat.token_total,
+            preview=chat.preview
+        )
@@ -0,0 +1,66 @@
+from typing import List, Set
+import asyncio
+import logging
+from PyQt6.QtCore import QAbstractListModel, Qt, QModelIndex
+from llamachat.services.async_database_service import AsyncDatabaseService
+from llamachat.services.search import SearchResult
+
+logger = logging.getLogger(__name__)
+
+class SearchResultsModel(QAbstractListModel):
+    """Chat titles and messages matching a full-text search, best first.
+
+    Searches run asynchronously; results of a search that was superseded
+    while it ran are dropped.
+    """
+
+    def __init__(self, db_service: AsyncDatabaseService, limit: int = 50):
+        super().__init__()
+        self.db_service = db_service
+        self.limit = limit
+        self.query = ""
+        self.results: List[SearchResult] = []
+        self._tasks: Set[asyncio.Future] = set()
+        self._generation = 0  # bumped for every search
+
+    def data(self, index: QModelIndex, role: int):
+        if not index.isValid():
+            return None
+        result = self.results[index.row()]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return result
+
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return result.chat_title
+
+        return None
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.results)
+
+    def search(self, query: str):
+        """Replace the results with those of ``query``."""
+        self.query = query
+        self._generation += 1
+        if not query.strip():
+            self._show([])
+            return
+        task = asyncio.ensure_future(self._search(query, self._generation))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    async def _search(self, query: str, generation: int):
+        results = await self.db_service.search(query, self.limit)
+        if generation == self._generation:
+            self._show(results)
+
+    def _show(self, results: List[SearchResult]):
+        self.beginResetModel()
+        self.results = results
+        self.endResetModel()
+
+    def _task_done(self, task: asyncio.Future):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Search failed: {task.exception()}")
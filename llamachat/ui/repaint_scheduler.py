@@ -0,0 +1,137 @@
+from typing import Optional, Set, Tuple
+from weakref import WeakKeyDictionary
+import time
+from PyQt6.QtCore import QTimer, Qt
+from PyQt6.QtWidgets import QListView
+from llamachat.ui.models.chat_message import ChatMessage
+from llamachat.ui.delegates.chat_delegate import ChatDelegate
+
+DEFAULT_REFRESH_RATE = 60.0
+PIN_MARGIN = 30  # pixels from the bottom within which the view counts as pinned
+SCROLL_DURATION = 0.3  # seconds of an animated scroll to the bottom
+
+class RepaintScheduler:
+    """Repaint changed messages and follow the bottom once per display frame.
+
+    Messages whose text changed are marked dirty and handled together on the
+    next tick of a single timer running at the screen's refresh rate, which
+    only runs while there is work. If a bubble kept its size, only the part
+    from where its text changed to its bottom is repainted; otherwise the
+    row is laid out again. The view follows the bottom as content grows only
+    while the user is pinned there: scrolling away unpins it, scrolling back
+    down or sending a message pins it again.
+    """
+
+    def __init__(self, view: QListView, delegate: ChatDelegate):
+        self.view = view
+        self.delegate = delegate
+        self.pinned = True
+        self._dirty: Set[ChatMessage] = set()
+        # Size and text offset of each bubble as last shown, by message
+        self._shown: "WeakKeyDictionary[ChatMessage, Tuple[int, int, int]]" = WeakKeyDictionary()
+        self._scroll_start: Optional[Tuple[int, float]] = None  # value and time of an animated scroll
+        self._scrolling = False  # the scheduler is moving the scroll bar itself
+        self._timer = QTimer()
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+
+        scrollbar = view.verticalScrollBar()
+        scrollbar.valueChanged.connect(self._scrolled)
+        scrollbar.rangeChanged.connect(self._range_changed)
+
+    def mark_dirty(self, message: ChatMessage):
+        """Repaint the message on the next frame."""
+        self._dirty.add(message)
+        self._start()
+
+    def scroll_to_bottom(self, animated: bool = True):
+        """Pin the view to the bottom and scroll there, easing over a few frames."""
+        self.pinned = True
+        scrollbar = self.view.verticalScrollBar()
+        self._scroll_start = (scrollbar.value(), time.perf_counter()) if animated else None
+        self._start()
+
+    def reset(self, pinned: bool = True):
+        """Forget pending work, e.g. when another chat is shown."""
+        self._dirty.clear()
+        self._scroll_start = None
+        self.pinned = pinned
+
+    def _start(self):
+        if self._timer.isActive():
+            return
+        screen = self.view.screen()
+        refresh_rate = screen.refreshRate() if screen else 0
+        self._timer.start(max(1, round(1000 / (refresh_rate or DEFAULT_REFRESH_RATE))))
+
+    def _tick(self):
+        dirty, self._dirty = self._dirty, set()
+        relayout = False
+        for message in dirty:
+            relayout |= self._repaint(message)
+        if relayout:
+            self.view.executeDelayedItemsLayout()
+
+        if self.pinned:
+            self._follow()
+        if not self._dirty and self._scroll_start is None:
+            self._timer.stop()
+
+    def _repaint(self, message: ChatMessage) -> bool:
+        """Repaint what changed of a message; return whether its row needs a new layout."""
+        model = self.view.model()
+        row = model.row_of(message)
+        if row < 0:
+            return False
+        index = model.index(row)
+        bubble = self.delegate.bubble_layout(message, self.view.width())
+        text_top = self.delegate.text_top(bubble)
+        shown = self._shown.get(message)
+        self._shown[message] = (bubble.text_width, bubble.text_height, text_top)
+
+        if shown is None or shown[1] != bubble.text_height:
+            model.dataChanged.emit(index, index)
+            return True
+        rect = self.view.visualRect(index)
+        if shown[0] == bubble.text_width:
+            # Text before the bubble's last block is unchanged
+            rect.setTop(rect.top() + min(shown[2], text_top))
+        self.view.viewport().update(rect)
+        return False
+
+    def _follow(self):
+        if self.view.model().has_newer:
+            # The bottom isn't the newest message; don't pull in more pages
+            self._scroll_start = None
+            return
+        scrollbar = self.view.verticalScrollBar()
+        target = scrollbar.maximum()
+        if self._scroll_start is not None:
+            start, start_time = self._scroll_start
+            progress = (time.perf_counter() - start_time) / SCROLL_DURATION
+            if progress < 1:
+                # Ease-out cubic towards the current bottom
+                t = 1 - (1 - progress) ** 3
+                self._set_value(int(start + (target - start) * t))
+                return
+            self._scroll_start = None
+        if scrollbar.value() != target:
+            self._set_value(target)
+
+    def _set_value(self, value: int):
+        self._scrolling = True
+        try:
+            self.view.verticalScrollBar().setValue(value)
+        finally:
+            self._scrolling = False
+
+    def _scrolled(self, value: int):
+        if self._scrolling:
+            return
+        # Scrolled by the user or the view: stop animating and re-evaluate
+        self._scroll_start = None
+        self.pinned = value >= self.view.verticalScrollBar().maximum() - PIN_MARGIN
+
+    def _range_changed(self, minimum: int, maximum: int):
+        if self.pinned:
+            self._start()
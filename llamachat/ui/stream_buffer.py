@@ -0,0 +1,84 @@
+from typing import Callable, List, Optional
+from PyQt6.QtCore import QTimer
+import time
+
+# Flush interval bounds in milliseconds: one to two frames at 60 Hz
+MIN_FLUSH_INTERVAL_MS = 16
+MAX_FLUSH_INTERVAL_MS = 33
+# Weight of the newest gap in the moving average of chunk gaps
+GAP_SMOOTHING = 0.2
+
+class StreamBuffer:
+    """Collect streamed chunks and hand them to the UI at most once per frame.
+
+    Chunks are appended to a list and only joined when the text is asked
+    for, in a single pass together with the text joined before, so the
+    cost of a long reply no longer grows with every token. The first
+    chunk after a quiet period is flushed immediately; after that, flushes
+    are spaced ``MIN_FLUSH_INTERVAL_MS`` apart for slow streams, stretching
+    towards ``MAX_FLUSH_INTERVAL_MS`` as the token rate rises so that fast
+    models coalesce more tokens per repaint.
+    """
+
+    def __init__(self, on_flush: Callable[[str], None]):
+        self.on_flush = on_flush
+        self.chunk_count = 0
+        self._chunks: List[str] = []  # received since the last join
+        self._text = ""  # all chunks joined so far
+        self._last_chunk_time: Optional[float] = None
+        self._last_flush_time = 0.0
+        self._average_gap_ms: Optional[float] = None
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    def __bool__(self) -> bool:
+        return self.chunk_count > 0
+
+    @property
+    def flush_interval_ms(self) -> float:
+        """Return the current flush interval, adapted to the token rate."""
+        if self._average_gap_ms is None:
+            return MIN_FLUSH_INTERVAL_MS
+        interval = MAX_FLUSH_INTERVAL_MS - self._average_gap_ms
+        return max(MIN_FLUSH_INTERVAL_MS, min(MAX_FLUSH_INTERVAL_MS, interval))
+
+    def append(self, chunk: str):
+        now = time.perf_counter()
+        if self._last_chunk_time is not None:
+            gap_ms = (now - self._last_chunk_time) * 1000
+            if self._average_gap_ms is None:
+                self._average_gap_ms = gap_ms
+            else:
+                self._average_gap_ms += GAP_SMOOTHING * (gap_ms - self._average_gap_ms)
+        self._last_chunk_time = now
+        self._chunks.append(chunk)
+        self.chunk_count += 1
+
+        if self._timer.isActive():
+            return
+        due_in_ms = self.flush_interval_ms - (now - self._last_flush_time) * 1000
+        if due_in_ms <= 0:
+            self.flush()
+        else:
+            self._timer.start(int(due_in_ms))
+
+    def text(self) -> str:
+        """Return everything received so far."""
+        if self._chunks:
+            # One copy of the text; += would copy the new chunks twice
+            self._text = "".join([self._text, *self._chunks])
+            self._chunks.clear()
+        return self._text
+
+    def flush(self):
+        """Hand the text received so far to the consumer if anything is new."""
+        self._timer.stop()
+        if not self._chunks:
+            return
+        self._last_flush_time = time.perf_counter()
+        self.on_flush(self.text())
+
+    def stop(self):
+        """Drop any pending flush without notifying the consumer."""
+        self._timer.stop()
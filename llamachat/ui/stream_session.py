@@ -0,0 +1,30 @@
+from dataclasses import dataclass
+from typing import Optional
+from llamachat.ui.models.chat_list_model import ChatListModel
+from llamachat.ui.models.chat_message import ChatMessage
+
+@dataclass(eq=False)
+class StreamSession:
+    """A reply being generated for one chat.
+
+    The reply message lives in its chat's own model, whether or not that
+    chat is shown, so switching chats neither loses it nor paints it into
+    another conversation. The chat widget attaches to the sessions of the
+    chat it displays, which makes their updates repaint the view; detached
+    sessions keep streaming into their model and only report progress.
+    """
+    model: ChatListModel
+    reply: ChatMessage
+    chat_id: Optional[int] = None  # None until a new chat has been created
+    attached: bool = False
+    queue_position: int = 0
+    chunk_count: int = 0
+
+    @property
+    def progress(self) -> str:
+        """Return a short description of how far the reply has got."""
+        if self.queue_position:
+            return f"queued ({self.queue_position})"
+        if self.chunk_count:
+            return f"{self.chunk_count} tokens"
+        return "starting"
@@ -1,6 +1,7 @@
 from PyQt6.QtWidgets import QWidget, QLabel, QVBoxLayout
-from PyQt6.QtCore import Qt, QTimer, QPoint
+from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QPainter, QColor
+from llamachat.ui.widgets.spinner import Spinner
 
 class OverlayLoading(QWidget):
     def __init__(self, text="Loading...", parent=None):
@@ -13,11 +14,6 @@ class OverlayLoading(QWidget):
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint)
         
-        # Setup animation
-        self.angle = 0
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.rotate)
-        
         # Setup layout
         layout = QVBoxLayout(self)
         layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -34,6 +30,10 @@ class OverlayLoading(QWidget):
         """)
         
         layout.addWidget(self.label)
+        
+        # Drawn at the center; only its own area is repainted as it turns
+        self.spinner = Spinner(dot_size=10, radius=20, parent=self)
+        self.spinner.lower()  # below the text
     
     def setText(self, text: str):
         """Update the loading text."""
@@ -43,44 +43,20 @@ class OverlayLoading(QWidget):
         """Start the loading animation and show the overlay."""
         if self.parent():
             self.resize(self.parent().size())
-        self.timer.start(50)
         self.show()
         self.raise_()  # Ensure overlay is on top
     
     def stop(self):
         """Stop the loading animation and hide the overlay."""
-        self.timer.stop()
         self.hide()
     
-    def rotate(self):
-        """Rotate the loading spinner."""
-        self.angle = (self.angle + 10) % 360
-        self.update()
-    
     def resizeEvent(self, event):
         """Handle parent widget resize."""
         if self.parent():
             self.resize(self.parent().size())
+        self.spinner.move(self.rect().center() - self.spinner.rect().center())
     
     def paintEvent(self, event):
-        """Paint the overlay and loading spinner."""
+        """Paint the semi-transparent background of the overlay."""
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
-        # Draw semi-transparent background
-        painter.fillRect(self.rect(), QColor(255, 255, 255, 200))
-        
-        # Draw spinner
-        center = self.rect().center()
-        painter.translate(center)
-        painter.rotate(self.angle)
-        
-        painter.setPen(Qt.PenStyle.NoPen)
-        painter.setBrush(QColor("#0084ff"))
-        
-        # Draw spinning dots
-        for i in range(8):
-            painter.rotate(45)
-            opacity = 0.3 + (i / 8) * 0.7
-            painter.setOpacity(opacity)
-            painter.drawEllipse(-5, -20, 10, 10) 
\ No newline at end of file
+        painter.fillRect(event.rect(), QColor(255, 255, 255, 200))
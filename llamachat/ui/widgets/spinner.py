@@ -0,0 +1,115 @@
+from typing import Dict, List, Set, Tuple
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtCore import Qt, QObject, QTimer, QPointF
+from PyQt6.QtGui import QPainter, QColor, QPixmap
+
+SPINNER_COLOR = "#0084ff"
+DOT_COUNT = 8
+FRAME_COUNT = 36  # 10 degrees per frame
+FRAME_INTERVAL_MS = 50
+# While no spinner is on screen, only check this often whether one is again
+IDLE_INTERVAL_MS = 1000
+
+_frames: Dict[Tuple[int, int, float], List[QPixmap]] = {}
+
+def spinner_frames(dot_size: int, radius: int, pixel_ratio: float) -> List[QPixmap]:
+    """Return the rotation frames of a spinner, rendered on first use.
+
+    ``radius`` is the distance from the center to the outer edge of the dots.
+    """
+    key = (dot_size, radius, pixel_ratio)
+    frames = _frames.get(key)
+    if frames is not None:
+        return frames
+
+    size = 2 * radius + 2  # a pixel either side for antialiasing
+    frames = []
+    for frame in range(FRAME_COUNT):
+        pixmap = QPixmap(round(size * pixel_ratio), round(size * pixel_ratio))
+        pixmap.setDevicePixelRatio(pixel_ratio)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.translate(size / 2, size / 2)
+        painter.rotate(frame * 360 / FRAME_COUNT)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor(SPINNER_COLOR))
+        for i in range(DOT_COUNT):
+            painter.rotate(360 / DOT_COUNT)
+            painter.setOpacity(0.3 + (i / DOT_COUNT) * 0.7)
+            painter.drawEllipse(-dot_size // 2, -radius, dot_size, dot_size)
+        painter.end()
+        frames.append(pixmap)
+    _frames[key] = frames
+    return frames
+
+class AnimationClock(QObject):
+    """One timer that advances every spinner that is shown.
+
+    The timer only runs while a spinner is shown, and slows down while none
+    of them is exposed on screen (minimized or covered windows), so idle and
+    hidden indicators cost no repaints.
+    """
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> "AnimationClock":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        super().__init__()
+        self.frame = 0
+        self._spinners: Set["Spinner"] = set()
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+
+    def add(self, spinner: "Spinner"):
+        self._spinners.add(spinner)
+        if not self._timer.isActive():
+            self._timer.start(FRAME_INTERVAL_MS)
+
+    def remove(self, spinner: "Spinner"):
+        self._spinners.discard(spinner)
+        if not self._spinners:
+            self._timer.stop()
+
+    def _tick(self):
+        exposed = [spinner for spinner in self._spinners if spinner.is_exposed()]
+        self._timer.setInterval(FRAME_INTERVAL_MS if exposed else IDLE_INTERVAL_MS)
+        if not exposed:
+            return
+        self.frame = (self.frame + 1) % FRAME_COUNT
+        for spinner in exposed:
+            spinner.update()
+
+class Spinner(QWidget):
+    """Rotating dots drawn from pre-rendered frames, advanced by the shared clock."""
+
+    def __init__(self, dot_size: int, radius: int, parent=None):
+        super().__init__(parent)
+        self.dot_size = dot_size
+        self.radius = radius
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setFixedSize(2 * radius + 2, 2 * radius + 2)
+
+    def is_exposed(self) -> bool:
+        window = self.window().windowHandle()
+        return window is not None and window.isExposed() and not self.visibleRegion().isEmpty()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        AnimationClock.instance().add(self)
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        AnimationClock.instance().remove(self)
+
+    def paintEvent(self, event):
+        frames = spinner_frames(self.dot_size, self.radius, self.devicePixelRatioF())
+        pixmap = frames[AnimationClock.instance().frame]
+        painter = QPainter(self)
+        size = pixmap.deviceIndependentSize()
+        painter.drawPixmap(QPointF((self.width() - size.width()) / 2, (self.height() - size.height()) / 2), pixmap)
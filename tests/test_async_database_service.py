@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+import asyncio
+import threading
+import unittest
+
+from llamachat.services.async_database_service import AsyncDatabaseService
+
+class FakeDatabaseService:
+    """Records writes; ``block`` holds the writer thread in ``slow_write``."""
+
+    def __init__(self):
+        self.writes = []
+        self.block = threading.Event()
+        self.started = threading.Event()
+
+    @contextmanager
+    def batch(self):
+        yield
+
+    def write(self, value):
+        self.writes.append(value)
+        return value
+
+    def slow_write(self, value):
+        self.started.set()
+        self.block.wait(5)
+        return self.write(value)
+
+class AsyncDatabaseServiceTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.db = FakeDatabaseService()
+        self.service = AsyncDatabaseService(self.db)
+
+    async def asyncTearDown(self):
+        self.db.block.set()
+        await self.service.close()
+
+    async def wait_started(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.db.started.wait, 5)
+
+    async def test_write_after_cancelled_queued_write_completes(self):
+        first = asyncio.ensure_future(self.service.write(self.db.slow_write, "first"))
+        await self.wait_started()
+        queued = asyncio.ensure_future(self.service.write(self.db.write, "cancelled"))
+        await asyncio.sleep(0)
+        queued.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await queued
+        self.db.block.set()
+        self.assertEqual(await first, "first")
+        self.assertEqual(await asyncio.wait_for(self.service.write(self.db.write, "later"), 5), "later")
+        self.assertEqual(self.db.writes, ["first", "later"])
+
+    async def test_write_after_cancelled_running_write_completes(self):
+        running = asyncio.ensure_future(self.service.write(self.db.slow_write, "running"))
+        await self.wait_started()
+        running.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await running
+        self.db.block.set()
+        self.assertEqual(await asyncio.wait_for(self.service.write(self.db.write, "later"), 5), "later")
+        # The cancelled caller doesn't get the result, but the write is committed
+        self.assertEqual(self.db.writes, ["running", "later"])
+
+    async def test_close_commits_queued_writes(self):
+        db = FakeDatabaseService()
+        service = AsyncDatabaseService(db)
+        writes = [asyncio.ensure_future(service.write(db.slow_write, "running"))]
+        await asyncio.get_running_loop().run_in_executor(None, db.started.wait, 5)
+        writes += [asyncio.ensure_future(service.write(db.write, value)) for value in ("queued", "last")]
+        await asyncio.sleep(0)
+        closing = asyncio.ensure_future(service.close())
+        db.block.set()
+        await asyncio.wait_for(closing, 5)
+
+        self.assertEqual(db.writes, ["running", "queued", "last"])
+        self.assertEqual(await asyncio.gather(*writes), ["running", "queued", "last"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import asyncio
+import unittest
+
+from llamachat.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+class CircuitBreakerTest(unittest.TestCase):
+    def open_breaker(self, reset_timeout: float) -> CircuitBreaker:
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=reset_timeout)
+        for _ in range(3):
+            breaker.check()
+            breaker.record_failure()
+        return breaker
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.check()
+        self.assertGreater(breaker.retry_in, 0)
+
+    def test_trial_request_after_timeout_closes_on_success(self):
+        breaker = self.open_breaker(reset_timeout=0)
+
+        breaker.check()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.failures, 0)
+        breaker.check()
+
+    def test_failed_trial_request_opens_again(self):
+        breaker = self.open_breaker(reset_timeout=0)
+
+        breaker.check()
+        breaker.reset_timeout = 60
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.check()
+
+class CircuitBreakerProbeTest(unittest.IsolatedAsyncioTestCase):
+    async def test_probe_closes_the_circuit_once_healthy(self):
+        results = [False, True]
+        calls = 0
+
+        async def probe():
+            nonlocal calls
+            calls += 1
+            return results.pop(0)
+
+        breaker = CircuitBreaker(probe, failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        task = breaker._probe_task
+        self.assertIsNotNone(task)
+
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(calls, 2)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertIsNone(breaker._probe_task)
+
+    async def test_probe_errors_count_as_unhealthy(self):
+        async def probe():
+            raise OSError("connection refused")
+
+        breaker = CircuitBreaker(probe, failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        await asyncio.sleep(0.05)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        # A successful request stops the probing
+        task = breaker._probe_task
+        breaker.record_success()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    async def test_one_probe_runs_at_a_time(self):
+        async def probe():
+            return False
+
+        breaker = CircuitBreaker(probe, failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        task = breaker._probe_task
+        breaker.record_failure()
+        self.assertIs(breaker._probe_task, task)
+        breaker.record_success()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import unittest
+
+from llamachat.services.generation_scheduler import GenerationScheduler
+
+class GenerationSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.admitted = []
+        self.release = {}
+
+    async def generate(self, scheduler: GenerationScheduler, chat_id, name: str, positions=None):
+        """Hold a slot for ``chat_id`` until ``name`` is released."""
+        self.release[name] = asyncio.Event()
+        on_position = positions.append if positions is not None else None
+        async with scheduler.slot(chat_id, on_position):
+            self.admitted.append(name)
+            await self.release[name].wait()
+
+    def start(self, scheduler: GenerationScheduler, chat_id, *names: str) -> list:
+        return [asyncio.create_task(self.generate(scheduler, chat_id, name)) for name in names]
+
+    async def finish(self, name: str):
+        self.release[name].set()
+        # Let the slot be handed over and the next request start
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+    async def test_chat_requests_run_one_at_a_time_in_order(self):
+        scheduler = GenerationScheduler(max_concurrent=2)
+        tasks = self.start(scheduler, 1, "first", "second", "third")
+        await asyncio.sleep(0)
+
+        self.assertEqual(self.admitted, ["first"])
+        self.assertEqual((scheduler.active_count, scheduler.pending_count), (1, 2))
+        await self.finish("first")
+        self.assertEqual(self.admitted, ["first", "second"])
+        await self.finish("second")
+        await self.finish("third")
+        self.assertEqual(self.admitted, ["first", "second", "third"])
+        await asyncio.gather(*tasks)
+        self.assertFalse(scheduler.is_busy(1))
+
+    async def test_free_slots_are_shared_round_robin_across_chats(self):
+        scheduler = GenerationScheduler(max_concurrent=1)
+        tasks = self.start(scheduler, "other", "holder")
+        await asyncio.sleep(0)
+        tasks += self.start(scheduler, 1, "a1", "a2", "a3")
+        await asyncio.sleep(0)
+        tasks += self.start(scheduler, 2, "b1")
+        await asyncio.sleep(0)
+
+        for name in ("holder", "a1", "b1", "a2", "a3"):
+            await self.finish(name)
+        await asyncio.gather(*tasks)
+        # The backlog of chat 1 doesn't keep chat 2 waiting
+        self.assertEqual(self.admitted, ["holder", "a1", "b1", "a2", "a3"])
+
+    async def test_queue_positions_are_reported_until_admitted(self):
+        scheduler = GenerationScheduler(max_concurrent=1)
+        positions = []
+        tasks = self.start(scheduler, 1, "running")
+        await asyncio.sleep(0)
+        tasks += self.start(scheduler, 2, "waiting")
+        tasks.append(asyncio.create_task(self.generate(scheduler, 3, "watched", positions)))
+        await asyncio.sleep(0)
+
+        self.assertEqual(positions, [2])
+        await self.finish("running")
+        self.assertEqual(positions, [2, 1])
+        await self.finish("waiting")
+        await self.finish("watched")
+        await asyncio.gather(*tasks)
+        self.assertEqual(positions, [2, 1, 0])
+
+    async def test_slot_is_reentrant_for_the_task_holding_it(self):
+        scheduler = GenerationScheduler(max_concurrent=1)
+
+        async def nested():
+            async with scheduler.slot(1):
+                async with scheduler.slot(1):
+                    self.assertEqual(scheduler.active_count, 1)
+                # The inner block doesn't give the slot back
+                self.assertTrue(scheduler.is_busy(1))
+
+        await asyncio.wait_for(nested(), 1)
+        self.assertEqual(scheduler.active_count, 0)
+
+    async def test_slot_is_not_shared_with_other_tasks(self):
+        scheduler = GenerationScheduler(max_concurrent=1)
+        tasks = self.start(scheduler, 1, "first")
+        await asyncio.sleep(0)
+        tasks += self.start(scheduler, 1, "second")
+        await asyncio.sleep(0)
+
+        self.assertEqual(self.admitted, ["first"])
+        await self.finish("first")
+        await self.finish("second")
+        await asyncio.gather(*tasks)
+        self.assertEqual(self.admitted, ["first", "second"])
+
+    async def test_cancelled_waiter_leaves_the_queue(self):
+        scheduler = GenerationScheduler(max_concurrent=1)
+        tasks = self.start(scheduler, 1, "running")
+        await asyncio.sleep(0)
+        [cancelled] = self.start(scheduler, 2, "cancelled")
+        tasks += self.start(scheduler, 3, "next")
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await cancelled
+
+        self.assertEqual(scheduler.pending_count, 1)
+        await self.finish("running")
+        await self.finish("next")
+        await asyncio.gather(*tasks)
+        self.assertEqual(self.admitted, ["running", "next"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+
+from llamachat.services.circuit_breaker import CircuitOpenError
+from llamachat.services.host_pool import HostPool, OllamaHost
+from llamachat.services.model_residency import LoadedModel
+
+MODEL = "llama3.2:latest"
+
+def mark_down(host: OllamaHost):
+    """Open the host's circuit until well after the test."""
+    breaker = host.circuit_breaker
+    breaker.reset_timeout = 60
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+class HostPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.first = OllamaHost("http://gpu-1:11434")
+        self.second = OllamaHost("http://gpu-2:11434")
+        self.third = OllamaHost("http://gpu-3:11434")
+        self.pool = HostPool([self.first, self.second, self.third])
+
+    def test_least_outstanding_host_is_selected(self):
+        self.first.outstanding = 2
+        self.second.outstanding = 1
+        self.third.outstanding = 1
+
+        # Ties go to the host listed first
+        self.assertIs(self.pool.select(MODEL), self.second)
+        self.second.outstanding = 2
+        self.assertIs(self.pool.select(MODEL), self.third)
+
+    def test_ties_prefer_hosts_with_the_model_loaded(self):
+        self.third.residency.loaded = {MODEL: LoadedModel(MODEL, 0, 0, None)}
+
+        self.assertIs(self.pool.select("llama3.2"), self.third)
+        self.third.outstanding = 1
+        self.assertIs(self.pool.select("llama3.2"), self.first)
+
+    def test_hosts_without_the_model_are_a_last_resort(self):
+        self.first.available_models = {"mistral:latest"}
+        self.second.available_models = {MODEL}
+        self.second.outstanding = 3
+        self.third.outstanding = 4
+
+        # Hosts whose models aren't known yet are tried like those with the model
+        self.assertIs(self.pool.select(MODEL), self.second)
+        self.third.available_models = set()
+        self.second.available_models = set()
+        self.assertIs(self.pool.select(MODEL), self.first)
+
+    def test_chat_sticks_to_its_host(self):
+        host = self.pool.select(MODEL, chat_id=1)
+        host.outstanding = 5
+
+        self.assertIs(self.pool.select(MODEL, chat_id=1), host)
+        self.assertIsNot(self.pool.select(MODEL, chat_id=2), host)
+        self.pool.forget(1)
+        self.assertIsNot(self.pool.select(MODEL, chat_id=1), host)
+
+    def test_chat_moves_when_its_host_is_down(self):
+        self.assertIs(self.pool.select(MODEL, chat_id=1), self.first)
+        mark_down(self.first)
+
+        self.assertIs(self.pool.select(MODEL, chat_id=1), self.second)
+        # and stays on the new host once the old one is back
+        self.first.circuit_breaker.record_success()
+        self.assertIs(self.pool.select(MODEL, chat_id=1), self.second)
+
+    def test_assign_moves_the_chat_to_the_host_with_the_url(self):
+        self.pool.select(MODEL, chat_id=1)
+        self.pool.assign(1, self.third.url)
+
+        self.assertIs(self.pool.select(MODEL, chat_id=1), self.third)
+
+    def test_excluded_hosts_are_skipped(self):
+        self.assertIs(self.pool.select(MODEL, exclude={self.first}), self.second)
+        self.assertIs(self.pool.select(MODEL, chat_id=1, exclude={self.first, self.second}), self.third)
+
+    def test_excluded_hosts_are_used_when_nothing_else_is_left(self):
+        self.second.outstanding = 1
+        self.third.outstanding = 1
+        mark_down(self.first)
+
+        everything = {self.first, self.second, self.third}
+        self.assertIs(self.pool.select(MODEL, exclude=everything), self.second)
+        # A host that is down is never selected, excluded or not
+        self.second.outstanding = self.third.outstanding = 0
+        self.assertIs(self.pool.select(MODEL, exclude={self.second, self.third}), self.second)
+
+    def test_no_reachable_host(self):
+        for host in self.pool.hosts:
+            mark_down(host)
+
+        with self.assertRaises(CircuitOpenError):
+            self.pool.select(MODEL)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtGui import QFont
+from PyQt6.QtWidgets import QApplication
+
+from llamachat.ui.markdown_document import TAIL_LIMIT, MarkdownDocument
+
+def stream(document: MarkdownDocument, text: str, step: int = 7, start: int = 0):
+    """Feed ``text`` to the document the way a streamed reply grows, from ``start``."""
+    for end in range(start + step, len(text) + step, step):
+        document.set_text(text[:end])
+        document.set_text_width(400)
+
+class MarkdownDocumentTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.document = MarkdownDocument(QFont())
+
+    def plain_text(self, document: MarkdownDocument) -> str:
+        return "\n".join(part.toPlainText() for part in document.documents)
+
+    def test_open_code_block_is_extended_in_place(self):
+        opening = "Code:\n\n```python\nx = 1\n"
+        self.document.set_text(opening)
+        tail = self.document.documents[-1]
+        text = "Code:\n\n```python\n" + "".join(f"x = {i}\n" for i in range(1, 50))
+        stream(self.document, text, start=len(opening))
+
+        self.assertIs(self.document.documents[-1], tail)
+        self.assertEqual(tail.toPlainText(), "\n".join(f"x = {i}" for i in range(1, 49)) + "\nx = 49")
+
+    def test_closed_code_block_renders_like_the_whole_reply(self):
+        text = "Code:\n\n```\n" + "".join(f"print({i})\n" for i in range(40)) + "```\n\nDone.\n"
+        stream(self.document, text)
+        whole = MarkdownDocument(QFont())
+        whole.set_text(text)
+        whole.set_text_width(400)
+
+        self.assertEqual(self.plain_text(self.document), self.plain_text(whole))
+        self.assertEqual(self.document.height(), whole.height())
+
+    def test_long_paragraph_is_split_between_words(self):
+        text = " ".join(f"word{i} **bold{i}** and `code{i}`." for i in range(400))
+        stream(self.document, text, step=50)
+
+        parts = [part.toPlainText() for part in self.document.documents]
+        self.assertGreater(len(parts), 1)
+        self.assertTrue(all(len(part) <= TAIL_LIMIT for part in parts))
+        words = [word.replace("**", "").replace("`", "") for word in text.split()]
+        self.assertEqual(" ".join(parts).split(), words)
+
+    def test_raw_html_is_shown_as_text(self):
+        self.document.set_text("<b>bold</b> <script>alert(1)</script>")
+
+        self.assertEqual(self.plain_text(self.document), "<b>bold</b> <script>alert(1)</script>")
+
+if __name__ == "__main__":
+    unittest.main()
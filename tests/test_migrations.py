@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, text
+from sqlmodel import SQLModel
+
+from llamachat.database.migrations import MIGRATIONS, migrate, schema_version
+
+# Tables as created by the first release, before schema versioning
+BASELINE_SCHEMA = [
+    "CREATE TABLE chat (id INTEGER NOT NULL, title VARCHAR NOT NULL, created_at DATETIME NOT NULL, "
+    "PRIMARY KEY (id))",
+    "CREATE TABLE message (id INTEGER NOT NULL, content VARCHAR NOT NULL, role VARCHAR NOT NULL, "
+    "created_at DATETIME NOT NULL, chat_id INTEGER NOT NULL, PRIMARY KEY (id), "
+    "FOREIGN KEY(chat_id) REFERENCES chat (id))",
+    "CREATE TABLE settings (id INTEGER NOT NULL, model_name VARCHAR NOT NULL, temperature FLOAT NOT NULL, "
+    "max_tokens INTEGER NOT NULL, PRIMARY KEY (id))",
+]
+
+class MigrationsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'baseline.db')}")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def test_baseline_database_is_upgraded_with_chat_totals(self):
+        long_reply = "x" * 250
+        with self.engine.begin() as connection:
+            for statement in BASELINE_SCHEMA:
+                connection.execute(text(statement))
+            connection.execute(text(
+                "INSERT INTO chat (id, title, created_at) VALUES "
+                "(1, 'Trip', '2024-01-01 10:00:00.000000'), (2, 'Empty', '2024-01-02 10:00:00.000000')"
+            ))
+            connection.execute(
+                text(
+                    "INSERT INTO message (content, role, created_at, chat_id) VALUES "
+                    "('Plan a trip to Lisbon', 'user', '2024-01-01 10:00:01.000000', 1), "
+                    "(:reply, 'assistant', '2024-01-01 10:00:02.000000', 1)"
+                ),
+                {"reply": long_reply}
+            )
+
+        # As init_db does: new tables first, then the migrations
+        SQLModel.metadata.create_all(self.engine)
+        migrate(self.engine)
+
+        with self.engine.connect() as connection:
+            self.assertEqual(schema_version(connection), len(MIGRATIONS))
+            self.assertEqual(len(MIGRATIONS), 7)
+            chats = connection.execute(text(
+                "SELECT id, message_count, token_total, preview, last_message_at, deleted FROM chat ORDER BY id"
+            )).all()
+
+        trip, empty = chats
+        self.assertEqual(trip.message_count, 2)
+        # 21 // 4 + 4 and 250 // 4 + 4
+        self.assertEqual(trip.token_total, 9 + 66)
+        self.assertEqual(trip.preview, long_reply[:100])
+        self.assertEqual(trip.last_message_at, "2024-01-01 10:00:02.000000")
+        self.assertEqual(trip.deleted, 0)
+        self.assertEqual((empty.message_count, empty.token_total, empty.preview), (0, 0, ""))
+        self.assertEqual(empty.last_message_at, "2024-01-02 10:00:00.000000")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import asyncio
+import unittest
+
+from llamachat.services.generation_metrics import GenerationMetrics
+from llamachat.services.response_cache import ResponseCache
+
+class ResponseCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.cache = ResponseCache()
+        self.release = asyncio.Event()
+        self.opened = 0
+
+    async def upstream(self, metrics: GenerationMetrics):
+        """Stream two chunks, holding the second until ``release`` is set."""
+        self.opened += 1
+        metrics.host = "http://gpu-1:11434"
+        yield "Hello"
+        await self.release.wait()
+        yield " world"
+        metrics.eval_count = 2
+        metrics.eval_duration = 1000
+
+    async def read(self, metrics: GenerationMetrics, temperature: float = 0) -> str:
+        messages = [{"role": "user", "content": "hi"}]
+        stream = self.cache.stream("llama", {"temperature": temperature}, messages, self.upstream, metrics)
+        return "".join([chunk async for chunk in stream])
+
+    async def read_together(self, first: GenerationMetrics, second: GenerationMetrics,
+                            temperature: float) -> list:
+        reads = [asyncio.create_task(self.read(first, temperature))]
+        await asyncio.sleep(0)
+        reads.append(asyncio.create_task(self.read(second, temperature)))
+        await asyncio.sleep(0)
+        self.release.set()
+        return await asyncio.gather(*reads)
+
+    async def test_coalesced_requests_get_the_shared_stream_metrics(self):
+        first, second = GenerationMetrics(), GenerationMetrics()
+        replies = await self.read_together(first, second, temperature=0)
+
+        self.assertEqual(replies, ["Hello world", "Hello world"])
+        self.assertEqual(self.opened, 1)
+        self.assertEqual(self.cache.stats.coalesced, 1)
+        for metrics in (first, second):
+            self.assertEqual(metrics.host, "http://gpu-1:11434")
+            self.assertEqual(metrics.eval_count, 2)
+            self.assertEqual(metrics.eval_duration, 1000)
+
+    async def test_sampled_requests_are_not_coalesced(self):
+        first, second = GenerationMetrics(), GenerationMetrics()
+        replies = await self.read_together(first, second, temperature=0.7)
+
+        self.assertEqual(replies, ["Hello world", "Hello world"])
+        self.assertEqual(self.opened, 2)
+        self.assertEqual(self.cache.stats.coalesced, 0)
+        self.assertEqual(self.cache.stats.misses, 2)
+
+if __name__ == "__main__":
+    unittest.main()
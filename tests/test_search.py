@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+
+from llamachat.config import AppConfig
+from llamachat.database import database
+from llamachat.services.database_service import DatabaseService
+from llamachat.services.search import HIGHLIGHT_END, HIGHLIGHT_START, fts_query, highlight
+
+class HighlightTest(unittest.TestCase):
+    def test_marker_characters_in_the_text_are_dropped(self):
+        plain = "a \x02b\x03 term\x03 c"
+        marked = f"a \x02b\x03 {HIGHLIGHT_START}term{HIGHLIGHT_END}\x03 c"
+
+        self.assertEqual(highlight(plain, marked), f"a b {HIGHLIGHT_START}term{HIGHLIGHT_END} c")
+
+    def test_snippet_without_marker_characters_is_unchanged(self):
+        marked = f"{HIGHLIGHT_START}lisbon{HIGHLIGHT_END} trip"
+
+        self.assertEqual(highlight("lisbon trip", marked), marked)
+
+class FtsQueryTest(unittest.TestCase):
+    def test_last_word_matches_as_prefix(self):
+        self.assertEqual(fts_query("trip lis"), '"trip" "lis"*')
+        self.assertEqual(fts_query("plan a"), '"plan" "a"')
+        self.assertIsNone(fts_query("?!"))
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database_url = AppConfig.database_url
+        AppConfig.database_url = f"sqlite:///{os.path.join(self.directory.name, 'search.db')}"
+        database.init_db()
+        self.service = DatabaseService()
+
+    def tearDown(self):
+        database.engine.dispose()
+        database.engine = None
+        AppConfig.database_url = self.database_url
+        self.directory.cleanup()
+
+    def test_snippet_of_text_with_marker_characters(self):
+        chat = self.service.create_chat("Pasted logs")
+        self.service.add_message(chat.id, "status \x02ok\x03 then lisbon \x03trip", "user")
+
+        [result] = [result for result in self.service.search("lisbon") if result.message_id is not None]
+        self.assertEqual(result.snippet, f"status ok then {HIGHLIGHT_START}lisbon{HIGHLIGHT_END} trip")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication
+
+from llamachat.ui import stream_buffer
+from llamachat.ui.stream_buffer import GAP_SMOOTHING, MAX_FLUSH_INTERVAL_MS, MIN_FLUSH_INTERVAL_MS, StreamBuffer
+
+class StreamBufferTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.now = 100.0
+        clock = mock.patch.object(stream_buffer, "time", mock.Mock(perf_counter=lambda: self.now))
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.flushes = []
+        self.buffer = StreamBuffer(self.flushes.append)
+        self.addCleanup(self.buffer.stop)
+
+    def receive(self, chunk: str, after_ms: float = 0):
+        self.now += after_ms / 1000
+        self.buffer.append(chunk)
+
+    def test_first_chunk_after_a_quiet_period_is_flushed_immediately(self):
+        self.receive("Hello")
+        self.assertEqual(self.flushes, ["Hello"])
+
+        # Within the interval the next chunks wait for the timer
+        self.receive(",", after_ms=5)
+        self.receive(" world", after_ms=5)
+        self.assertEqual(self.flushes, ["Hello"])
+        self.assertTrue(self.buffer._timer.isActive())
+        self.buffer.flush()
+        self.assertEqual(self.flushes, ["Hello", "Hello, world"])
+
+        self.receive("!", after_ms=1000)
+        self.assertEqual(self.flushes, ["Hello", "Hello, world", "Hello, world!"])
+        self.assertFalse(self.buffer._timer.isActive())
+
+    def test_timer_waits_for_the_rest_of_the_interval(self):
+        self.receive("a")
+        self.receive("b", after_ms=10)
+
+        self.assertAlmostEqual(self.buffer.flush_interval_ms, MAX_FLUSH_INTERVAL_MS - 10)
+        # 10 ms of the interval have passed since the flush of the first chunk
+        self.assertAlmostEqual(self.buffer._timer.interval(), MAX_FLUSH_INTERVAL_MS - 10 - 10, delta=1)
+
+    def test_interval_stretches_as_the_token_rate_rises(self):
+        self.assertEqual(self.buffer.flush_interval_ms, MIN_FLUSH_INTERVAL_MS)
+
+        # Slow streams are flushed every MIN_FLUSH_INTERVAL_MS
+        self.receive("a")
+        self.receive("b", after_ms=100)
+        self.assertEqual(self.buffer.flush_interval_ms, MIN_FLUSH_INTERVAL_MS)
+
+        # The average gap follows the rate and the interval grows towards the maximum
+        gap = 100.0
+        for _ in range(40):
+            self.receive("c", after_ms=1)
+            gap += GAP_SMOOTHING * (1 - gap)
+            self.assertAlmostEqual(self.buffer._average_gap_ms, gap)
+        self.assertAlmostEqual(self.buffer.flush_interval_ms, MAX_FLUSH_INTERVAL_MS - gap)
+        self.assertGreater(self.buffer.flush_interval_ms, MAX_FLUSH_INTERVAL_MS - 2)
+        self.assertLessEqual(self.buffer.flush_interval_ms, MAX_FLUSH_INTERVAL_MS)
+
+    def test_text_joins_every_chunk_once(self):
+        for chunk in ("a", "b", "c"):
+            self.receive(chunk, after_ms=1)
+        self.assertEqual(self.buffer.text(), "abc")
+        self.receive("d", after_ms=1)
+        self.assertEqual(self.buffer.text(), "abcd")
+        self.assertEqual(self.buffer.chunk_count, 4)
+
+    def test_stop_drops_the_pending_flush(self):
+        self.receive("a")
+        self.receive("b", after_ms=1)
+        self.buffer.stop()
+
+        self.assertFalse(self.buffer._timer.isActive())
+        self.assertEqual(self.flushes, ["a"])
+
+if __name__ == "__main__":
+    unittest.main()